@@ -29,6 +29,60 @@ REDIS_PUBLISH_RESPONSE_TIMEOUT = 1
 MAX_WORKER_THREADS = 10
 
 DISPATCH_EVENTS_BOTTOM_TO_TOP = True
+
+# Selects the offer/bid matching algorithm of the two sided pay as bid market:
+# 1: Nested scan of the sorted offers and bids for every matching round
+# 2: Single merge pass over the sorted offers and bids for every matching round
+PAY_AS_BID_MATCHING_ALGORITHM = 1
+
+# JSON backend used for serializing offers, bids and trades: "json" for the standard library,
+# "orjson" for the orjson package, if it is installed (falls back to "json" otherwise)
+JSON_SERIALIZATION_BACKEND = "json"
+# Selects how the market actions (offer, bid, accept_offer, delete_offer, ...) are executed,
+# once at market construction:
+# 1: Every action holds the recursive lock of the market, for multithreaded market access
+# 2: Lock-free, only for simulations that access the markets from a single thread (the legacy
+#    redis external strategies act on the markets from the redis pubsub thread)
+# Markets that dispatch their events via redis are always lock-free.
+MARKET_CONCURRENCY_LOCKED = 1
+MARKET_CONCURRENCY_LOCK_FREE = 2
+MARKET_CONCURRENCY_MODE = MARKET_CONCURRENCY_LOCKED
+
+# Selects how market events are delivered to the areas, strategies and inter area agents:
+# 1: Immediately, while the market action that raised the event is executed
+# 2: Batched, the events of all markets are queued and delivered by the root area at the end
+#    of activation, market cycle and tick, in batches of consecutive events of the same type
+#    (see Market.deliver_pending_events). Not supported with EVENT_DISPATCHING_VIA_REDIS.
+MARKET_EVENT_DELIVERY_IMMEDIATE = 1
+MARKET_EVENT_DELIVERY_BATCHED = 2
+MARKET_EVENT_DELIVERY_MODE = MARKET_EVENT_DELIVERY_IMMEDIATE
+
+# Selects which of the usable offers and bids the inter area agents forward to their target
+# market (see d3a.models.strategy.area_agents.forwarding_policy):
+# 1: All of them
+# 2: Offers whose energy rate is at most IAA_FORWARDING_PRICE_BAND above the highest bid of the
+#    target market, and bids whose energy rate is at most IAA_FORWARDING_PRICE_BAND below the
+#    lowest offer of the target market (cents/kWh, energy rates before the grid fees of the
+#    forwarding). Pruned orders are considered again once the minimum offer / bid age of the
+#    inter area agent has passed, InterAreaAgent.pruned_forward_count reports the prunes.
+IAA_FORWARD_ALL = 1
+IAA_FORWARD_PRICE_BAND = 2
+IAA_FORWARDING_POLICY = IAA_FORWARD_ALL
+IAA_FORWARDING_PRICE_BAND = 10.0
+
+# File format of the files that are exported at the end of every market slot (see
+# d3a.d3a_core.export_writer): "csv", "csv.gz" (gzip compressed CSV) or "parquet" (string
+# columns, requires pyarrow, CSV is exported if it is not installed).
+# The export files are kept open during the simulation, the rows of a slot are written in one
+# batch per file. EXPORT_FLUSH_SLOT_COUNT sets after how many slots the files are flushed (0: only
+# at the end of the simulation, Parquet files get one row group per flush), EXPORT_MAX_OPEN_FILES
+# how many files are kept open at most (0: no limit, None: half of the open file descriptor
+# limit of the process). The files beyond that are reopened for every slot (CSV) or written at
+# the end of the simulation (Parquet).
+EXPORT_FILE_FORMAT = "csv"
+EXPORT_FLUSH_SLOT_COUNT = 1
+EXPORT_MAX_OPEN_FILES = None
+
 # Controls how often will event tick be dispatched to external connections. Defaults to
 # 20% of the slot length
 DISPATCH_EVENT_TICK_FREQUENCY_PERCENT = 10
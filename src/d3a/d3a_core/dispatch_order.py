@@ -0,0 +1,64 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from functools import lru_cache
+from itertools import permutations
+from random import Random
+
+from numpy import random as np_random
+
+# Listener lists up to this length are shuffled by drawing one of their cached permutations
+MAX_CACHED_PERMUTATION_LENGTH = 5
+DISPATCH_ORDER_SEED_MAX_VALUE = 2 ** 31 - 1
+
+
+@lru_cache(maxsize=None)
+def _index_permutations(length):
+    return tuple(permutations(range(length)))
+
+
+class DispatchOrder:
+    """
+    Draws the random order in which events are delivered to listeners, in order to ensure
+    fairness between them. Every instance owns its own RNG stream. Unless given, its seed is
+    drawn from the global numpy RNG, which is seeded by the simulation (--seed), therefore
+    dispatch orders are reproducible.
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = int(np_random.randint(0, DISPATCH_ORDER_SEED_MAX_VALUE))
+        self._random = Random(seed).random
+
+    def shuffled(self, items):
+        """Returns a new list with the items in uniformly random order"""
+        if type(items) not in (list, tuple):
+            items = list(items)
+        length = len(items)
+        if length < 2:
+            return list(items)
+        if length <= MAX_CACHED_PERMUTATION_LENGTH:
+            index_permutations = _index_permutations(length)
+            permutation = index_permutations[int(self._random() * len(index_permutations))]
+            return [items[i] for i in permutation]
+        # Fisher-Yates shuffle of a copy of the items
+        items = list(items)
+        random = self._random
+        for i in range(length - 1, 0, -1):
+            j = int(random() * (i + 1))
+            items[i], items[j] = items[j], items[i]
+        return items
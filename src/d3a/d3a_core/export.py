@@ -15,7 +15,6 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
-import csv
 import logging
 import pathlib
 import os
@@ -38,6 +37,7 @@ from d3a.models.market.market_structures import MarketClearingState
 from d3a.models.strategy.storage import StorageStrategy
 from d3a.models.state import ESSEnergyOrigin
 from d3a.d3a_core.sim_results.plotly_graph import PlotlyGraph
+from d3a.d3a_core.export_writer import StreamingExportWriter
 from functools import reduce  # forward compatibility for Python 3
 
 
@@ -71,6 +71,7 @@ class ExportAndPlot:
         self.area = root_area
         self.endpoint_buffer = endpoint_buffer
         self.export_data = self.endpoint_buffer.file_export_endpoints
+        self._writer = StreamingExportWriter()
         try:
             if path is not None:
                 path = os.path.abspath(path)
@@ -111,10 +112,12 @@ class ExportAndPlot:
         zip_file_with_ext = str(self.zip_filename) + ".zip"
         if os.path.isfile(zip_file_with_ext):
             os.remove(zip_file_with_ext)
+        self.close_files()
         shutil.rmtree(str(self.directory))
 
     def export(self, export_plots=True, power_flow=None):
         """Wrapping function, executes all export and plotting functions"""
+        self.close_files()
         if export_plots:
             self.plot_dir = os.path.join(self.directory, 'plot')
             if power_flow is not None:
@@ -142,6 +145,11 @@ class ExportAndPlot:
 
     def data_to_csv(self, area, is_first):
         self._export_area_with_children(area, self.directory, is_first)
+        self._writer.end_slot()
+
+    def close_files(self):
+        """Writes the rows that are still queued and closes the export files"""
+        self._writer.close()
 
     def move_root_plot_folder(self):
         """
@@ -159,7 +167,8 @@ class ExportAndPlot:
 
     def _export_area_with_children(self, area: Area, directory: dir, is_first: bool = False):
         """
-        Uses the FileExportEndpoints object and writes them to csv files
+        Uses the FileExportEndpoints object and queues the rows of the csv files in the
+        export writer, they are written by data_to_csv once the whole area tree was exported
         Runs _export_area_energy and _export_area_stats_csv_file
         """
 
@@ -195,17 +204,10 @@ class ExportAndPlot:
     def _export_area_clearing_rate(self, area, directory, file_suffix, is_first):
         file_path = self._file_path(directory, f"{area.slug}-{file_suffix}")
         labels = ("slot",) + MarketClearingState._csv_fields()
-        try:
-            with open(file_path, 'a') as csv_file:
-                writer = csv.writer(csv_file)
-                if is_first:
-                    writer.writerow(labels)
-                for market in area.past_markets:
-                    for time, clearing in market.state.clearing.items():
-                        row = (market.time_slot, time, clearing[0])
-                        writer.writerow(row)
-        except OSError:
-            _log.exception("Could not export area market_clearing_rate")
+        rows = [(market.time_slot, time, clearing[0])
+                for market in area.past_markets
+                for time, clearing in market.state.clearing.items()]
+        self._writer.write_rows(file_path, labels, rows, write_labels=is_first)
 
     def _export_area_offers_bids_csv_files(self, area, directory, file_suffix,
                                            offer_type, market_member, past_markets,
@@ -217,17 +219,10 @@ class ExportAndPlot:
         """
         file_path = self._file_path(directory, f"{area.slug}-{file_suffix}")
         labels = ("slot",) + offer_type._csv_fields()
-        try:
-            with open(file_path, 'a') as csv_file:
-                writer = csv.writer(csv_file)
-                if is_first:
-                    writer.writerow(labels)
-                for market in past_markets:
-                    for offer in getattr(market, market_member):
-                        row = (market.time_slot,) + offer._to_csv()
-                        writer.writerow(row)
-        except OSError:
-            _log.exception("Could not export area balancing offers")
+        rows = [(market.time_slot,) + offer._to_csv()
+                for market in past_markets
+                for offer in getattr(market, market_member)]
+        self._writer.write_rows(file_path, labels, rows, write_labels=is_first)
 
     def _export_trade_csv_files(self, area: Area, directory: dir, balancing: bool = False,
                                 is_first: bool = False):
@@ -245,17 +240,10 @@ class ExportAndPlot:
             labels = ("slot",) + Trade._csv_fields()
             past_markets = area.past_markets
 
-        try:
-            with open(file_path, 'a') as csv_file:
-                writer = csv.writer(csv_file)
-                if is_first:
-                    writer.writerow(labels)
-                for market in past_markets:
-                    for trade in market.trades:
-                        row = (market.time_slot,) + trade._to_csv()
-                        writer.writerow(row)
-        except OSError:
-            _log.exception("Could not export area trades")
+        rows = [(market.time_slot,) + trade._to_csv()
+                for market in past_markets
+                for trade in market.trades]
+        self._writer.write_rows(file_path, labels, rows, write_labels=is_first)
 
     def _export_area_stats_csv_file(self, area: Area, directory: dir,
                                     balancing: bool, is_first: bool):
@@ -271,15 +259,8 @@ class ExportAndPlot:
         if not rows and not is_first:
             return
 
-        try:
-            with open(self._file_path(directory, area_name), 'a') as csv_file:
-                writer = csv.writer(csv_file)
-                if is_first:
-                    writer.writerow(data.labels())
-                for row in rows:
-                    writer.writerow(row)
-        except Exception as ex:
-            _log.error("Could not export area data: %s" % str(ex))
+        self._writer.write_rows(self._file_path(directory, area_name), data.labels(), rows,
+                                write_labels=is_first)
 
     def plot_device_stats(self, area: Area, node_address_list: list):
         """
@@ -0,0 +1,296 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import csv
+import gzip
+import logging
+from collections import OrderedDict
+
+import d3a.constants
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_log = logging.getLogger(__name__)
+
+CSV_FORMAT = "csv"
+GZIP_CSV_FORMAT = "csv.gz"
+PARQUET_FORMAT = "parquet"
+
+
+def _default_max_open_files():
+    """Half of the soft limit of open file descriptors of the process, 256 if it is unknown"""
+    if resource is None:
+        return 256
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit == resource.RLIM_INFINITY:
+        return 0
+    return max(soft_limit // 2, 1)
+
+
+class _CSVExportFile:
+    keeps_file_open = True
+
+    def __init__(self, path, compress):
+        self._file = gzip.open(path, 'at') if compress else open(path, 'a')
+        self._writer = csv.writer(self._file)
+
+    def write(self, labels, rows, write_labels):
+        if write_labels:
+            self._writer.writerow(labels)
+        self._writer.writerows(rows)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class _ReopeningCSVExportFile:
+    """
+    CSV file that is opened in append mode for every write and closed again, for the files
+    beyond the open file limit of the writer.
+    """
+    keeps_file_open = False
+
+    def __init__(self, path, compress):
+        self._path = path
+        self._compress = compress
+        # Creates the file, same as opening a _CSVExportFile
+        self._append([], [], False)
+
+    def _append(self, labels, rows, write_labels):
+        export_file = _CSVExportFile(self._path, self._compress)
+        try:
+            export_file.write(labels, rows, write_labels)
+        finally:
+            export_file.close()
+
+    def write(self, labels, rows, write_labels):
+        if rows or write_labels:
+            self._append(labels, rows, write_labels)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _parquet_table(labels, rows):
+    columns = [[None if value is None else str(value) for value in column]
+               for column in zip(*rows)]
+    return pyarrow.Table.from_arrays(
+        [pyarrow.array(column, type=pyarrow.string()) for column in columns], names=labels)
+
+
+class _ParquetExportFile:
+    """
+    Parquet file with one string column per label, the values are stored as they are written
+    to the CSV files. The rows are written as one row group per flush.
+    """
+    keeps_file_open = True
+
+    def __init__(self, path, labels):
+        self._labels = [str(label) for label in labels]
+        self._writer = pyarrow.parquet.ParquetWriter(
+            path, pyarrow.schema([(label, pyarrow.string()) for label in self._labels]))
+        self._tables = []
+
+    def write(self, labels, rows, write_labels):
+        if not rows:
+            return
+        self._tables.append(_parquet_table(self._labels, rows))
+
+    def flush(self):
+        if not self._tables:
+            return
+        tables, self._tables = self._tables, []
+        self.write_row_group(pyarrow.concat_tables(tables))
+
+    def write_row_group(self, table):
+        self._writer.write_table(table, row_group_size=table.num_rows)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+
+
+class _BufferedParquetExportFile:
+    """
+    Parquet file beyond the open file limit of the writer. Parquet files can not be appended
+    to, therefore the row groups are kept in memory and the file is written when it is closed.
+    """
+    keeps_file_open = False
+
+    def __init__(self, path, labels):
+        self._path = path
+        self._labels = [str(label) for label in labels]
+        self._tables = []
+        self._row_groups = []
+
+    def write(self, labels, rows, write_labels):
+        if rows:
+            self._tables.append(_parquet_table(self._labels, rows))
+
+    def flush(self):
+        if self._tables:
+            self._row_groups.append(pyarrow.concat_tables(self._tables))
+            self._tables = []
+
+    def close(self):
+        self.flush()
+        export_file = _ParquetExportFile(self._path, self._labels)
+        try:
+            for table in self._row_groups:
+                export_file.write_row_group(table)
+        finally:
+            export_file.close()
+
+
+class StreamingExportWriter:
+    """
+    Writes the rows of the export files of a simulation (see ExportAndPlot.data_to_csv). The
+    files are kept open for the whole simulation, the rows that are written during a market
+    slot are queued and written in one batch per file by end_slot.
+
+    file_format selects plain CSV files, gzip compressed CSV files or Parquet files (if pyarrow
+    is installed, CSV files otherwise). The files are flushed every flush_slot_count slots (0:
+    only when the writer is closed). The first max_open_files files (0: no limit, None: half of
+    the open file descriptor limit of the process) are kept open until the writer is closed.
+    The CSV files beyond that are opened in append mode for every batch and closed again, the
+    Parquet files beyond that are kept in memory and written when the writer is closed, since
+    Parquet files can not be appended to. Rows that are written after the writer was closed go
+    to a numbered Parquet part file (house.1.parquet, house.2.parquet, ...) for the same reason.
+    The defaults are taken from d3a.constants.
+    """
+
+    def __init__(self, file_format=None, flush_slot_count=None, max_open_files=None):
+        self.file_format = file_format \
+            if file_format is not None else d3a.constants.EXPORT_FILE_FORMAT
+        if self.file_format == PARQUET_FORMAT and pyarrow is None:
+            _log.warning("pyarrow is not installed, exporting CSV files instead of Parquet")
+            self.file_format = CSV_FORMAT
+        self.flush_slot_count = flush_slot_count \
+            if flush_slot_count is not None else d3a.constants.EXPORT_FLUSH_SLOT_COUNT
+        if max_open_files is None:
+            max_open_files = d3a.constants.EXPORT_MAX_OPEN_FILES
+        self.max_open_files = max_open_files \
+            if max_open_files is not None else _default_max_open_files()
+        # path -> export file, in order of their creation
+        self._files = OrderedDict()
+        # Number of export files that keep their file open
+        self.open_file_count = 0
+        # path -> [labels, rows, write_labels]
+        self._pending_rows = OrderedDict()
+        # path of a closed Parquet file -> number of part files written after it
+        self._parquet_part_counts = {}
+        self._slot_count = 0
+
+    def file_path(self, csv_path):
+        """Path of the exported file for the path of a CSV file, by file format"""
+        if self.file_format == GZIP_CSV_FORMAT:
+            return csv_path + ".gz"
+        elif self.file_format == PARQUET_FORMAT:
+            return csv_path[:-len(".csv")] + ".parquet" if csv_path.endswith(".csv") \
+                else csv_path + ".parquet"
+        return csv_path
+
+    def write_rows(self, csv_path, labels, rows, write_labels=False):
+        """
+        Queues rows for the file of csv_path, preceded by the labels if write_labels is set.
+        The file is created by the next end_slot even if there are no rows.
+        """
+        path = self.file_path(csv_path)
+        pending = self._pending_rows.get(path)
+        if pending is None:
+            self._pending_rows[path] = [labels, list(rows), write_labels]
+        else:
+            pending[1].extend(rows)
+            pending[2] = pending[2] or write_labels
+
+    def _open_file(self, path, labels):
+        export_file = self._files.get(path)
+        if export_file is not None:
+            return export_file
+        keep_open = not self.max_open_files or self.open_file_count < self.max_open_files
+        if self.file_format == PARQUET_FORMAT:
+            export_file_class = _ParquetExportFile if keep_open else _BufferedParquetExportFile
+            export_file = export_file_class(self._parquet_part_path(path), labels)
+        else:
+            export_file_class = _CSVExportFile if keep_open else _ReopeningCSVExportFile
+            export_file = export_file_class(path, compress=self.file_format == GZIP_CSV_FORMAT)
+        self._files[path] = export_file
+        if export_file.keeps_file_open:
+            self.open_file_count += 1
+        return export_file
+
+    def _parquet_part_path(self, path):
+        part = self._parquet_part_counts.get(path)
+        if part is None:
+            return path
+        self._parquet_part_counts[path] = part + 1
+        return f"{path[:-len('.parquet')]}.{part + 1}.parquet"
+
+    def _close_file(self, path, export_file):
+        try:
+            export_file.close()
+        except Exception:
+            _log.exception(f"Could not export {path}")
+        if self.file_format == PARQUET_FORMAT:
+            self._parquet_part_counts.setdefault(path, 0)
+
+    def _write_pending_rows(self):
+        pending_rows, self._pending_rows = self._pending_rows, OrderedDict()
+        for path, (labels, rows, write_labels) in pending_rows.items():
+            try:
+                self._open_file(path, labels).write(labels, rows, write_labels)
+            except Exception:
+                _log.exception(f"Could not export {path}")
+
+    def end_slot(self):
+        """Writes the rows queued during the slot, flushes the files as configured"""
+        self._write_pending_rows()
+        self._slot_count += 1
+        if self.flush_slot_count and self._slot_count % self.flush_slot_count == 0:
+            self.flush()
+
+    def flush(self):
+        for path, export_file in self._files.items():
+            try:
+                export_file.flush()
+            except Exception:
+                _log.exception(f"Could not export {path}")
+
+    def close(self):
+        """Writes the queued rows and closes the files"""
+        self._write_pending_rows()
+        files, self._files = self._files, OrderedDict()
+        self.open_file_count = 0
+        for path, export_file in files.items():
+            self._close_file(path, export_file)
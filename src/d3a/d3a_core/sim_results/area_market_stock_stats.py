@@ -17,20 +17,34 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from random import randint
 from d3a.d3a_core.util import round_floats_for_ui
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
 
 
-class OfferBidTradeGraphStats:
+class OfferBidTradeGraphStats(ResultsVisitor):
     def __init__(self):
         self.state = {}
         self.color_mapping = {}
+        self._reached_areas = set()
+        self._last_past_markets = {}
 
     def update(self, area):
+        walk_area_tree(area, [self])
+
+    def start_walk(self, root_area):
+        self._reached_areas = {root_area.uuid}
+        self._last_past_markets = {}
+
+    def enter_area(self, area):
+        if area.uuid not in self._reached_areas:
+            return
         if area.name not in self.state:
             self.state[area.name] = {}
 
         last_past_market = area.last_past_market
         if last_past_market is None:
             return
+        self._last_past_markets[area.uuid] = last_past_market
+        self._reached_areas.update(child.uuid for child in area.children if child.children)
 
         if last_past_market.time_slot not in self.state[area.name]:
             self.state[area.name][last_past_market.time_slot] = {}
@@ -55,20 +69,18 @@ class OfferBidTradeGraphStats:
                 {"rate": offer.energy_rate, "tool_tip": tool_tip, "tag": "bid",
                  "color": self.color_mapping[offer.seller_origin]})
 
-        for trade in last_past_market.trades:
-            tool_tip = f"Trade: {trade.seller_origin} --> {trade.buyer_origin} " \
-                       f"({trade.offer.energy} kWh @ " \
-                       f"{round_floats_for_ui(trade.offer.energy_rate)} € / kWh)"
-            self.check_and_create_color_mapping(trade.seller_origin)
-            self.check_and_create_list(area, last_past_market, trade)
-            info_dict = {"rate": trade.offer.energy_rate, "tool_tip": tool_tip, "tag": "trade",
-                         "color": self.color_mapping[trade.seller_origin]}
-            self.state[area.name][last_past_market.time_slot][trade.time].append(info_dict)
-
-        for child in area.children:
-            if not child.children:
-                continue
-            self.update(child)
+    def visit_trade(self, area, market, trade, seller, buyer):
+        last_past_market = self._last_past_markets.get(area.uuid)
+        if market is not last_past_market:
+            return
+        tool_tip = f"Trade: {trade.seller_origin} --> {trade.buyer_origin} " \
+                   f"({trade.offer.energy} kWh @ " \
+                   f"{round_floats_for_ui(trade.offer.energy_rate)} € / kWh)"
+        self.check_and_create_color_mapping(trade.seller_origin)
+        self.check_and_create_list(area, last_past_market, trade)
+        info_dict = {"rate": trade.offer.energy_rate, "tool_tip": tool_tip, "tag": "trade",
+                     "color": self.color_mapping[trade.seller_origin]}
+        self.state[area.name][last_past_market.time_slot][trade.time].append(info_dict)
 
     def check_and_create_color_mapping(self, origin):
         if origin not in self.color_mapping.keys():
@@ -27,11 +27,12 @@ from d3a.models.strategy.market_maker_strategy import MarketMakerStrategy
 from d3a.models.strategy.commercial_producer import CommercialStrategy
 from d3a.models.strategy.load_hours import CellTowerLoadHoursStrategy, LoadHoursStrategy
 from d3a.d3a_core.util import area_name_from_area_or_iaa_name, make_iaa_name, \
-    round_floats_for_ui, add_or_create_key, subtract_or_create_key, \
-    area_sells_to_child, child_buys_from_area
+    round_floats_for_ui, add_or_create_key, subtract_or_create_key
 from d3a.constants import FLOATING_POINT_TOLERANCE
+from d3a.models.market.trade_index import trades_bought_by, trades_with_area_names
 from d3a_interface.constants_limits import ConstSettings
 from d3a_interface.sim_results.aggregate_results import merge_price_energy_day_results_to_global
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
 
 loads_avg_prices = namedtuple('loads_avg_prices', ['load', 'price'])
 
@@ -51,8 +52,7 @@ def gather_area_loads_and_trade_prices(area, load_price_lists):
                     trade_prices = [
                         # Convert from cents to euro
                         t.offer.price / 100.0 / t.offer.energy
-                        for t in market.trades
-                        if t.buyer == child.name
+                        for t in trades_bought_by(market, child.name)
                     ]
                     load_price_lists[slot.hour].price.extend(trade_prices)
         else:
@@ -85,7 +85,19 @@ def _is_buffer_node(area):
     return type(area.strategy) == InfiniteBusStrategy
 
 
-def _accumulate_storage_trade(storage, area, accumulated_trades, past_market_types):
+def _accumulate_consumed_trade(accumulated_trades, name, trade, sell_id):
+    accumulated_trades[name]["consumedFrom"] = add_or_create_key(
+        accumulated_trades[name]["consumedFrom"], sell_id, trade.offer.energy)
+    accumulated_trades[name]["spentTo"] = add_or_create_key(
+        accumulated_trades[name]["spentTo"], sell_id, trade.offer.price)
+
+
+def _accumulate_produced_trade(accumulated_trades, name, trade):
+    accumulated_trades[name]["produced"] -= trade.offer.energy
+    accumulated_trades[name]["earned"] += trade.offer.price
+
+
+def _create_storage_entry(storage, area, accumulated_trades):
     if storage.name not in accumulated_trades:
         accumulated_trades[storage.name] = {
             "type": "Storage" if type(area.strategy) == StorageStrategy else "InfiniteBus",
@@ -95,26 +107,6 @@ def _accumulate_storage_trade(storage, area, accumulated_trades, past_market_typ
             "spentTo": {},
         }
 
-    markets = getattr(area, past_market_types)
-    if markets is None:
-        return accumulated_trades
-    else:
-        if type(markets) != list:
-            markets = [markets]
-        for market in markets:
-            for trade in market.trades:
-                if trade.buyer == storage.name:
-                    sell_id = area_name_from_area_or_iaa_name(trade.seller)
-                    accumulated_trades[storage.name]["consumedFrom"] = add_or_create_key(
-                        accumulated_trades[storage.name]["consumedFrom"],
-                        sell_id, trade.offer.energy)
-                    accumulated_trades[storage.name]["spentTo"] = add_or_create_key(
-                        accumulated_trades[storage.name]["spentTo"], sell_id, trade.offer.price)
-                elif trade.offer.seller == storage.name:
-                    accumulated_trades[storage.name]["produced"] -= trade.offer.energy
-                    accumulated_trades[storage.name]["earned"] += trade.offer.price
-        return accumulated_trades
-
 
 def _accumulate_load_trades(load, grid, accumulated_trades, is_cell_tower, past_market_types):
     if load.name not in accumulated_trades:
@@ -133,17 +125,16 @@ def _accumulate_load_trades(load, grid, accumulated_trades, is_cell_tower, past_
         if type(markets) != list:
             markets = [markets]
         for market in markets:
-            for trade in market.trades:
-                if trade.buyer == load.name:
-                    sell_id = area_name_from_area_or_iaa_name(trade.seller)
-                    accumulated_trades[load.name]["consumedFrom"] = add_or_create_key(
-                        accumulated_trades[load.name]["consumedFrom"], sell_id, trade.offer.energy)
-                    accumulated_trades[load.name]["spentTo"] = add_or_create_key(
-                        accumulated_trades[load.name]["spentTo"], sell_id, trade.offer.price)
+            for trade in trades_bought_by(market, load.name):
+                sell_id = area_name_from_area_or_iaa_name(trade.seller)
+                accumulated_trades[load.name]["consumedFrom"] = add_or_create_key(
+                    accumulated_trades[load.name]["consumedFrom"], sell_id, trade.offer.energy)
+                accumulated_trades[load.name]["spentTo"] = add_or_create_key(
+                    accumulated_trades[load.name]["spentTo"], sell_id, trade.offer.price)
         return accumulated_trades
 
 
-def _accumulate_producer_trades(producer, grid, accumulated_trades, past_market_types):
+def _create_producer_entry(producer, accumulated_trades):
     if producer.name not in accumulated_trades:
         accumulated_trades[producer.name] = {
             "produced": 0.0,
@@ -152,20 +143,6 @@ def _accumulate_producer_trades(producer, grid, accumulated_trades, past_market_
             "spentTo": {},
         }
 
-    markets = getattr(grid, past_market_types)
-    if markets is None:
-        return accumulated_trades
-    else:
-        if type(markets) != list:
-            markets = [markets]
-
-        for market in markets:
-            for trade in market.trades:
-                if trade.offer.seller == producer.name:
-                    accumulated_trades[producer.name]["produced"] -= trade.offer.energy
-                    accumulated_trades[producer.name]["earned"] += trade.offer.price
-        return accumulated_trades
-
 
 def _area_trade_from_parent(area, parent, accumulated_trades, past_market_types):
     area_IAA_name = make_iaa_name(area)
@@ -175,20 +152,19 @@ def _area_trade_from_parent(area, parent, accumulated_trades, past_market_types)
             parent_markets = [parent_markets]
 
         for market in parent_markets:
-            for trade in market.trades:
-                if trade.buyer == area_IAA_name:
-                    seller_id = area_name_from_area_or_iaa_name(trade.seller)
-                    accumulated_trades[area.name]["consumedFrom"] = \
-                        add_or_create_key(accumulated_trades[area.name]["consumedFrom"],
-                                          seller_id, trade.offer.energy)
-                    accumulated_trades[area.name]["spentTo"] = \
-                        add_or_create_key(accumulated_trades[area.name]["spentTo"],
-                                          seller_id, trade.offer.price)
+            for trade in trades_bought_by(market, area_IAA_name):
+                seller_id = area_name_from_area_or_iaa_name(trade.seller)
+                accumulated_trades[area.name]["consumedFrom"] = \
+                    add_or_create_key(accumulated_trades[area.name]["consumedFrom"],
+                                      seller_id, trade.offer.energy)
+                accumulated_trades[area.name]["spentTo"] = \
+                    add_or_create_key(accumulated_trades[area.name]["spentTo"],
+                                      seller_id, trade.offer.price)
 
     return accumulated_trades
 
 
-def _accumulate_area_trades(area, parent, accumulated_trades, past_market_types):
+def _create_area_entry(area, accumulated_trades):
     if area.name not in accumulated_trades:
         accumulated_trades[area.name] = {
             "type": "house",
@@ -201,49 +177,56 @@ def _accumulate_area_trades(area, parent, accumulated_trades, past_market_types)
             "consumedFromExternal": {},
             "spentToExternal": {},
         }
-    area_IAA_name = make_iaa_name(area)
-    child_names = [area_name_from_area_or_iaa_name(c.name) for c in area.children]
+
+
+def _accumulate_area_trade(area, child_names, trade, seller, buyer, accumulated_trades):
+    """
+    Accumulates a trade of a market of area to the entry of area, seller and buyer are the area
+    names of the seller and buyer of the trade
+    """
+    if seller in child_names and buyer in child_names:
+        # House self-consumption trade
+        _accumulate_produced_trade(accumulated_trades, area.name, trade)
+        accumulated_trades[area.name]["consumedFrom"] = \
+            add_or_create_key(accumulated_trades[area.name]["consumedFrom"],
+                              area.name, trade.offer.energy)
+        accumulated_trades[area.name]["spentTo"] = \
+            add_or_create_key(accumulated_trades[area.name]["spentTo"],
+                              area.name, trade.offer.price)
+    elif trade.buyer == make_iaa_name(area):
+        accumulated_trades[area.name]["earned"] += trade.offer.price
+        accumulated_trades[area.name]["produced"] -= trade.offer.energy
+
+    if seller == area.name and buyer in child_names:
+        # The area sells to a child
+        accumulated_trades[area.name]["consumedFromExternal"] = \
+            subtract_or_create_key(accumulated_trades[area.name]
+                                   ["consumedFromExternal"],
+                                   buyer, trade.offer.energy)
+        accumulated_trades[area.name]["spentToExternal"] = \
+            add_or_create_key(accumulated_trades[area.name]["spentToExternal"],
+                              buyer, trade.offer.price)
+    elif buyer == area.name and seller in child_names:
+        # A child buys from the area
+        accumulated_trades[area.name]["producedForExternal"] = \
+            add_or_create_key(accumulated_trades[area.name]["producedForExternal"],
+                              seller, trade.offer.energy)
+        accumulated_trades[area.name]["earnedFromExternal"] = \
+            add_or_create_key(accumulated_trades[area.name]["earnedFromExternal"],
+                              seller, trade.offer.price)
+
+
+def _accumulate_area_trades(area, parent, accumulated_trades, past_market_types):
+    _create_area_entry(area, accumulated_trades)
+    child_names = {area_name_from_area_or_iaa_name(c.name) for c in area.children}
     area_markets = getattr(area, past_market_types)
     if area_markets is not None:
         if type(area_markets) != list:
             area_markets = [area_markets]
         for market in area_markets:
-            for trade in market.trades:
-                if area_name_from_area_or_iaa_name(trade.seller) in child_names and \
-                        area_name_from_area_or_iaa_name(trade.buyer) in child_names:
-                    # House self-consumption trade
-                    accumulated_trades[area.name]["produced"] -= trade.offer.energy
-                    accumulated_trades[area.name]["earned"] += trade.offer.price
-                    accumulated_trades[area.name]["consumedFrom"] = \
-                        add_or_create_key(accumulated_trades[area.name]["consumedFrom"],
-                                          area.name, trade.offer.energy)
-                    accumulated_trades[area.name]["spentTo"] = \
-                        add_or_create_key(accumulated_trades[area.name]["spentTo"],
-                                          area.name, trade.offer.price)
-                elif trade.buyer == area_IAA_name:
-                    accumulated_trades[area.name]["earned"] += trade.offer.price
-                    accumulated_trades[area.name]["produced"] -= trade.offer.energy
-        for market in area_markets:
-            for trade in market.trades:
-                if area_sells_to_child(trade, area.name, child_names):
-                    accumulated_trades[area.name]["consumedFromExternal"] = \
-                        subtract_or_create_key(accumulated_trades[area.name]
-                                               ["consumedFromExternal"],
-                                               area_name_from_area_or_iaa_name(trade.buyer),
-                                               trade.offer.energy)
-                    accumulated_trades[area.name]["spentToExternal"] = \
-                        add_or_create_key(accumulated_trades[area.name]["spentToExternal"],
-                                          area_name_from_area_or_iaa_name(trade.buyer),
-                                          trade.offer.price)
-                elif child_buys_from_area(trade, area.name, child_names):
-                    accumulated_trades[area.name]["producedForExternal"] = \
-                        add_or_create_key(accumulated_trades[area.name]["producedForExternal"],
-                                          area_name_from_area_or_iaa_name(trade.seller),
-                                          trade.offer.energy)
-                    accumulated_trades[area.name]["earnedFromExternal"] = \
-                        add_or_create_key(accumulated_trades[area.name]["earnedFromExternal"],
-                                          area_name_from_area_or_iaa_name(trade.seller),
-                                          trade.offer.price)
+            for trade, (seller, buyer) in trades_with_area_names(market):
+                _accumulate_area_trade(area, child_names, trade, seller, buyer,
+                                       accumulated_trades)
 
     accumulated_trades = \
         _area_trade_from_parent(area, parent, accumulated_trades, past_market_types)
@@ -271,40 +254,6 @@ def _accumulate_grid_trades(area, accumulated_trades, past_market_types):
     return accumulated_trades
 
 
-def _accumulate_grid_trades_all_devices(area, accumulated_trades, past_market_types):
-    for child in area.children:
-        if _is_cell_tower_node(child):
-            accumulated_trades = _accumulate_load_trades(
-                child, area, accumulated_trades, is_cell_tower=True,
-                past_market_types=past_market_types
-            )
-        if _is_load_node(child):
-            accumulated_trades = _accumulate_load_trades(
-                child, area, accumulated_trades, is_cell_tower=False,
-                past_market_types=past_market_types
-            )
-        if _is_producer_node(child):
-            accumulated_trades = _accumulate_producer_trades(
-                child, area, accumulated_trades,
-                past_market_types=past_market_types
-            )
-        elif _is_prosumer_node(child) or _is_buffer_node(child):
-            accumulated_trades = \
-                _accumulate_storage_trade(child, area, accumulated_trades, past_market_types)
-
-        elif child.children == []:
-            # Leaf node, no need for calculating cumulative trades, continue iteration
-            continue
-        else:
-            accumulated_trades = _accumulate_area_trades(
-                child, area, accumulated_trades, past_market_types
-            )
-            accumulated_trades = _accumulate_grid_trades_all_devices(
-                child, accumulated_trades, past_market_types
-            )
-    return accumulated_trades
-
-
 def _generate_produced_energy_entries(accumulated_trades):
     # Create produced energy results (negative axis)
     produced_energy = [{
@@ -461,12 +410,8 @@ def generate_cumulative_grid_trades_for_all_areas(accumulated_trades, area, resu
     return results
 
 
-def export_cumulative_grid_trades(area, accumulated_trades, past_market_types, all_devices=False):
-    accumulated_trades = _accumulate_grid_trades_all_devices(area, accumulated_trades,
-                                                             past_market_types) \
-        if all_devices else _accumulate_grid_trades(area, {}, past_market_types)
-
-    return accumulated_trades, {
+def export_accumulated_grid_trades(accumulated_trades):
+    return {
         "unit": "kWh",
         "areas": sorted(accumulated_trades.keys()),
         "cumulative-grid-trades": [
@@ -480,62 +425,45 @@ def export_cumulative_grid_trades(area, accumulated_trades, past_market_types, a
     }
 
 
-def export_cumulative_grid_trades_redis(area, accumulated_trades_redis, past_market_types):
-    accumulated_trades = \
-        _accumulate_grid_trades_all_devices(area, accumulated_trades_redis, past_market_types)
-    return accumulated_trades, generate_cumulative_grid_trades_for_all_areas(accumulated_trades,
-                                                                             area, {})
+def export_cumulative_grid_trades(area, past_market_types):
+    accumulated_trades = _accumulate_grid_trades(area, {}, past_market_types)
+    return accumulated_trades, export_accumulated_grid_trades(accumulated_trades)
 
 
-class MarketPriceEnergyDay:
+class MarketPriceEnergyDay(ResultsVisitor):
     def __init__(self):
         self._price_energy_day = {}
         self.csv_output = {}
         self.redis_output = {}
+        self._price_lists = {}
+        self._trade_rates = None
 
-    @classmethod
-    def gather_trade_rates(cls, area, price_lists, use_last_past_market=False):
-        if area.children == []:
-            return price_lists
-
-        if use_last_past_market is False:
-            markets = area.past_markets
-        elif area.current_market is not None:
-            markets = [area.current_market]
-        else:
-            markets = []
-
-        for market in markets:
-            cls.gather_rates_one_market(area, market, price_lists)
-
-        for child in area.children:
-            price_lists = cls.gather_trade_rates(child, price_lists)
+    def update(self, area):
+        walk_area_tree(area, [self])
 
-        return price_lists
+    def start_walk(self, root_area):
+        self._price_lists = {}
 
-    @classmethod
-    def gather_rates_one_market(cls, area, market, price_lists):
-        if area not in price_lists:
-            price_lists[area] = OrderedDict()
-        if market.time_slot not in price_lists.keys():
-            price_lists[area][market.time_slot] = []
-        trade_rates = [
+    def enter_market(self, area, market):
+        if area.children == []:
+            self._trade_rates = None
+            return
+        if area not in self._price_lists:
+            self._price_lists[area] = OrderedDict()
+        self._trade_rates = self._price_lists[area][market.time_slot] = []
+
+    def visit_trade(self, area, market, trade, seller, buyer):
+        if self._trade_rates is not None:
             # Convert from cents to euro
-            t.offer.price / 100.0 / t.offer.energy
-            for t in market.trades
-        ]
-        price_lists[area][market.time_slot].extend(trade_rates)
-
-    def update(self, area):
-        current_price_lists = self.gather_trade_rates(
-            area, {},
-            use_last_past_market=not ConstSettings.GeneralSettings.KEEP_PAST_MARKETS
-        )
+            self._trade_rates.append(trade.offer.price / 100.0 / trade.offer.energy)
 
+    def finish_walk(self, root_area):
         price_energy_csv_output = {}
         price_energy_redis_output = {}
         self._convert_output_format(
-            current_price_lists, price_energy_csv_output, price_energy_redis_output)
+            self._price_lists, price_energy_csv_output, price_energy_redis_output)
+        self._price_lists = {}
+        self._trade_rates = None
 
         if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
             self.csv_output = price_energy_csv_output
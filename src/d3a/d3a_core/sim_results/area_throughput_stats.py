@@ -16,18 +16,22 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from d3a.d3a_core.util import area_name_from_area_or_iaa_name,  round_floats_for_ui, \
-    add_or_create_key, create_subdict_or_update, area_sells_to_child, child_buys_from_area
+    add_or_create_key, create_subdict_or_update
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
 
 
-class AreaThroughputStats:
+class AreaThroughputStats(ResultsVisitor):
     def __init__(self):
         self.results = {}
         self.results_redis = {}
         self.exported_energy = {}
         self.imported_energy = {}
+        self._root_area = None
+        # area uuid -> (area, last past market, child names) of the areas with results
+        self._result_areas = {}
 
     def update(self, area):
-        self.update_results(area)
+        walk_area_tree(area, [self])
 
     def _calc_results(self, area, baseline_value, energy_profile, direction_key):
         # as this is mainly a frontend feature,
@@ -53,8 +57,7 @@ class AreaThroughputStats:
             capacity_kWh = round_floats_for_ui(area.export_capacity_kWh)
         return {"capacity_kWh": capacity_kWh}
 
-    def update_results(self, area):
-        self.aggregate_exported_imported_energy(area)
+    def _update_area_results(self, area):
         area_results = {"import": self._calc_peak_energy_results(self.imported_energy[area.uuid]),
                         "export": self._calc_peak_energy_results(self.exported_energy[area.uuid])}
 
@@ -83,31 +86,42 @@ class AreaThroughputStats:
         create_subdict_or_update(self.results, area.name, area_results)
         create_subdict_or_update(self.results_redis, area.uuid, area_results)
 
-        for child in area.children:
-            if child.strategy is None:
-                self.update_results(child)
+    def start_walk(self, root_area):
+        self._root_area = root_area
+        self._result_areas = {}
 
-    def aggregate_exported_imported_energy(self, area):
+    def enter_area(self, area):
+        if area is not self._root_area and \
+                (area.strategy is not None or area.parent.uuid not in self._result_areas):
+            return
         if area.uuid not in self.imported_energy:
             self.imported_energy[area.uuid] = {}
         if area.uuid not in self.exported_energy:
             self.exported_energy[area.uuid] = {}
 
         past_markets = list(area._markets.past_markets.values())
-        if len(past_markets) > 0:
-            current_market = past_markets[-1]
-        else:
-            return
+        current_market = past_markets[-1] if len(past_markets) > 0 else None
+        child_names = {area_name_from_area_or_iaa_name(c.name) for c in area.children}
+        self._result_areas[area.uuid] = (area, current_market, child_names)
 
-        child_names = [area_name_from_area_or_iaa_name(c.name) for c in area.children]
-        for trade in current_market.trades:
-            if child_buys_from_area(trade, area.name, child_names):
-                add_or_create_key(self.exported_energy[area.uuid], current_market.time_slot_str,
-                                  trade.offer.energy)
-            if area_sells_to_child(trade, area.name, child_names):
-                add_or_create_key(self.imported_energy[area.uuid], current_market.time_slot_str,
-                                  trade.offer.energy)
-        if current_market.time_slot_str not in self.imported_energy[area.uuid]:
-            self.imported_energy[area.uuid][current_market.time_slot_str] = 0.
-        if current_market.time_slot_str not in self.exported_energy[area.uuid]:
-            self.exported_energy[area.uuid][current_market.time_slot_str] = 0.
+    def visit_trade(self, area, market, trade, seller, buyer):
+        result_area = self._result_areas.get(area.uuid)
+        if result_area is None or market is not result_area[1]:
+            return
+        _, current_market, child_names = result_area
+        if buyer == area.name and seller in child_names:
+            add_or_create_key(self.exported_energy[area.uuid], current_market.time_slot_str,
+                              trade.offer.energy)
+        if seller == area.name and buyer in child_names:
+            add_or_create_key(self.imported_energy[area.uuid], current_market.time_slot_str,
+                              trade.offer.energy)
+
+    def finish_walk(self, root_area):
+        for area, current_market, _ in self._result_areas.values():
+            if current_market is not None:
+                if current_market.time_slot_str not in self.imported_energy[area.uuid]:
+                    self.imported_energy[area.uuid][current_market.time_slot_str] = 0.
+                if current_market.time_slot_str not in self.exported_energy[area.uuid]:
+                    self.exported_energy[area.uuid][current_market.time_slot_str] = 0.
+            self._update_area_results(area)
+        self._result_areas = {}
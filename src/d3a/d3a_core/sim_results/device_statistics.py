@@ -7,6 +7,7 @@ from d3a.models.strategy.finite_power_plant import FinitePowerPlant
 from d3a.models.strategy.infinite_bus import InfiniteBusStrategy
 from d3a.models.area import Area
 from d3a import limit_float_precision
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
 
 FILL_VALUE = None
 
@@ -17,12 +18,15 @@ def _create_or_append_dict(dict, key, subdict):
     dict[key].update(subdict)
 
 
-class DeviceStatistics:
+class DeviceStatistics(ResultsVisitor):
 
     def __init__(self):
         self.device_stats_dict = {}
         self.current_stats_dict = {}
         self.current_stats_time_str = {}
+        # area uuid -> (subdict of device_stats_dict, subdict of the statistics of the slot)
+        self._area_subdicts = {}
+        self._device_subdicts = {}
 
     @staticmethod
     def _calc_min_max_from_sim_dict(subdict: Dict, key: str):
@@ -145,19 +149,32 @@ class DeviceStatistics:
         cls._calc_min_max_from_sim_dict(subdict, key_name)
 
     def update(self, area):
-        self.gather_device_statistics(area, self.device_stats_dict, {})
-        # TODO: only calculate this if redis is enabled:
-        self.gather_device_statistics(area, {}, self.current_stats_dict)
-
-    @classmethod
-    def gather_device_statistics(cls, area: Area, subdict: Dict, flat_result_dict: Dict):
+        walk_area_tree(area, [self])
+
+    def start_walk(self, root_area):
+        self._area_subdicts = {root_area.uuid: (self.device_stats_dict, {})}
+        self._device_subdicts = {}
+
+    def enter_area(self, area: Area):
+        device_subdicts = self._device_subdicts.pop(area.uuid, None)
+        if device_subdicts is not None:
+            self._gather_device_statistics(area, device_subdicts[0], {})
+            # TODO: only calculate this if redis is enabled:
+            self._gather_device_statistics(area, device_subdicts[1], self.current_stats_dict)
+            return
+
+        area_subdicts = self._area_subdicts.pop(area.uuid, None)
+        if area_subdicts is None:
+            return
         for child in area.children:
-            if child.name not in subdict.keys():
-                subdict.update({child.name: {}})
+            for subdict in area_subdicts:
+                if child.name not in subdict.keys():
+                    subdict.update({child.name: {}})
+            child_subdicts = tuple(subdict[child.name] for subdict in area_subdicts)
             if child.children == []:
-                cls._gather_device_statistics(child, subdict[child.name], flat_result_dict)
+                self._device_subdicts[child.uuid] = child_subdicts
             else:
-                cls.gather_device_statistics(child, subdict[child.name], flat_result_dict)
+                self._area_subdicts[child.uuid] = child_subdicts
 
     @classmethod
     def _gather_device_statistics(cls, area: Area, subdict: Dict, flat_result_dict: Dict):
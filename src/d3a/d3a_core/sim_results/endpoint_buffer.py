@@ -16,7 +16,11 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from d3a.d3a_core.sim_results.area_statistics import export_cumulative_grid_trades, \
-    export_cumulative_grid_trades_redis, MarketPriceEnergyDay
+    export_accumulated_grid_trades, generate_cumulative_grid_trades_for_all_areas, \
+    MarketPriceEnergyDay, _accumulate_load_trades, _accumulate_produced_trade, \
+    _accumulate_consumed_trade, _accumulate_area_trade, _area_trade_from_parent, \
+    _create_producer_entry, _create_storage_entry, _create_area_entry, _is_cell_tower_node, \
+    _is_load_node, _is_producer_node, _is_prosumer_node, _is_buffer_node
 from d3a.d3a_core.sim_results.area_throughput_stats import AreaThroughputStats
 from d3a.d3a_core.sim_results.file_export_endpoints import FileExportEndpoints
 from d3a.d3a_core.sim_results.stats import MarketEnergyBills, CumulativeBills
@@ -25,6 +29,9 @@ from d3a.d3a_core.sim_results.export_unmatched_loads import MarketUnmatchedLoads
 from d3a_interface.constants_limits import ConstSettings
 from d3a.d3a_core.sim_results.kpi import KPI
 from d3a.d3a_core.sim_results.area_market_stock_stats import OfferBidTradeGraphStats
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
+from d3a.d3a_core.sim_results.trade_ledger import TradeLedger
+from d3a.d3a_core.util import area_name_from_area_or_iaa_name
 from d3a_interface.utils import convert_pendulum_to_str_in_dict
 
 _NO_VALUE = {
@@ -48,11 +55,12 @@ class SimulationEndpointBuffer:
         self.market_unmatched_loads = MarketUnmatchedLoads(area)
         self.price_energy_day = MarketPriceEnergyDay()
         self.market_bills = MarketEnergyBills()
-        self.cumulative_bills = CumulativeBills()
+        self.trade_ledger = TradeLedger()
+        self.cumulative_bills = CumulativeBills(self.trade_ledger)
         self.balancing_bills = MarketEnergyBills(is_spot_market=False)
         self.cumulative_grid_trades = CumulativeGridTrades()
         self.device_statistics = DeviceStatistics()
-        self.file_export_endpoints = FileExportEndpoints(export_plots)
+        self.file_export_endpoints = FileExportEndpoints(export_plots, self.trade_ledger)
         self.kpi = KPI()
         self.area_throughput_stats = AreaThroughputStats()
 
@@ -118,31 +126,22 @@ class SimulationEndpointBuffer:
             "percentage_completed": int(progress_info.percentage_completed)
         }
 
-        self.cumulative_grid_trades.update(area)
-
-        self.market_bills.update(area)
-        if ConstSettings.BalancingSettings.ENABLE_BALANCING_MARKET:
-            self.balancing_bills.update(area)
-
-        self.cumulative_bills.update_cumulative_bills(area)
-
-        self.file_export_endpoints(area)
-        self.market_unmatched_loads.update_unmatched_loads(area)
-        self.device_statistics.update(area)
-
-        self.price_energy_day.update(area)
-
-        self.kpi.update_kpis_from_area(area)
-
-        self.area_throughput_stats.update(area)
-
-        self.generate_result_report()
+        areas = walk_area_tree(area, self._results_visitors())
 
         self.bids_offers_trades.clear()
-        self.update_area_aggregated_stats(area)
+        self.update_area_aggregated_stats(areas)
 
+    def _results_visitors(self):
+        """Results that are updated from the walk of the area tree, in order of their update"""
+        visitors = [self.trade_ledger, self.cumulative_grid_trades, self.market_bills]
+        if ConstSettings.BalancingSettings.ENABLE_BALANCING_MARKET:
+            visitors.append(self.balancing_bills)
+        visitors.extend([self.cumulative_bills, self.file_export_endpoints,
+                         self.market_unmatched_loads, self.device_statistics,
+                         self.price_energy_day, self.kpi, self.area_throughput_stats])
         if ConstSettings.GeneralSettings.EXPORT_OFFER_BID_TRADE_HR:
-            self.area_market_stocks_stats.update(area)
+            visitors.append(self.area_market_stocks_stats)
+        return visitors
 
     def _send_results_to_areas(self, area):
         stats = {
@@ -150,11 +149,10 @@ class SimulationEndpointBuffer:
         }
         area.endpoint_stats.update(stats)
 
-    def update_area_aggregated_stats(self, area):
-        self._update_area_stats(area)
-        self._send_results_to_areas(area)
-        for child in area.children:
-            self.update_area_aggregated_stats(child)
+    def update_area_aggregated_stats(self, areas):
+        for area in areas:
+            self._update_area_stats(area)
+            self._send_results_to_areas(area)
 
     def _update_area_stats(self, area):
         if area.current_market is not None:
@@ -167,7 +165,7 @@ class SimulationEndpointBuffer:
         area.stats.update_aggregated_stats({"bills": bills})
 
 
-class CumulativeGridTrades:
+class CumulativeGridTrades(ResultsVisitor):
     def __init__(self):
         self.current_trades = {}
         self.current_trades_redis = {}
@@ -175,25 +173,89 @@ class CumulativeGridTrades:
         self.accumulated_trades = {}
         self.accumulated_trades_redis = {}
         self.accumulated_balancing_trades = {}
+        # area uuid -> (producer names, storage names, child names if the trades of the
+        # area are accumulated to its own entry)
+        self._grid_areas = {}
 
-    def update(self, area):
-        market_type = \
+    @staticmethod
+    def _market_type():
+        return \
             "past_markets" if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS else "current_market"
-        balancing_market_type = "past_balancing_markets" \
-            if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS \
-            else "current_balancing_market"
 
+    def _accumulated_trades_dicts(self):
+        return self.accumulated_trades_redis, self.accumulated_trades
+
+    def update(self, area):
+        walk_area_tree(area, [self])
+
+    def start_walk(self, root_area):
         if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
             self.accumulated_trades = {}
             self.accumulated_trades_redis = {}
             self.accumulated_balancing_trades = {}
+        self._grid_areas = {root_area.uuid: None}
 
-        self.accumulated_trades_redis, self.current_trades_redis = \
-            export_cumulative_grid_trades_redis(area, self.accumulated_trades_redis,
-                                                market_type)
-        self.accumulated_trades, self.current_trades = \
-            export_cumulative_grid_trades(area, self.accumulated_trades,
-                                          market_type, all_devices=True)
-        self.accumulated_balancing_trades, self.current_balancing_trades = \
-            export_cumulative_grid_trades(area, self.accumulated_balancing_trades,
-                                          balancing_market_type)
+    def enter_area(self, area):
+        if area.uuid not in self._grid_areas:
+            return
+        child_names = self._grid_areas[area.uuid]
+        producer_names, storage_names = set(), set()
+        for child in area.children:
+            for accumulated_trades in self._accumulated_trades_dicts():
+                if _is_cell_tower_node(child):
+                    _accumulate_load_trades(child, area, accumulated_trades, is_cell_tower=True,
+                                            past_market_types=self._market_type())
+                if _is_load_node(child):
+                    _accumulate_load_trades(child, area, accumulated_trades,
+                                            is_cell_tower=False,
+                                            past_market_types=self._market_type())
+            if _is_producer_node(child):
+                for accumulated_trades in self._accumulated_trades_dicts():
+                    _create_producer_entry(child, accumulated_trades)
+                producer_names.add(child.name)
+            elif _is_prosumer_node(child) or _is_buffer_node(child):
+                for accumulated_trades in self._accumulated_trades_dicts():
+                    _create_storage_entry(child, area, accumulated_trades)
+                storage_names.add(child.name)
+            elif child.children:
+                for accumulated_trades in self._accumulated_trades_dicts():
+                    _create_area_entry(child, accumulated_trades)
+                self._grid_areas[child.uuid] = \
+                    {area_name_from_area_or_iaa_name(c.name) for c in child.children}
+        self._grid_areas[area.uuid] = (producer_names, storage_names, child_names)
+
+    def visit_trade(self, area, market, trade, seller, buyer):
+        grid_area = self._grid_areas.get(area.uuid)
+        if grid_area is None:
+            return
+        producer_names, storage_names, child_names = grid_area
+        offer_seller = trade.offer.seller
+        for accumulated_trades in self._accumulated_trades_dicts():
+            if offer_seller in producer_names:
+                _accumulate_produced_trade(accumulated_trades, offer_seller, trade)
+            if trade.buyer in storage_names:
+                _accumulate_consumed_trade(accumulated_trades, trade.buyer, trade, seller)
+            if offer_seller in storage_names and offer_seller != trade.buyer:
+                _accumulate_produced_trade(accumulated_trades, offer_seller, trade)
+            if child_names is not None:
+                _accumulate_area_trade(area, child_names, trade, seller, buyer,
+                                       accumulated_trades)
+
+    def leave_area(self, area):
+        grid_area = self._grid_areas.get(area.uuid)
+        if grid_area is None or grid_area[2] is None:
+            return
+        for accumulated_trades in self._accumulated_trades_dicts():
+            _area_trade_from_parent(area, area.parent, accumulated_trades, self._market_type())
+
+    def finish_walk(self, root_area):
+        self._grid_areas = {}
+        self.current_trades_redis = generate_cumulative_grid_trades_for_all_areas(
+            self.accumulated_trades_redis, root_area, {})
+        self.current_trades = export_accumulated_grid_trades(self.accumulated_trades)
+        if ConstSettings.BalancingSettings.ENABLE_BALANCING_MARKET:
+            balancing_market_type = "past_balancing_markets" \
+                if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS \
+                else "current_balancing_market"
+            self.accumulated_balancing_trades, self.current_balancing_trades = \
+                export_cumulative_grid_trades(root_area, balancing_market_type)
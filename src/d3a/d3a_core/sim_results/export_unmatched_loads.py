@@ -21,6 +21,7 @@ from d3a.models.strategy.load_hours import LoadHoursStrategy
 from d3a_interface.constants_limits import GlobalConfig, ConstSettings
 from d3a.constants import DATE_TIME_FORMAT, FLOATING_POINT_TOLERANCE
 from d3a_interface.sim_results.aggregate_results import merge_unmatched_load_results_to_global
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
 
 DATE_HOUR_FORMAT = "YYYY-MM-DDTHH"
 
@@ -43,7 +44,7 @@ def hour_list():
         return [GlobalConfig.start_date.add(hours=hour) for hour in range(24)]
 
 
-class ExportUnmatchedLoads:
+class ExportUnmatchedLoads(ResultsVisitor):
     def __init__(self, area):
 
         self.hour_list = hour_list()
@@ -53,6 +54,11 @@ class ExportUnmatchedLoads:
         self.area = area
         self.load_count = 0
         self.count_load_devices_in_setup(self.area)
+        self.all_past_markets = False
+        self._root_area = None
+        self._unmatched_loads = {}
+        # area uuid -> unmatched loads of the children of the area
+        self._area_unmatched_loads = {}
 
     def _set_latest_time_slot(self):
         # This is for only returning data until the current time_slot:
@@ -73,41 +79,52 @@ class ExportUnmatchedLoads:
                 self.count_load_devices_in_setup(child)
 
     def get_current_market_results(self, all_past_markets=False):
+        self.all_past_markets = all_past_markets
+        walk_area_tree(self.area, [self])
+        return self.current_market_results()
+
+    def current_market_results(self):
+        """Unmatched loads of the last walk of the area tree"""
         self._set_latest_time_slot()
         unmatched_loads = self.arrange_output(self.append_device_type(
             self.expand_to_ul_to_hours(
                 self.expand_ul_to_parents(
-                    self.find_unmatched_loads(self.area, {}, all_past_markets)[self.area.name],
-                    self.area.name, {}
+                    self._unmatched_loads[self.area.name], self.area.name, {}
                 ))), self.area)
 
         return unmatched_loads, self.change_name_to_uuid(unmatched_loads)
 
-    def find_unmatched_loads(self, area, indict, all_past_markets: bool):
+    def start_walk(self, root_area):
+        self._root_area = root_area
+        self._unmatched_loads = {root_area.name: {}}
+        self._area_unmatched_loads = {root_area.uuid: self._unmatched_loads[root_area.name]}
+
+    def enter_area(self, area):
         """
         Aggregates list of times for each unmatched time slot for each load
         """
-        indict[area.name] = {}
+        if area is not self._root_area:
+            self.name_uuid_map[area.name] = area.uuid
+            self.name_type_map[area.name] = area.display_type
+        indict = self._area_unmatched_loads.pop(area.uuid, None)
+        if indict is None:
+            return
         for child in area.children:
-            self.name_uuid_map[child.name] = child.uuid
-            self.name_type_map[child.name] = child.display_type
             if child.children:
-                indict[area.name] = self.find_unmatched_loads(
-                    child, indict[area.name], all_past_markets
-                )
+                indict[child.name] = {}
+                self._area_unmatched_loads[child.uuid] = indict[child.name]
             else:
                 if isinstance(child.strategy, LoadHoursStrategy):
                     current_market = [child.parent.current_market] \
                         if child.parent.current_market is not None \
                         else []
-                    indict[area.name][child.name] = \
+                    indict[child.name] = \
                         self._calculate_unmatched_loads_leaf_area(
                             child,
                             child.parent.past_markets
-                            if all_past_markets is True
+                            if self.all_past_markets is True
                             else current_market
                         )
-        return indict
 
     @classmethod
     def _calculate_unmatched_loads_leaf_area(cls, area, markets):
@@ -228,7 +245,7 @@ class ExportUnmatchedLoads:
         return indict
 
 
-class MarketUnmatchedLoads:
+class MarketUnmatchedLoads(ResultsVisitor):
     """
     This class is used for storing the current unmatched load results and to update them
     with new results whenever a market has been completed. It works in conjunction
@@ -243,8 +260,6 @@ class MarketUnmatchedLoads:
     def write_none_to_unmatched_loads(self, area):
         self.unmatched_loads[area.name] = None
         self.last_unmatched_loads[area.uuid] = None
-        for child in area.children:
-            self.write_none_to_unmatched_loads(child)
 
     def merge_unmatched_loads(self, current_results):
         """
@@ -258,15 +273,28 @@ class MarketUnmatchedLoads:
         )
 
     def update_unmatched_loads(self, area):
+        walk_area_tree(area, [self])
+
+    def start_walk(self, root_area):
+        if self.export_unmatched_loads.load_count > 0:
+            self.export_unmatched_loads.all_past_markets = \
+                ConstSettings.GeneralSettings.KEEP_PAST_MARKETS
+            self.export_unmatched_loads.start_walk(root_area)
+
+    def enter_area(self, area):
         if self.export_unmatched_loads.load_count == 0:
             self.write_none_to_unmatched_loads(area)
         else:
-            current_results, current_results_uuid = \
-                self.export_unmatched_loads.get_current_market_results(
-                    all_past_markets=ConstSettings.GeneralSettings.KEEP_PAST_MARKETS)
+            self.export_unmatched_loads.enter_area(area)
 
-            self.last_unmatched_loads = current_results_uuid
-            if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
-                self.unmatched_loads = current_results
-            else:
-                self.merge_unmatched_loads(current_results)
+    def finish_walk(self, root_area):
+        if self.export_unmatched_loads.load_count == 0:
+            return
+        current_results, current_results_uuid = \
+            self.export_unmatched_loads.current_market_results()
+
+        self.last_unmatched_loads = current_results_uuid
+        if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
+            self.unmatched_loads = current_results
+        else:
+            self.merge_unmatched_loads(current_results)
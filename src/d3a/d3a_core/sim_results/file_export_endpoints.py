@@ -21,16 +21,18 @@ from d3a.models.strategy.predefined_load import DefinedLoadStrategy
 from d3a.models.strategy.storage import StorageStrategy
 from d3a.models.strategy.pv import PVStrategy
 from d3a.constants import FLOATING_POINT_TOLERANCE
-from d3a.d3a_core.util import generate_market_slot_list, round_floats_for_ui, \
-    area_name_from_area_or_iaa_name
+from d3a.d3a_core.util import generate_market_slot_list, round_floats_for_ui
+from d3a.models.market.trade_index import trades_with_area_names
 from d3a_interface.constants_limits import ConstSettings
 from d3a_interface.sim_results.aggregate_results import merge_energy_trade_profile_to_global
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
 from copy import copy
 
 
-class FileExportEndpoints:
-    def __init__(self, should_export_plots):
+class FileExportEndpoints(ResultsVisitor):
+    def __init__(self, should_export_plots, trade_ledger):
         self._should_export_plots = should_export_plots
+        self._trade_ledger = trade_ledger
         self.traded_energy = {}
         self.traded_energy_profile = {}
         self.traded_energy_current = {}
@@ -42,32 +44,40 @@ class FileExportEndpoints:
         self.cumulative_bids = {}
         self.clearing = {}
         self.last_energy_trades_high_resolution = {}
+        # area uuid -> trades of the current market of the area with the area names of their
+        # seller and buyer, collected by visit_trade if KEEP_PAST_MARKETS is not set
+        self._current_market_trades = {}
 
     def __call__(self, area):
-        self.time_slots = generate_market_slot_list(area)
+        walk_area_tree(area, [self._trade_ledger, self])
+
+    def start_walk(self, root_area):
+        self.time_slots = generate_market_slot_list(root_area)
         # Resetting traded energy before repopulating it
         self.traded_energy_current = {}
-        self._populate_area_children_data(area)
-        self.traded_energy_current = self._round_energy_trade_profile(self.traded_energy_current)
+        self._current_market_trades = {}
 
-    def _populate_area_children_data(self, area):
-        if area.children:
-            for child in area.children:
-                self._populate_area_children_data(child)
+    def visit_trade(self, area, market, trade, seller, buyer):
+        if not ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
+            self._current_market_trades.setdefault(area.uuid, []).append(
+                (trade, (seller, buyer)))
 
+    def leave_area(self, area):
         self.last_energy_trades_high_resolution[area.uuid] = area.stats.market_trades
         if self._should_export_plots:
             self.update_plot_stats(area)
         if area.children:
             self.update_sold_bought_energy(area)
 
+    def finish_walk(self, root_area):
+        self.traded_energy_current = self._round_energy_trade_profile(self.traded_energy_current)
+
     def generate_market_export_data(self, area, is_balancing_market):
         return ExportBalancingData(area) if is_balancing_market else ExportData.create(area)
 
     def update_sold_bought_energy(self, area: Area):
         if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
-            self.traded_energy[area.uuid] = \
-                self._calculate_devices_sold_bought_energy_past_markets(area, area.past_markets)
+            self.traded_energy[area.uuid] = self._calculate_devices_sold_bought_energy_ledger(area)
             self.traded_energy[area.name] = self.traded_energy[area.uuid]
             self.balancing_traded_energy[area.name] = \
                 self._calculate_devices_sold_bought_energy_past_markets(
@@ -76,6 +86,8 @@ class FileExportEndpoints:
             self.traded_energy_profile[area.slug] = \
                 self._serialize_traded_energy_lists(self.traded_energy, area.uuid)
         else:
+            # The walk streams the trades of the current market, i.e. the last past market
+            current_trades = self._current_market_trades.get(area.uuid, [])
 
             # Calculates current market traded energy
             if area.uuid not in self.traded_energy_current:
@@ -83,7 +95,7 @@ class FileExportEndpoints:
             if area.current_market is not None:
                 self.time_slots = [area.current_market.time_slot]
                 self._calculate_devices_sold_bought_energy(self.traded_energy_current[area.uuid],
-                                                           area.current_market)
+                                                           area.current_market, current_trades)
                 self.traded_energy_current[area.uuid] = self._serialize_traded_energy_lists(
                     self.traded_energy_current, area.uuid)
                 self.time_slots = generate_market_slot_list(area)
@@ -94,7 +106,8 @@ class FileExportEndpoints:
                     self.traded_energy_profile[area.slug] = \
                         {"sold_energy": {}, "bought_energy": {}}
                     self._calculate_devices_sold_bought_energy(
-                        self.traded_energy_profile[area.slug], area.current_market)
+                        self.traded_energy_profile[area.slug], area.current_market,
+                        current_trades)
                     self.traded_energy_profile[area.slug] = self._serialize_traded_energy_lists(
                         self.traded_energy_profile, area.slug)
                 else:
@@ -108,7 +121,7 @@ class FileExportEndpoints:
                 if area.uuid not in self.traded_energy:
                     self.traded_energy[area.uuid] = {"sold_energy": {}, "bought_energy": {}}
                 self._calculate_devices_sold_bought_energy(self.traded_energy[area.uuid],
-                                                           area.current_market)
+                                                           area.current_market, current_trades)
                 self.traded_energy[area.name] = self.traded_energy[area.uuid]
                 if area.name not in self.balancing_traded_energy:
                     self.balancing_traded_energy[area.name] = {"sold_energy": {},
@@ -163,16 +176,17 @@ class FileExportEndpoints:
             self._get_stats_from_market_data(self.plot_balancing_stats, area, True)
         self._populate_plots_stats_for_supply_demand_curve(area)
 
-    def _calculate_devices_sold_bought_energy(self, res_dict, market):
+    def _calculate_devices_sold_bought_energy(self, res_dict, market, trades=None):
+        """
+        Adds the energy of the trades of market to res_dict. trades are the trades of market
+        with the area names of their seller and buyer, they are resolved if they are not given.
+        """
         if market is None:
             return
+        if trades is None:
+            trades = trades_with_area_names(market)
 
-        for trade in market.trades:
-            trade_seller = trade.seller[4:] if trade.seller.startswith("IAA ") \
-                else trade.seller
-            trade_buyer = trade.buyer[4:] if trade.buyer.startswith("IAA ") \
-                else trade.buyer
-
+        for trade, (trade_seller, trade_buyer) in trades:
             if trade_seller not in res_dict["sold_energy"]:
                 res_dict["sold_energy"][trade_seller] = {}
                 res_dict["sold_energy"][trade_seller]["accumulated"] = dict(
@@ -211,13 +225,55 @@ class FileExportEndpoints:
                 res_dict[ks + "_lists"][node]["energy"] = \
                     list(res_dict[ks][node]["accumulated"].values())
 
+    def _calculate_devices_sold_bought_energy_ledger(self, area):
+        """
+        Same as _calculate_devices_sold_bought_energy_past_markets for the past markets of
+        area, aggregated from the trades of the markets of area in the trade ledger
+        """
+        ledger = self._trade_ledger
+        rows = ledger.rows_of_market_area(area.name)
+        area_name_ids = ledger.area_name_ids
+        sellers = area_name_ids[ledger.column("seller")[rows]]
+        buyers = area_name_ids[ledger.column("buyer")[rows]]
+        time_slots = ledger.column("time_slot")[rows]
+        energy = ledger.column("energy")[rows]
+        slot_ids = [(market.time_slot, ledger.time_slot_id(market.time_slot))
+                    for market in area.past_markets]
+        out_dict = {
+            "sold_energy": self._ledger_energy_profile(
+                ledger, sellers, buyers, time_slots, energy, slot_ids),
+            "bought_energy": self._ledger_energy_profile(
+                ledger, buyers, sellers, time_slots, energy, slot_ids),
+        }
+        self._add_sold_bought_lists(out_dict)
+        return out_dict
+
+    @staticmethod
+    def _ledger_energy_profile(ledger, nodes, targets, time_slots, energy, slot_ids):
+        """
+        Energy profiles per node (accumulated and per target) in the order the nodes and
+        targets first traded. Profile entries without trades stay 0.
+        """
+        traded = energy > FLOATING_POINT_TOLERANCE
+        accumulated = ledger.group_sums(
+            (nodes[traded], time_slots[traded]), energy[traded])
+        per_target = ledger.group_sums(
+            (nodes[traded], targets[traded], time_slots[traded]), energy[traded])
+        profile = {}
+        for node, in ledger.first_occurrences((nodes, )):
+            profile[ledger.names[node]] = {"accumulated": {
+                time_slot: accumulated.get((node, slot_id), 0)
+                for time_slot, slot_id in slot_ids}}
+        for node, target in ledger.first_occurrences((nodes, targets)):
+            profile[ledger.names[node]][ledger.names[target]] = {
+                time_slot: per_target.get((node, target, slot_id), 0)
+                for time_slot, slot_id in slot_ids}
+        return profile
+
     def _calculate_devices_sold_bought_energy_past_markets(self, area, past_markets):
         out_dict = {"sold_energy": {}, "bought_energy": {}}
         for market in past_markets:
-            for trade in market.trades:
-                trade_seller = area_name_from_area_or_iaa_name(trade.seller)
-                trade_buyer = area_name_from_area_or_iaa_name(trade.buyer)
-
+            for trade, (trade_seller, trade_buyer) in trades_with_area_names(market):
                 if trade_seller not in out_dict["sold_energy"]:
                     out_dict["sold_energy"][trade_seller] = {}
                     out_dict["sold_energy"][trade_seller]["accumulated"] = dict(
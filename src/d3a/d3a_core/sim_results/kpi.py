@@ -15,71 +15,86 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+from typing import Dict, List  # noqa
+from d3a.models.area import Area  # noqa
 from d3a.models.strategy.infinite_bus import InfiniteBusStrategy
-from d3a.d3a_core.util import if_not_in_list_append
 from d3a.d3a_core.sim_results.area_statistics import _is_load_node, _is_prosumer_node, \
     _is_producer_node
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
 
 
 class KPIState:
+    """
+    The devices below the area are indexed by their role (producer, consumer, ESS, buffer)
+    in sets of their names, see accumulate_devices. Devices are never removed from the
+    index, as the trades of the past markets might still refer to them.
+    """
+
     def __init__(self):
-        self.producer_list = list()
-        self.consumer_list = list()
-        self.areas_to_trace_list = list()
-        self.ess_list = list()
-        self.buffer_list = list()
+        self.producer_set = set()
+        self.consumer_set = set()
+        self.ess_set = set()
+        self.buffer_set = set()
+        # Parents of the producers and consumers, whose markets are traced
+        self.areas_to_trace = {}  # type: Dict[Area, None]
+        # Loads that are currently below the area
+        self.load_areas = []  # type: List[Area]
         self.total_energy_demanded_wh = 0
         self.demanded_buffer_wh = 0
         self.total_energy_produced_wh = 0
         self.total_self_consumption_wh = 0
         self.self_consumption_buffer_wh = 0
+        # Traced area -> time slot of the last market whose trades were accounted
         self.accounted_markets = {}
 
     def accumulate_devices(self, area):
+        self.load_areas = []
+        self._accumulate_devices(area)
+
+    def _accumulate_devices(self, area):
         for child in area.children:
+            if _is_load_node(child):
+                self.load_areas.append(child)
             if _is_producer_node(child) and type(child.strategy) is not InfiniteBusStrategy:
-                if_not_in_list_append(self.producer_list, child.name)
-                if_not_in_list_append(self.areas_to_trace_list, child.parent)
+                self.producer_set.add(child.name)
+                self.areas_to_trace[child.parent] = None
             elif _is_load_node(child):
-                if_not_in_list_append(self.consumer_list, child.name)
-                if_not_in_list_append(self.areas_to_trace_list, child.parent)
+                self.consumer_set.add(child.name)
+                self.areas_to_trace[child.parent] = None
             elif _is_prosumer_node(child):
-                if_not_in_list_append(self.ess_list, child.name)
+                self.ess_set.add(child.name)
             elif isinstance(child.strategy, InfiniteBusStrategy):
-                if_not_in_list_append(self.buffer_list, child.name)
+                self.buffer_set.add(child.name)
             if child.children:
-                self.accumulate_devices(child)
+                self._accumulate_devices(child)
 
-    def _accumulate_total_energy_demanded(self, area):
-        for child in area.children:
-            if _is_load_node(child):
-                self.total_energy_demanded_wh += child.strategy.state.total_energy_demanded_wh
-            if child.children:
-                self._accumulate_total_energy_demanded(child)
+    def _accumulate_total_energy_demanded(self):
+        for load_area in self.load_areas:
+            self.total_energy_demanded_wh += load_area.strategy.state.total_energy_demanded_wh
 
     def _accumulate_self_production(self, trade):
         # Trade seller origin should be equal to the trade seller in order to
         # not double count trades in higher hierarchies
-        if trade.seller_origin in self.producer_list and trade.seller_origin == trade.seller:
+        if trade.seller_origin in self.producer_set and trade.seller_origin == trade.seller:
             self.total_energy_produced_wh += trade.offer.energy * 1000
 
     def _accumulate_self_consumption(self, trade):
         # Trade buyer origin should be equal to the trade buyer in order to
         # not double count trades in higher hierarchies
-        if trade.seller_origin in self.producer_list and \
-                trade.buyer_origin in self.consumer_list and \
+        if trade.seller_origin in self.producer_set and \
+                trade.buyer_origin in self.consumer_set and \
                 trade.buyer_origin == trade.buyer:
             self.total_self_consumption_wh += trade.offer.energy * 1000
 
     def _accumulate_self_consumption_buffer(self, trade):
-        if trade.seller_origin in self.producer_list and trade.buyer_origin in self.ess_list:
+        if trade.seller_origin in self.producer_set and trade.buyer_origin in self.ess_set:
             self.self_consumption_buffer_wh += trade.offer.energy * 1000
 
     def _dissipate_self_consumption_buffer(self, trade):
-        if trade.seller_origin in self.ess_list:
+        if trade.seller_origin in self.ess_set:
             # self_consumption_buffer needs to be exhausted to total_self_consumption
             # if sold to internal consumer
-            if trade.buyer_origin in self.consumer_list and \
+            if trade.buyer_origin in self.consumer_set and \
                     trade.buyer_origin == trade.buyer and \
                     self.self_consumption_buffer_wh > 0:
                 if (self.self_consumption_buffer_wh - trade.offer.energy * 1000) > 0:
@@ -89,7 +104,8 @@ class KPIState:
                     self.total_self_consumption_wh += self.self_consumption_buffer_wh
                     self.self_consumption_buffer_wh = 0
             # self_consumption_buffer needs to be exhausted if sold to any external agent
-            elif trade.buyer_origin not in [*self.ess_list, *self.consumer_list] and \
+            elif trade.buyer_origin not in self.ess_set and \
+                    trade.buyer_origin not in self.consumer_set and \
                     trade.buyer_origin == trade.buyer and \
                     self.self_consumption_buffer_wh > 0:
                 if (self.self_consumption_buffer_wh - trade.offer.energy * 1000) > 0:
@@ -105,8 +121,8 @@ class KPIState:
         * total_energy_produced_wh also needs to accumulated accounting of what
         the InfiniteBus has produced.
         """
-        if trade.seller_origin in self.buffer_list and \
-                trade.buyer_origin in self.consumer_list and \
+        if trade.seller_origin in self.buffer_set and \
+                trade.buyer_origin in self.consumer_set and \
                 trade.buyer_origin == trade.buyer:
             self.total_self_consumption_wh += trade.offer.energy * 1000
             self.total_energy_produced_wh += trade.offer.energy * 1000
@@ -119,18 +135,24 @@ class KPIState:
         demanded_buffer_wh also needs to accumulated accounting of what
         the InfiniteBus has consumed/demanded.
         """
-        if trade.buyer_origin in self.buffer_list and trade.seller_origin in self.producer_list:
+        if trade.buyer_origin in self.buffer_set and trade.seller_origin in self.producer_set:
             self.total_self_consumption_wh += trade.offer.energy * 1000
             self.demanded_buffer_wh += trade.offer.energy * 1000
 
+    def _new_markets(self, c_area):
+        """Past markets of the area that were closed since its trades were last accounted"""
+        last_accounted_slot = self.accounted_markets.get(c_area)
+        new_markets = []
+        for market in reversed(c_area.past_markets):
+            if last_accounted_slot is not None and market.time_slot <= last_accounted_slot:
+                break
+            new_markets.append(market)
+        return new_markets[::-1]
+
     def _accumulate_energy_trace(self):
-        for c_area in self.areas_to_trace_list:
-            if c_area not in self.accounted_markets:
-                self.accounted_markets[c_area] = []
-            for market in c_area.past_markets:
-                if market.time_slot_str in self.accounted_markets[c_area]:
-                    continue
-                self.accounted_markets[c_area].append(market.time_slot_str)
+        for c_area in self.areas_to_trace:
+            for market in self._new_markets(c_area):
+                self.accounted_markets[c_area] = market.time_slot
                 for trade in market.trades:
                     self._accumulate_self_consumption(trade)
                     self._accumulate_self_production(trade)
@@ -139,27 +161,29 @@ class KPIState:
                     self._accumulate_infinite_consumption(trade)
                     self._dissipate_infinite_consumption(trade)
 
-    def update_area_kpi(self, area):
+    def update_area_kpi(self):
         self.total_energy_demanded_wh = 0
-        self._accumulate_total_energy_demanded(area)
+        self._accumulate_total_energy_demanded()
         self._accumulate_energy_trace()
 
 
-class KPI:
+class KPI(ResultsVisitor):
     def __init__(self):
         self.performance_indices = dict()
         self.performance_indices_redis = dict()
         self.state = {}
+        self._root_area = None
+        self._kpi_areas = []
+        self._topology = []
+        # (uuid, name, number of children, strategy type) of the areas in pre-order, as of the
+        # last time the devices were indexed
+        self._indexed_topology = None
 
     def __repr__(self):
         return f"KPI: {self.performance_indices}"
 
     def area_performance_indices(self, area):
-        if area.name not in self.state:
-            self.state[area.name] = KPIState()
-        self.state[area.name].accumulate_devices(area)
-
-        self.state[area.name].update_area_kpi(area)
+        self.state[area.name].update_area_kpi()
         self.state[area.name].total_demand = \
             self.state[area.name].total_energy_demanded_wh + \
             self.state[area.name].demanded_buffer_wh
@@ -208,10 +232,32 @@ class KPI:
                 }
 
     def update_kpis_from_area(self, area):
-        self.performance_indices[area.name] = \
-            self.area_performance_indices(area)
-        self.performance_indices_redis[area.uuid] = self._kpi_ratio_to_percentage(area.name)
+        walk_area_tree(area, [self])
 
-        for child in area.children:
-            if len(child.children) > 0:
-                self.update_kpis_from_area(child)
+    def _index_devices(self):
+        for area in self._kpi_areas:
+            if area.name not in self.state:
+                self.state[area.name] = KPIState()
+            self.state[area.name].accumulate_devices(area)
+
+    def start_walk(self, root_area):
+        self._root_area = root_area
+        self._kpi_areas = []
+        self._topology = []
+
+    def enter_area(self, area):
+        self._topology.append(
+            (area.uuid, area.name, len(area.children), type(area.strategy)))
+        if area is not self._root_area and len(area.children) == 0:
+            return
+        self._kpi_areas.append(area)
+
+    def finish_walk(self, root_area):
+        if self._topology != self._indexed_topology:
+            self._index_devices()
+            self._indexed_topology = self._topology
+        for area in self._kpi_areas:
+            self.performance_indices[area.name] = \
+                self.area_performance_indices(area)
+            self.performance_indices_redis[area.uuid] = \
+                self._kpi_ratio_to_percentage(area.name)
@@ -0,0 +1,104 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from d3a_interface.constants_limits import ConstSettings
+from d3a.models.market.trade_index import trades_with_area_names
+
+
+def _get_past_markets_from_area(area, past_market_types):
+    if not hasattr(area, past_market_types) or getattr(area, past_market_types) is None:
+        return []
+    if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
+        return getattr(area, past_market_types)
+    else:
+        if len(getattr(area, past_market_types)) < 1:
+            return []
+        return [getattr(area, past_market_types)[-1]]
+
+
+class ResultsVisitor:
+    """
+    Results that are updated by a single walk of the area tree per market slot, see
+    walk_area_tree. All hooks are no-ops, the results override the ones they need.
+    """
+
+    def start_walk(self, root_area):
+        pass
+
+    def enter_area(self, area):
+        """Called for every area in pre-order, before the trades of the area"""
+        pass
+
+    def enter_market(self, area, market):
+        """Called for every market of the slot of the area, before the trades of the market"""
+        pass
+
+    def visit_trade(self, area, market, trade, seller, buyer):
+        """
+        Called for every trade of the market, seller and buyer are the area names of the seller
+        and buyer of the trade (see area_name_from_area_or_iaa_name)
+        """
+        pass
+
+    def leave_area(self, area):
+        """Called for every area in post-order, after all areas below it have been left"""
+        pass
+
+    def finish_walk(self, root_area):
+        pass
+
+
+def _overridden_hooks(visitors, hook_name):
+    default_hook = getattr(ResultsVisitor, hook_name)
+    return [getattr(visitor, hook_name) for visitor in visitors
+            if getattr(type(visitor), hook_name) is not default_hook]
+
+
+def walk_area_tree(root_area, visitors):
+    """
+    Walks the area tree once and streams each trade of the markets of the slot (all past
+    markets if KEEP_PAST_MARKETS is set, the last past market otherwise) to the visitors, in
+    the order of the visitors. Returns the areas of the tree in pre-order.
+    """
+    start_walk, enter_area, enter_market, visit_trade, leave_area, finish_walk = (
+        _overridden_hooks(visitors, hook_name)
+        for hook_name in ("start_walk", "enter_area", "enter_market", "visit_trade",
+                          "leave_area", "finish_walk"))
+    areas = []
+
+    def _walk(area):
+        areas.append(area)
+        for hook in enter_area:
+            hook(area)
+        if enter_market or visit_trade:
+            for market in _get_past_markets_from_area(area, "past_markets"):
+                for hook in enter_market:
+                    hook(area, market)
+                for trade, (seller, buyer) in trades_with_area_names(market):
+                    for hook in visit_trade:
+                        hook(area, market, trade, seller, buyer)
+        for child in area.children:
+            _walk(child)
+        for hook in leave_area:
+            hook(area)
+
+    for hook in start_walk:
+        hook(root_area)
+    _walk(root_area)
+    for hook in finish_walk:
+        hook(root_area)
+    return areas
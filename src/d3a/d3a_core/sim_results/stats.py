@@ -16,13 +16,15 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from copy import deepcopy
-from itertools import chain
 from d3a.d3a_core.util import round_floats_for_ui
 from d3a.d3a_core.util import area_name_from_area_or_iaa_name
 from d3a_interface.constants_limits import ConstSettings
 from d3a.models.strategy.load_hours import LoadHoursStrategy
 from d3a.models.strategy.pv import PVStrategy
 from d3a.constants import DEVICE_PENALTY_RATE
+from d3a.models.market.trade_index import trades_with_area_names
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree, \
+    _get_past_markets_from_area
 
 
 def recursive_current_markets(area):
@@ -32,17 +34,6 @@ def recursive_current_markets(area):
             yield from recursive_current_markets(child)
 
 
-def _get_past_markets_from_area(area, past_market_types):
-    if not hasattr(area, past_market_types) or getattr(area, past_market_types) is None:
-        return []
-    if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
-        return getattr(area, past_market_types)
-    else:
-        if len(getattr(area, past_market_types)) < 1:
-            return []
-        return [getattr(area, past_market_types)[-1]]
-
-
 def primary_trades(markets):
     """
     We want to avoid counting trades between different areas multiple times
@@ -68,9 +59,11 @@ def total_avg_trade_price(markets):
     )
 
 
-class CumulativeBills:
-    def __init__(self):
+class CumulativeBills(ResultsVisitor):
+    def __init__(self, trade_ledger):
         self.cumulative_bills_results = {}
+        self._trade_ledger = trade_ledger
+        self._areas = []
 
     def _calculate_device_penalties(self, area):
         if len(area.children) > 0:
@@ -101,9 +94,35 @@ class CumulativeBills:
         }
 
     def update_cumulative_bills(self, area):
-        for child in area.children:
-            self.update_cumulative_bills(child)
+        walk_area_tree(area, [self._trade_ledger, self])
+
+    def _trade_sums(self):
+        """
+        Money spent and earned per (market area, trader) name ids in the trades of the ledger
+        """
+        ledger = self._trade_ledger
+        price, fee_price = ledger.column("price"), ledger.column("fee_price")
+        if ConstSettings.IAASettings.MARKET_TYPE == 1:
+            spent, earned = price + fee_price, price
+        else:
+            spent, earned = price, price - fee_price
+        market_areas = ledger.column("market_area")
+        return (ledger.group_sums((market_areas, ledger.column("buyer")), spent),
+                ledger.group_sums((market_areas, ledger.column("seller")), earned))
+
+    def start_walk(self, root_area):
+        self._areas = []
+
+    def leave_area(self, area):
+        self._areas.append(area)
+
+    def finish_walk(self, root_area):
+        spent_sums, earned_sums = self._trade_sums()
+        for area in self._areas:
+            self._update_area_bills(area, spent_sums, earned_sums)
+        self._areas = []
 
+    def _update_area_bills(self, area, spent_sums, earned_sums):
         if area.uuid not in self.cumulative_bills_results or \
                 ConstSettings.GeneralSettings.KEEP_PAST_MARKETS is True:
             self.cumulative_bills_results[area.uuid] = {
@@ -129,24 +148,10 @@ class CumulativeBills:
                 "total": sum(c["total"] for c in all_child_results),
             }
         else:
-            trades = [m.trades
-                      for m in _get_past_markets_from_area(area.parent, "past_markets")]
-            trades = list(chain(*trades))
-
-            if ConstSettings.IAASettings.MARKET_TYPE == 1:
-                spent_total = sum(trade.offer.price + trade.fee_price
-                                  for trade in trades
-                                  if trade.buyer == area.name) / 100.0
-                earned = sum(trade.offer.price
-                             for trade in trades
-                             if trade.seller == area.name) / 100.0
-            else:
-                spent_total = sum(trade.offer.price
-                                  for trade in trades
-                                  if trade.buyer == area.name) / 100.0
-                earned = sum(trade.offer.price - trade.fee_price
-                             for trade in trades
-                             if trade.seller == area.name) / 100.0
+            trader_key = (self._trade_ledger.name_id(area.parent.name),
+                          self._trade_ledger.name_id(area.name))
+            spent_total = spent_sums.get(trader_key, 0) / 100.0
+            earned = earned_sums.get(trader_key, 0) / 100.0
             penalty_energy = self._calculate_device_penalties(area)
             if penalty_energy is None:
                 penalty_energy = 0.0
@@ -159,13 +164,15 @@ class CumulativeBills:
             self.cumulative_bills_results[area.uuid]["total"] += total
 
 
-class MarketEnergyBills:
+class MarketEnergyBills(ResultsVisitor):
     def __init__(self, is_spot_market=True):
         self.is_spot_market = is_spot_market
         self.bills_results = {}
         self.bills_redis_results = {}
         self.market_fees = {}
         self.external_trades = {}
+        self._area_bills = {}
+        self._flattened_bills = {}
 
     def _store_bought_trade(self, result_dict, trade):
         # Division by 100 to convert cents to Euros
@@ -250,42 +257,26 @@ class MarketEnergyBills:
                         self.bills_results[area.name][child.name]
             return self.bills_results[area.name]
 
-    def _energy_bills(self, area, past_market_types):
+    def _store_trade(self, area, trade, seller, buyer):
         """
-        Return a bill for each of area's children with total energy bought
-        and sold (in kWh) and total money earned and spent (in cents).
-        Compute bills recursively for children of children etc.
+        Adds the trade of a market of area to the bills of the children of area and to the
+        external trades of area. seller and buyer are the area names of the seller and buyer of
+        the trade.
         """
-        if not area.children:
-            return None
-
-        if area.name not in self.external_trades or \
-                ConstSettings.GeneralSettings.KEEP_PAST_MARKETS is True:
-            self.external_trades[area.name] = dict(
-                bought=0.0, sold=0.0, spent=0.0, earned=0.0,
-                total_energy=0.0, total_cost=0.0, market_fee=0.0)
-
-        result = self._get_child_data(area)
-        for market in _get_past_markets_from_area(area, past_market_types):
-            for trade in market.trades:
-                buyer = area_name_from_area_or_iaa_name(trade.buyer)
-                seller = area_name_from_area_or_iaa_name(trade.seller)
-                if buyer in result:
-                    self._store_bought_trade(result[buyer], trade)
-                if seller in result:
-                    self._store_sold_trade(result[seller], trade)
-                # Outgoing external trades
-                if buyer == area_name_from_area_or_iaa_name(area.name) and seller in result:
-                    self._store_outgoing_external_trade(trade, area)
-                # Incoming external trades
-                if seller == area_name_from_area_or_iaa_name(area.name) and buyer in result:
-                    self._store_incoming_external_trade(trade, area)
-        for child in area.children:
-            child_result = self._energy_bills(child, past_market_types)
-            if child_result is not None:
-                result[child.name]['children'] = child_result
-
-        return result
+        area_bills = self._area_bills.get(area.uuid)
+        if area_bills is None:
+            return
+        result, area_name = area_bills
+        if buyer in result:
+            self._store_bought_trade(result[buyer], trade)
+        if seller in result:
+            self._store_sold_trade(result[seller], trade)
+        # Outgoing external trades
+        if buyer == area_name and seller in result:
+            self._store_outgoing_external_trade(trade, area)
+        # Incoming external trades
+        if seller == area_name and buyer in result:
+            self._store_incoming_external_trade(trade, area)
 
     def _accumulate_market_fees(self, area, past_market_types):
         if area.name not in self.market_fees:
@@ -293,31 +284,52 @@ class MarketEnergyBills:
         for market in _get_past_markets_from_area(area, past_market_types):
             # Converting cents to Euros
             self.market_fees[area.name] += market.market_fee / 100.0
-        for child in area.children:
-            self._accumulate_market_fees(child, past_market_types)
 
-    def _update_market_fees(self, area, market_type):
+    def start_walk(self, root_area):
         if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
             # If all the past markets remain in memory, reinitialize the market fees
             self.market_fees = {}
-        self._accumulate_market_fees(area, market_type)
+        self._area_bills = {}
+        self._flattened_bills = {}
 
-    def update(self, area):
-        market_type = "past_markets" if self.is_spot_market else "past_balancing_markets"
-        self._update_market_fees(area, market_type)
-        bills = self._energy_bills(area, market_type)
-        flattened = {}
-        self._flatten_energy_bills(bills, flattened)
-        self.bills_results = self._accumulate_by_children(area, flattened, {})
-        self._bills_for_redis(area, deepcopy(self.bills_results))
+    def enter_area(self, area):
+        """
+        Prepares a bill for each of area's children with total energy bought and sold (in kWh)
+        and total money earned and spent (in cents), that the trades of the markets of area
+        are added to.
+        """
+        past_market_types = "past_markets" if self.is_spot_market else "past_balancing_markets"
+        self._accumulate_market_fees(area, past_market_types)
+        if not area.children:
+            return
 
-    @classmethod
-    def _flatten_energy_bills(cls, energy_bills, flat_results):
-        for k, v in energy_bills.items():
-            if "children" in v:
-                cls._flatten_energy_bills(v["children"], flat_results)
-            flat_results[k] = v
-            flat_results[k].pop("children", None)
+        if area.name not in self.external_trades or \
+                ConstSettings.GeneralSettings.KEEP_PAST_MARKETS is True:
+            self.external_trades[area.name] = dict(
+                bought=0.0, sold=0.0, spent=0.0, earned=0.0,
+                total_energy=0.0, total_cost=0.0, market_fee=0.0)
+
+        result = self._get_child_data(area)
+        self._area_bills[area.uuid] = (result, area_name_from_area_or_iaa_name(area.name))
+        self._flattened_bills.update(result)
+        if not self.is_spot_market:
+            for market in _get_past_markets_from_area(area, past_market_types):
+                for trade, (seller, buyer) in trades_with_area_names(market):
+                    self._store_trade(area, trade, seller, buyer)
+
+    def visit_trade(self, area, market, trade, seller, buyer):
+        if self.is_spot_market:
+            self._store_trade(area, trade, seller, buyer)
+
+    def finish_walk(self, root_area):
+        self.bills_results = \
+            self._accumulate_by_children(root_area, self._flattened_bills, {})
+        self._bills_for_redis(root_area, deepcopy(self.bills_results))
+        self._area_bills = {}
+        self._flattened_bills = {}
+
+    def update(self, area):
+        walk_area_tree(area, [self])
 
     def _accumulate_by_children(self, area, flattened, results):
         if not area.children:
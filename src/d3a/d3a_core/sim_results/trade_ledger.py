@@ -0,0 +1,196 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from typing import Dict, List  # noqa
+import numpy as np
+
+from d3a_interface.constants_limits import ConstSettings
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor
+from d3a.d3a_core.util import area_name_from_area_or_iaa_name
+
+NO_ID = -1
+ID_COLUMNS = ("time_slot", "market_area", "seller", "buyer", "seller_origin", "buyer_origin")
+VALUE_COLUMNS = ("energy", "price", "fee_price")
+
+
+class TradeLedger(ResultsVisitor):
+    """
+    Trades of the markets of the slot in columnar NumPy arrays, one row per trade, so that
+    the results can be aggregated with vectorized group-bys instead of looping over the
+    trades. The rows are in the order of the results walk: the markets of an area in time
+    order, and the trades of a market in their order.
+
+    Time slots and names (of the market areas, sellers, buyers and origins) are stored as
+    ids, see time_slot_id and name_id. The seller and buyer ids resolve to the ids of the
+    areas they trade for through area_name_ids. The rows are grouped by market area once
+    after markets were added, see rows_of_market_area.
+
+    If KEEP_PAST_MARKETS is set, the ledger holds the trades of all past markets and every
+    market is added once, otherwise it only holds the trades of the markets of the last walk.
+    """
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self._columns = {column: np.full(capacity, NO_ID, dtype=np.int32)
+                         for column in ID_COLUMNS}
+        self._columns.update({column: np.zeros(capacity, dtype=np.float64)
+                              for column in VALUE_COLUMNS})
+        self.names = []  # type: List[str]
+        self._name_ids = {}  # type: Dict[str, int]
+        self._area_name_ids = np.full(capacity, NO_ID, dtype=np.int32)
+        # (row indices sorted by market area, first sorted row of each market area id), None
+        # if markets were added since the rows were grouped
+        self._market_area_rows = None
+        self.time_slots = []
+        self._time_slot_ids = {}
+        # area uuid -> time slot of the last market of the area added to the ledger
+        self._last_time_slots = {}
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        return self._columns[name][:self.size]
+
+    def name_id(self, name):
+        """Id of the name, None if no trade refers to it"""
+        return self._name_ids.get(name)
+
+    def time_slot_id(self, time_slot):
+        """Id of the time slot, None if no market of the time slot was added"""
+        return self._time_slot_ids.get(time_slot)
+
+    @property
+    def area_name_ids(self):
+        """Name id -> id of the name of the area the participant trades for"""
+        return self._area_name_ids[:len(self.names)]
+
+    def _add_name(self, name):
+        if name is None:
+            return NO_ID
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+            if name_id == len(self._area_name_ids):
+                grown = np.full(max(2 * name_id, 16), NO_ID, dtype=np.int32)
+                grown[:name_id] = self._area_name_ids
+                self._area_name_ids = grown
+            self._area_name_ids[name_id] = \
+                self._add_name(area_name_from_area_or_iaa_name(name))
+        return name_id
+
+    def _add_time_slot(self, time_slot):
+        time_slot_id = self._time_slot_ids.get(time_slot)
+        if time_slot_id is None:
+            time_slot_id = self._time_slot_ids[time_slot] = len(self.time_slots)
+            self.time_slots.append(time_slot)
+        return time_slot_id
+
+    def _reserve(self, row_count):
+        capacity = len(self._columns["energy"])
+        if self.size + row_count <= capacity:
+            return
+        while capacity < self.size + row_count:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.full(capacity, NO_ID, dtype=column.dtype) \
+                if name in ID_COLUMNS else np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._columns[name] = grown
+
+    def add_market(self, area, market):
+        trades = market.trades
+        if not trades:
+            return
+        self._reserve(len(trades))
+        rows = slice(self.size, self.size + len(trades))
+        columns = self._columns
+        columns["time_slot"][rows] = self._add_time_slot(market.time_slot)
+        columns["market_area"][rows] = self._add_name(area.name)
+        columns["seller"][rows] = [self._add_name(t.seller) for t in trades]
+        columns["buyer"][rows] = [self._add_name(t.buyer) for t in trades]
+        columns["seller_origin"][rows] = [self._add_name(t.seller_origin) for t in trades]
+        columns["buyer_origin"][rows] = [self._add_name(t.buyer_origin) for t in trades]
+        columns["energy"][rows] = [t.offer.energy for t in trades]
+        columns["price"][rows] = [t.offer.price for t in trades]
+        columns["fee_price"][rows] = [t.fee_price if t.fee_price is not None else 0.
+                                      for t in trades]
+        self.size += len(trades)
+        self._market_area_rows = None
+
+    def clear(self):
+        self.size = 0
+        self._market_area_rows = None
+
+    def start_walk(self, root_area):
+        if not ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
+            self.clear()
+
+    def enter_market(self, area, market):
+        if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
+            last_time_slot = self._last_time_slots.get(area.uuid)
+            if last_time_slot is not None and market.time_slot <= last_time_slot:
+                return
+            self._last_time_slots[area.uuid] = market.time_slot
+        self.add_market(area, market)
+
+    def rows_of_market_area(self, area_name):
+        """Indices of the rows of the trades of the markets of the area, in row order"""
+        area_id = self.name_id(area_name)
+        if self._market_area_rows is None:
+            market_areas = self.column("market_area")
+            sorted_rows = np.argsort(market_areas, kind="stable")
+            first_rows = np.zeros(len(self.names) + 1, dtype=np.intp)
+            np.cumsum(np.bincount(market_areas, minlength=len(self.names)),
+                      out=first_rows[1:])
+            self._market_area_rows = (sorted_rows, first_rows)
+        sorted_rows, first_rows = self._market_area_rows
+        if area_id is None or area_id + 1 >= len(first_rows):
+            return np.zeros(0, dtype=np.intp)
+        return sorted_rows[first_rows[area_id]:first_rows[area_id + 1]]
+
+    @staticmethod
+    def group_sums(keys, values):
+        """
+        Sums of values grouped by the combination of the id arrays in keys. The values of a
+        group are added in row order, starting from 0., which gives the same result as adding
+        them one by one in a loop. Returns a dict of key tuple -> sum.
+        """
+        if len(values) == 0:
+            return {}
+        keys = [np.asarray(key, dtype=np.int64) for key in keys]
+        dims = [int(key.max()) + 2 for key in keys]
+        # Shifted by one so that NO_ID is a valid index
+        flat_keys = np.ravel_multi_index([key + 1 for key in keys], dims)
+        unique_keys, inverse = np.unique(flat_keys, return_inverse=True)
+        sums = np.bincount(inverse.reshape(-1), weights=values, minlength=len(unique_keys))
+        group_keys = zip(*(key.tolist() for key in np.unravel_index(unique_keys, dims)))
+        return {tuple(key - 1 for key in group_key): group_sum
+                for group_key, group_sum in zip(group_keys, sums.tolist())}
+
+    @staticmethod
+    def first_occurrences(keys):
+        """The distinct combinations of the id arrays in keys, in order of first occurrence"""
+        if len(keys[0]) == 0:
+            return []
+        keys = [np.asarray(key, dtype=np.int64) for key in keys]
+        dims = [int(key.max()) + 2 for key in keys]
+        flat_keys = np.ravel_multi_index([key + 1 for key in keys], dims)
+        _, first_rows = np.unique(flat_keys, return_index=True)
+        first_rows.sort()
+        return list(zip(*(key[first_rows].tolist() for key in keys)))
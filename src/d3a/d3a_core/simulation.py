@@ -247,6 +247,10 @@ class Simulation:
                 break
             else:
                 break
+            finally:
+                # An aborted simulation does not reach export(), keep the rows exported so far
+                if self.export_on_finish and not self.redis_connection.is_enabled():
+                    self.export.close_files()
 
     def _run_cli_execute_cycle(self, slot_resume, tick_resume):
         with NonBlockingConsole() as console:
@@ -36,6 +36,8 @@ class EventMixin:
             return self.event_offer_split
         elif event == MarketEvent.OFFER_DELETED:
             return self.event_offer_deleted
+        elif event == MarketEvent.OFFER_REPRICED:
+            return self.event_offer_repriced
         elif event == MarketEvent.TRADE:
             return self.event_trade
         elif event == MarketEvent.BID_TRADED:
@@ -44,6 +46,8 @@ class EventMixin:
             return self.event_bid_deleted
         elif event == MarketEvent.BID_SPLIT:
             return self.event_bid_split
+        elif event == MarketEvent.BID_REPRICED:
+            return self.event_bid_repriced
         elif event == MarketEvent.BALANCING_OFFER:
             return self.event_balancing_offer
         elif event == MarketEvent.BALANCING_OFFER_SPLIT:
@@ -57,6 +61,16 @@ class EventMixin:
         self.log.trace("Dispatching event %s", event_type.name)
         self._event_mapping(event_type)(**kwargs)
 
+    def event_listener_batch(self, event_type: MarketEvent, market_id, events: List[dict]):
+        """
+        Receives a batch of market events of the same type, in order of occurrence.
+        Handles them one by one, unless overridden.
+        """
+        self.log.trace("Dispatching %d events %s", len(events), event_type.name)
+        event_handler = self._event_mapping(event_type)
+        for kwargs in events:
+            event_handler(market_id=market_id, **kwargs)
+
     def event_tick(self):
         pass
 
@@ -78,6 +92,9 @@ class EventMixin:
     def event_offer_deleted(self, *, market_id, offer):
         pass
 
+    def event_offer_repriced(self, *, market_id, offer):
+        pass
+
     def event_trade(self, *, market_id, trade):
         pass
 
@@ -90,6 +107,9 @@ class EventMixin:
     def event_bid_split(self, *, market_id, original_bid, accepted_bid, residual_bid):
         pass
 
+    def event_bid_repriced(self, *, market_id, bid):
+        pass
+
     def event_balancing_offer(self, *, market_id, offer):
         pass
 
@@ -41,6 +41,8 @@ class MarketEvent(Enum):
     BALANCING_OFFER_SPLIT = 9
     BALANCING_OFFER_DELETED = 10
     BALANCING_TRADE = 11
+    OFFER_REPRICED = 12
+    BID_REPRICED = 13
 
 
 class AreaEvent(Enum):
@@ -203,6 +203,7 @@ class Area:
         self.log.debug('Activating area')
         self.active = True
         self.dispatcher.broadcast_activate()
+        self._deliver_market_events()
         if self.redis_ext_conn is not None:
             self.redis_ext_conn.sub_to_area_event()
 
@@ -264,6 +265,8 @@ class Area:
                 and _trigger_event and ConstSettings.BalancingSettings.ENABLE_BALANCING_MARKET:
             self.dispatcher.broadcast_balancing_market_cycle()
 
+        self._deliver_market_events()
+
         if self.redis_ext_conn is not None:
             self.redis_ext_conn.event_market_cycle()
 
@@ -289,6 +292,14 @@ class Area:
         else:
             self.tick()
             self.dispatcher.broadcast_tick()
+        self._deliver_market_events()
+
+    def _deliver_market_events(self):
+        # In batched market event delivery mode, the root area delivers the events of all
+        # markets once the whole grid has been activated / cycled / ticked
+        if self.parent is None and d3a.constants.MARKET_EVENT_DELIVERY_MODE == \
+                d3a.constants.MARKET_EVENT_DELIVERY_BATCHED:
+            self.dispatcher.deliver_market_events()
 
     def __repr__(self):
         return "<Area '{s.name}' markets: {markets}>".format(
@@ -15,11 +15,11 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
-from numpy.random import random
 from typing import Union, Dict  # noqa
 from logging import getLogger
 from pendulum import DateTime  # noqa
 
+import d3a.constants
 from d3a.events.event_structures import MarketEvent, AreaEvent
 from d3a.models.strategy.area_agents.one_sided_agent import OneSidedAgent
 from d3a.models.strategy.area_agents.one_sided_alternative_pricing_agent import \
@@ -30,6 +30,7 @@ from d3a.models.strategy.area_agents.balancing_agent import BalancingAgent
 from d3a.models.appliance.inter_area import InterAreaAppliance
 from d3a_interface.constants_limits import ConstSettings
 from d3a.d3a_core.util import create_subdict_or_update
+from d3a.d3a_core.dispatch_order import DispatchOrder
 from d3a.models.area.redis_dispatcher.market_event_dispatcher import AreaRedisMarketEventDispatcher
 from d3a.models.area.redis_dispatcher.area_event_dispatcher import RedisAreaEventDispatcher
 from d3a.models.area.redis_dispatcher.market_notify_event_subscriber \
@@ -47,7 +48,12 @@ class AreaDispatcher:
     def __init__(self, area):
         self._inter_area_agents = {}  # type: Dict[DateTime, Dict[str, OneSidedAgent]]
         self._balancing_agents = {}  # type: Dict[DateTime, Dict[str, BalancingAgent]]
+        # Agents of the time slots of the current markets of the area, the ones that receive
+        # the events. Updated by create_area_agents and _delete_past_agents.
+        self._active_inter_area_agents = {}  # type: Dict[DateTime, Dict[str, OneSidedAgent]]
+        self._active_balancing_agents = {}  # type: Dict[DateTime, Dict[str, BalancingAgent]]
         self.area = area
+        self._dispatch_order = DispatchOrder()
 
     @property
     def interarea_agents(self):
@@ -57,11 +63,56 @@ class AreaDispatcher:
     def balancing_agents(self):
         return self._balancing_agents
 
+    @property
+    def active_interarea_agents(self):
+        return self._active_inter_area_agents
+
+    @property
+    def active_balancing_agents(self):
+        return self._active_balancing_agents
+
+    def _active_agents(self):
+        yield from self._active_inter_area_agents.values()
+        yield from self._active_balancing_agents.values()
+
     def broadcast_activate(self, **kwargs):
         return self._broadcast_notification(AreaEvent.ACTIVATE, **kwargs)
 
     def broadcast_tick(self, **kwargs):
-        return self._broadcast_notification(AreaEvent.TICK, **kwargs)
+        """
+        Dispatches the tick event to the subtree of the area, in the same order as
+        _broadcast_notification with event_listener and Area.tick_and_dispatch would, but with
+        an explicit stack instead of recursion.
+        """
+        if not self.area.events.is_enabled:
+            return
+        bottom_to_top = d3a.constants.DISPATCH_EVENTS_BOTTOM_TO_TOP
+        stack = [(self, iter(self._dispatch_order.shuffled(self.area.children)))]
+        while stack:
+            dispatcher, children = stack[-1]
+            child = next(children, None)
+            if child is not None:
+                if not child.dispatcher._should_tick():
+                    continue
+                if not bottom_to_top:
+                    child.tick()
+                # Same as broadcast_tick of the child, its tick can disable its events
+                if child.events.is_enabled:
+                    child_dispatcher = child.dispatcher
+                    stack.append((child_dispatcher, iter(
+                        child_dispatcher._dispatch_order.shuffled(child.children))))
+                continue
+            stack.pop()
+            dispatcher._tick_agents(**kwargs)
+            if not stack:
+                break
+            # The subtree of the area has been ticked, finish its tick. Market events are
+            # delivered by the root area only (see Area._deliver_market_events), therefore
+            # there are none to deliver for children.
+            if bottom_to_top:
+                dispatcher.area.tick()
+            if dispatcher._should_tick():
+                dispatcher._dispatch_to_strategy_appliance(AreaEvent.TICK, **kwargs)
 
     def broadcast_market_cycle(self, **kwargs):
         return self._broadcast_notification(AreaEvent.MARKET_CYCLE, **kwargs)
@@ -73,34 +124,63 @@ class AreaDispatcher:
     def broadcast_callback(self):
         return self._broadcast_notification
 
+    def add_market_listener(self, market):
+        if d3a.constants.MARKET_EVENT_DELIVERY_MODE == \
+                d3a.constants.MARKET_EVENT_DELIVERY_BATCHED:
+            market.add_batch_listener(self._broadcast_notification_batch)
+        else:
+            market.add_listener(self.broadcast_callback)
+
+    def _iter_markets_of_subtree(self):
+        if self.area._markets:
+            yield from self.area._markets.markets.values()
+            yield from self.area._markets.balancing_markets.values()
+        for child in self.area.children:
+            yield from child.dispatcher._iter_markets_of_subtree()
+
+    def deliver_market_events(self):
+        """
+        Delivers the queued events of all markets of the area and its descendants, including
+        the ones raised while delivering them, until no market has pending events. The events
+        of markets that move to the past are delivered when they are rotated.
+        """
+        markets = list(self._iter_markets_of_subtree())
+        while any([market.deliver_pending_events() for market in markets]):
+            pass
+
+    def _broadcast_notification_batch(self, event_type: MarketEvent, market_id, events):
+        if not self.area.events.is_enabled:
+            return
+        # Same recipients and fairness as for _broadcast_notification
+        for child in self._dispatch_order.shuffled(self.area.children):
+            child.dispatcher.event_listener_batch(event_type, market_id, events)
+        if not self.area.events.is_connected:
+            return
+        for agents in self._active_agents():
+            for area_name in self._dispatch_order.shuffled(agents):
+                agents[area_name].event_listener_batch(event_type, market_id, events)
+
     def _broadcast_notification(self, event_type: Union[MarketEvent, AreaEvent], **kwargs):
         if not self.area.events.is_enabled and \
            event_type not in [AreaEvent.ACTIVATE, AreaEvent.MARKET_CYCLE]:
             return
         # Broadcast to children in random order to ensure fairness
-        for child in sorted(self.area.children, key=lambda _: random()):
+        for child in self._dispatch_order.shuffled(self.area.children):
             child.dispatcher.event_listener(event_type, **kwargs)
-        # Also broadcast to IAAs. Again in random order
-        for time_slot, agents in self._inter_area_agents.items():
-            if time_slot not in self.area._markets.markets:
-                # exclude past IAAs
-                continue
-
-            if not self.area.events.is_connected:
-                break
-            for area_name in sorted(agents, key=lambda _: random()):
+        # Also broadcast to the IAAs and BAs of the current markets. Again in random order
+        if not self.area.events.is_connected:
+            return
+        for agents in self._active_agents():
+            for area_name in self._dispatch_order.shuffled(agents):
                 agents[area_name].event_listener(event_type, **kwargs)
-        # Also broadcast to BAs. Again in random order
-        # TODO: Refactor to reuse the spot market mechanism
-        for time_slot, agents in self._balancing_agents.items():
-            if time_slot not in self.area._markets.balancing_markets:
-                # exclude past BAs
-                continue
 
-            if not self.area.events.is_connected:
-                break
-            for area_name in sorted(agents, key=lambda _: random()):
-                agents[area_name].event_listener(event_type, **kwargs)
+    def _tick_agents(self, **kwargs):
+        if not self.area.events.is_connected:
+            return
+        # Broadcast to the IAAs and BAs in random order
+        for agents in self._active_agents():
+            for area_name in self._dispatch_order.shuffled(agents):
+                agents[area_name].event_listener(AreaEvent.TICK, **kwargs)
 
     def _should_dispatch_to_strategies_appliances(self, event_type):
         if event_type is AreaEvent.ACTIVATE:
@@ -108,19 +188,32 @@ class AreaDispatcher:
         else:
             return self.area.events.is_connected and self.area.events.is_enabled
 
+    def _should_tick(self):
+        """Whether the area is ticked and dispatches the tick event to its strategy"""
+        return self._should_dispatch_to_strategies_appliances(AreaEvent.TICK)
+
+    def _dispatch_to_strategy_appliance(self, event_type, **kwargs):
+        if self.area.strategy:
+            self.area.strategy.event_listener(event_type, **kwargs)
+        if self.area.appliance:
+            self.area.appliance.event_listener(event_type, **kwargs)
+
+    def event_listener_batch(self, event_type: MarketEvent, market_id, events):
+        if self._should_dispatch_to_strategies_appliances(event_type):
+            if self.area.strategy:
+                self.area.strategy.event_listener_batch(event_type, market_id, events)
+            if self.area.appliance:
+                self.area.appliance.event_listener_batch(event_type, market_id, events)
+
     def event_listener(self, event_type: Union[MarketEvent, AreaEvent], **kwargs):
-        if event_type is AreaEvent.TICK and \
-                self._should_dispatch_to_strategies_appliances(event_type):
+        if event_type is AreaEvent.TICK and self._should_tick():
             self.area.tick_and_dispatch()
         if event_type is AreaEvent.MARKET_CYCLE:
             self.area._cycle_markets(_trigger_event=True)
         elif event_type is AreaEvent.ACTIVATE:
             self.area.activate()
         if self._should_dispatch_to_strategies_appliances(event_type):
-            if self.area.strategy:
-                self.area.strategy.event_listener(event_type, **kwargs)
-            if self.area.appliance:
-                self.area.appliance.event_listener(event_type, **kwargs)
+            self._dispatch_to_strategy_appliance(event_type, **kwargs)
         elif (not self.area.events.is_enabled or not self.area.events.is_connected) \
                 and event_type == AreaEvent.MARKET_CYCLE and self.area.strategy is not None:
             self.area.strategy.event_on_disabled_area()
@@ -175,13 +268,10 @@ class AreaDispatcher:
             )
 
             # Attach agent to own IAA list
-            self._inter_area_agents = create_subdict_or_update(self._inter_area_agents,
-                                                               market.time_slot,
-                                                               {self.area.name: iaa})
+            self._add_agent(self.area.name, iaa, market.time_slot, is_spot_market=True)
             # And also to parents to allow events to flow from both markets
-            self.area.parent.dispatcher._inter_area_agents = create_subdict_or_update(
-                self.area.parent.dispatcher._inter_area_agents, market.time_slot,
-                {self.area.name: iaa})
+            self.area.parent.dispatcher._add_agent(
+                self.area.name, iaa, market.time_slot, is_spot_market=True)
 
         else:
             if market.time_slot in self.balancing_agents or \
@@ -194,18 +284,35 @@ class AreaDispatcher:
                 is_spot_market=False
             )
 
-            self._balancing_agents = create_subdict_or_update(self._balancing_agents,
-                                                              market.time_slot,
-                                                              {self.area.name: ba})
-            self.area.parent.dispatcher._balancing_agents = create_subdict_or_update(
-                self.area.parent.dispatcher._balancing_agents, market.time_slot,
-                {self.area.name: ba})
+            self._add_agent(self.area.name, ba, market.time_slot, is_spot_market=False)
+            self.area.parent.dispatcher._add_agent(
+                self.area.name, ba, market.time_slot, is_spot_market=False)
 
         if self.area.parent:
             # Add inter area appliance to report energy
             self.area.appliance = InterAreaAppliance(self.area.parent, self.area)
 
+    def _add_agent(self, area_name, agent, time_slot, is_spot_market):
+        if is_spot_market:
+            agents_by_time_slot, active_agents = \
+                self._inter_area_agents, self._active_inter_area_agents
+        else:
+            agents_by_time_slot, active_agents = \
+                self._balancing_agents, self._active_balancing_agents
+        create_subdict_or_update(agents_by_time_slot, time_slot, {area_name: agent})
+        active_agents[time_slot] = agents_by_time_slot[time_slot]
+
+    def _deactivate_past_agents(self):
+        """Agents of time slots that are no longer among the markets of the area are inactive"""
+        for active_agents, markets in [
+                (self._active_inter_area_agents, self.area._markets.markets),
+                (self._active_balancing_agents, self.area._markets.balancing_markets)]:
+            for time_slot in [time_slot for time_slot in active_agents
+                              if time_slot not in markets]:
+                del active_agents[time_slot]
+
     def _delete_past_agents(self, area_agent_member):
+        self._deactivate_past_agents()
         if not ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
             delete_agents = [pm for pm in area_agent_member.keys() if
                              self.area.current_market and pm < self.area.current_market.time_slot]
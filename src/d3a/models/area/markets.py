@@ -71,6 +71,9 @@ class AreaMarkets:
     def _market_rotation(self, current_time, markets, past_markets, area_agent):
         for timeframe in list(markets.keys()):
             if timeframe < current_time:
+                # Events queued in batched delivery mode are delivered while the market is
+                # still current, the area only delivers the events of its current markets
+                markets[timeframe].deliver_pending_events()
                 market = markets.pop(timeframe)
                 market.readonly = True
                 self._delete_past_markets(past_markets, timeframe)
@@ -87,10 +90,14 @@ class AreaMarkets:
                     past_markets[pm].redis_api.stop()
                 del past_markets[pm].offers
                 del past_markets[pm].trades
+                del past_markets[pm].trade_index
                 del past_markets[pm].offer_history
+                del past_markets[pm]._offer_history_positions
                 del past_markets[pm].notification_listeners
+                del past_markets[pm].batch_notification_listeners
                 del past_markets[pm].bids
                 del past_markets[pm].bid_history
+                del past_markets[pm]._bid_history_positions
                 del past_markets[pm].traded_energy
                 del past_markets[pm].accumulated_actual_energy_agg
                 del past_markets[pm]
@@ -120,13 +127,13 @@ class AreaMarkets:
                 market = market_class(
                     time_slot=timeframe,
                     bc=area.bc,
-                    notification_listener=area.dispatcher.broadcast_callback,
                     grid_fee_type=area.config.grid_fee_type,
                     transfer_fees=TransferFees(grid_fee_percentage=area.grid_fee_percentage,
                                                transfer_fee_const=area.grid_fee_constant),
                     name=area.name,
                     in_sim_duration=is_timeslot_in_simulation_duration(area.config, timeframe)
                 )
+                area.dispatcher.add_market_listener(market)
 
                 area.dispatcher.create_area_agents(is_spot_market, market)
                 markets[timeframe] = market
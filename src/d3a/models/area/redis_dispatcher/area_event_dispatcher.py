@@ -37,13 +37,9 @@ class RedisAreaEventDispatcher(RedisEventDispatcherBase):
             self.root_dispatcher.market_event_dispatcher.wait_for_futures()
             self.root_dispatcher.market_notify_event_dispatcher.wait_for_futures()
 
-        for time_slot, agents in self.root_dispatcher._inter_area_agents.items():
-            if time_slot not in self.area._markets.markets:
-                # exclude past IAAs
-                continue
-
-            if not self.area.events.is_connected:
-                break
+        if not self.area.events.is_connected:
+            return
+        for agents in self.root_dispatcher.active_interarea_agents.values():
             for area_name in sorted(agents, key=lambda _: random()):
                 agents[area_name].event_listener(event_type, **kwargs)
                 self.root_dispatcher.market_notify_event_dispatcher.wait_for_futures()
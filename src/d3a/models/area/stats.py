@@ -20,7 +20,7 @@ from statistics import mean, median
 from d3a_interface.constants_limits import DATE_TIME_FORMAT, ConstSettings
 from d3a.constants import TIME_ZONE
 from d3a import limit_float_precision
-from d3a.d3a_core.util import area_name_from_area_or_iaa_name
+from d3a.models.market.trade_index import trades_with_area_names
 from copy import copy
 
 default_trade_stats_dict = {
@@ -69,9 +69,9 @@ class AreaStats:
 
         return [{"trade_time": trade.time.timestamp(),
                  "energy": trade.offer.energy,
-                 "seller": area_name_from_area_or_iaa_name(trade.seller),
-                 "buyer": area_name_from_area_or_iaa_name(trade.buyer)}
-                for trade in self.current_market.trades]
+                 "seller": seller,
+                 "buyer": buyer}
+                for trade, (seller, buyer) in trades_with_area_names(self.current_market)]
 
     def update_accumulated(self):
         self._accumulated_past_price = sum(
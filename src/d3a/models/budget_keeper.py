@@ -22,6 +22,7 @@ from pendulum import duration
 
 from d3a.models.area import Area
 from d3a.d3a_core.util import make_iaa_name
+from d3a.models.market.trade_index import trades_sold_by
 
 
 class BudgetKeeper:
@@ -93,7 +94,7 @@ class BudgetKeeper:
         if self.area.current_market is None:
             return []
         else:
-            return (t for t in self.area.current_market.trades if t.seller == self._iaa)
+            return trades_sold_by(self.area.current_market, self._iaa)
 
     def decide(self):
         slot_cost_estimate = sum(self.forecast[child] for child in self.enabled)
@@ -20,15 +20,19 @@ import uuid
 import sys
 from logging import getLogger
 from typing import Dict, List  # noqa
-from numpy.random import random
-from collections import namedtuple
+from collections import namedtuple, deque
 from pendulum import DateTime
-from functools import wraps
+from functools import wraps, lru_cache
 from threading import RLock
+from types import MethodType
 
+import d3a.constants
 from d3a.d3a_core.device_registry import DeviceRegistry
+from d3a.d3a_core.dispatch_order import DispatchOrder
 from d3a.constants import FLOATING_POINT_TOLERANCE, DATE_TIME_FORMAT
 from d3a.models.market.market_structures import Offer, Trade, Bid  # noqa
+from d3a.models.market.order_book import OrderBook
+from d3a.models.market.trade_index import TradeIndex
 from d3a.d3a_core.util import add_or_create_key, subtract_or_create_key
 from d3a_interface.constants_limits import ConstSettings, GlobalConfig
 from d3a.models.market.market_redis_connection import MarketRedisEventSubscriber, \
@@ -48,15 +52,23 @@ def lock_market_action(function):
     @wraps(function)
     def wrapper(self, *args, **kwargs):
         # The market class needs to have an rlock member, that holds the recursive lock
-        lock_object = getattr(self, RLOCK_MEMBER_NAME)
-        if ConstSettings.GeneralSettings.EVENT_DISPATCHING_VIA_REDIS:
+        with getattr(self, RLOCK_MEMBER_NAME):
             return function(self, *args, **kwargs)
-        else:
-            with lock_object:
-                return function(self, *args, **kwargs)
+    wrapper.is_market_action = True
     return wrapper
 
 
+@lru_cache(maxsize=None)
+def _market_actions(market_class):
+    """Names and undecorated implementations of the lock_market_action methods of a class"""
+    actions = []
+    for name in dir(market_class):
+        attribute = getattr(market_class, name, None)
+        if getattr(attribute, "is_market_action", False):
+            actions.append((name, attribute.__wrapped__))
+    return tuple(actions)
+
+
 class Market:
 
     def __init__(self, time_slot=None, bc=None, notification_listener=None, readonly=False,
@@ -70,13 +82,23 @@ class Market:
             if self.time_slot is not None \
             else None
         self.readonly = readonly
-        # offer-id -> Offer
-        self.offers = {}  # type: Dict[str, Offer]
+        # offer-id -> Offer, kept sorted by energy_rate
+        self.offers = OrderBook()  # type: Dict[str, Offer]
         self.offer_history = []  # type: List[Offer]
+        # offer-id -> position of its latest entry in offer_history
+        self._offer_history_positions = {}
         self.notification_listeners = []
-        self.bids = {}  # type: Dict[str, Bid]
+        # Listeners that receive the market events in batches, see deliver_pending_events
+        self.batch_notification_listeners = []
+        self._pending_events = deque()
+        self._dispatch_order = DispatchOrder()
+        # bid-id -> Bid, kept sorted by energy_rate and indexed by buyer
+        self.bids = OrderBook(owner_attribute="buyer")  # type: Dict[str, Bid]
         self.bid_history = []  # type: List[Bid]
+        # bid-id -> position of its latest entry in bid_history
+        self._bid_history_positions = {}
         self.trades = []  # type: List[Trade]
+        self.trade_index = TradeIndex()
 
         self._create_fee_handler(grid_fee_type, transfer_fees)
         self.market_fee = 0
@@ -102,6 +124,25 @@ class Market:
                 if ConstSettings.IAASettings.MARKET_TYPE == 1 \
                 else TwoSidedMarketRedisEventSubscriber(self)
         setattr(self, RLOCK_MEMBER_NAME, RLock())
+        self.concurrency_mode = self._select_concurrency_mode()
+        self._bind_market_actions()
+
+    @staticmethod
+    def _select_concurrency_mode():
+        # Markets that dispatch their events via redis have never held the lock
+        if ConstSettings.GeneralSettings.EVENT_DISPATCHING_VIA_REDIS:
+            return d3a.constants.MARKET_CONCURRENCY_LOCK_FREE
+        return d3a.constants.MARKET_CONCURRENCY_MODE
+
+    def _bind_market_actions(self):
+        """
+        The class attributes hold the locked market actions. In lock-free mode they are
+        shadowed once by the undecorated implementations, bound to this market instance.
+        """
+        if self.concurrency_mode != d3a.constants.MARKET_CONCURRENCY_LOCK_FREE:
+            return
+        for name, action in _market_actions(type(self)):
+            setattr(self, name, MethodType(action, self))
 
     def _create_fee_handler(self, grid_fee_type, transfer_fees):
         if not transfer_fees:
@@ -128,13 +169,39 @@ class Market:
     def add_listener(self, listener):
         self.notification_listeners.append(listener)
 
+    def add_batch_listener(self, listener):
+        self.batch_notification_listeners.append(listener)
+
     def _notify_listeners(self, event, **kwargs):
         if ConstSettings.GeneralSettings.EVENT_DISPATCHING_VIA_REDIS:
             self.redis_publisher.publish_event(event, **kwargs)
         else:
             # Deliver notifications in random order to ensure fairness
-            for listener in sorted(self.notification_listeners, key=lambda l: random()):
+            for listener in self._dispatch_order.shuffled(self.notification_listeners):
                 listener(event, market_id=self.id, **kwargs)
+            if self.batch_notification_listeners:
+                self._pending_events.append((event, kwargs))
+
+    def deliver_pending_events(self):
+        """
+        Delivers the events queued for the batch listeners, in order of occurrence.
+        Consecutive events of the same type form one batch, that is delivered to every batch
+        listener as a list of the event kwargs: listener(event, market_id, events).
+        Therefore each listener observes the same event sequence as the immediate listeners.
+        Events raised by the listeners while handling a batch are delivered by the same call.
+        Returns whether any event was delivered.
+        """
+        pending_events = self._pending_events
+        if not pending_events:
+            return False
+        while pending_events:
+            event, kwargs = pending_events.popleft()
+            events = [kwargs]
+            while pending_events and pending_events[0][0] == event:
+                events.append(pending_events.popleft()[1])
+            for listener in self._dispatch_order.shuffled(self.batch_notification_listeners):
+                listener(event, self.id, events)
+        return True
 
     def _update_stats_after_trade(self, trade, offer, buyer, already_tracked=False):
         # FIXME: The following updates need to be done in response to the BC event
@@ -142,6 +209,7 @@ class Market:
         # sequential approach, but once event handling is enabled this needs to be handled
         if not already_tracked:
             self.trades.append(trade)
+            self.trade_index.add(trade)
             self.market_fee += trade.fee_price
         self._update_accumulated_trade_price_energy(trade)
         self.traded_energy = add_or_create_key(self.traded_energy, offer.seller, offer.energy)
@@ -150,16 +218,29 @@ class Market:
         # Recalculate offer min/max price since offer was removed
         self._update_min_max_avg_offer_prices()
 
+    @staticmethod
+    def _add_to_history(history, positions, order):
+        positions[order.id] = len(history)
+        history.append(order)
+
+    @classmethod
+    def _replace_in_history(cls, history, positions, order):
+        """Replaces the latest history entry of a repriced order, instead of adding another one"""
+        position = positions.get(order.id)
+        if position is None:
+            cls._add_to_history(history, positions, order)
+        else:
+            history[position] = order
+
     def _update_accumulated_trade_price_energy(self, trade):
         self.accumulated_trade_price += trade.offer.price
         self.accumulated_trade_energy += trade.offer.energy
 
     def _update_min_max_avg_offer_prices(self):
         self._avg_offer_price = None
-        offer_prices = [o.energy_rate for o in self.offers.values()]
-        if offer_prices:
-            self.min_offer_price = round(min(offer_prices), 4)
-            self.max_offer_price = round(max(offer_prices), 4)
+        if self.offers:
+            self.min_offer_price = round(self.offers.lowest().energy_rate, 4)
+            self.max_offer_price = round(self.offers.highest().energy_rate, 4)
 
     def _update_min_max_avg_trade_prices(self, price):
         self.max_trade_price = round(max(self.max_trade_price, price), 4)
@@ -178,8 +259,36 @@ class Market:
             self.accumulated_trade_price
         )
 
+    @property
+    def offers(self):
+        return self._offer_book
+
+    @offers.setter
+    def offers(self, offers):
+        self._offer_book = offers if isinstance(offers, OrderBook) else OrderBook(offers)
+
+    @offers.deleter
+    def offers(self):
+        del self._offer_book
+
+    @property
+    def bids(self):
+        return self._bid_book
+
+    @bids.setter
+    def bids(self, bids):
+        self._bid_book = bids \
+            if isinstance(bids, OrderBook) and bids.owner_attribute == "buyer" \
+            else OrderBook(bids, owner_attribute="buyer")
+
+    @bids.deleter
+    def bids(self):
+        del self._bid_book
+
     @staticmethod
     def sorting(obj, reverse_order=False):
+        if isinstance(obj, OrderBook):
+            return obj.sorted_values(reverse_order)
         if reverse_order:
             # Sorted bids in descending order
             return list(reversed(sorted(
@@ -195,8 +304,8 @@ class Market:
     @property
     def avg_offer_price(self):
         if self._avg_offer_price is None:
-            price = sum(o.price for o in self.offers.values())
-            energy = sum(o.energy for o in self.offers.values())
+            price = self.offers.total_price
+            energy = self.offers.total_energy
             self._avg_offer_price = round(price / energy, 4) if energy else 0
         return self._avg_offer_price
 
@@ -214,10 +323,10 @@ class Market:
 
     @property
     def most_affordable_offers(self):
-        cheapest_offer = self.sorted_offers[0]
+        cheapest_offer = self.offers.lowest()
         rate = cheapest_offer.energy_rate
-        return [o for o in self.sorted_offers if
-                abs(o.energy_rate - rate) < FLOATING_POINT_TOLERANCE]
+        return [o for o in self.offers.in_rate_range(max_rate=rate + FLOATING_POINT_TOLERANCE)
+                if abs(o.energy_rate - rate) < FLOATING_POINT_TOLERANCE]
 
     def update_clock(self, current_tick_in_slot):
         self.current_tick_in_slot = current_tick_in_slot
@@ -238,16 +347,16 @@ class Market:
         return self.accumulated_actual_energy_agg
 
     def bought_energy(self, buyer):
-        return sum(trade.offer.energy for trade in self.trades if trade.buyer == buyer)
+        return sum(trade.offer.energy for trade in self.trade_index.by_buyer.get(buyer, []))
 
     def sold_energy(self, seller):
         return sum(trade.offer.energy for trade in self.trades if trade.offer.seller == seller)
 
     def total_spent(self, buyer):
-        return sum(trade.offer.price for trade in self.trades if trade.buyer == buyer)
+        return sum(trade.offer.price for trade in self.trade_index.by_buyer.get(buyer, []))
 
     def total_earned(self, seller):
-        return sum(trade.offer.price for trade in self.trades if trade.seller == seller)
+        return sum(trade.offer.price for trade in self.trade_index.by_seller.get(seller, []))
 
     @property
     def info(self):
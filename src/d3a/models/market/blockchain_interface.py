@@ -49,6 +49,9 @@ class NonBlockchainInterface:
     def change_offer(self, offer, original_offer, residual_offer):
         pass
 
+    def change_offer_price(self, offer, price):
+        return offer.real_id
+
     def handle_blockchain_trade_event(self, offer, buyer, original_offer, residual_offer):
         return str(uuid.uuid4()), residual_offer
 
@@ -81,6 +84,11 @@ class MarketBlockchainInterface:
     def change_offer(self, offer, original_offer, residual_offer):
         self.offers_changed[offer.id] = (original_offer, residual_offer)
 
+    def change_offer_price(self, offer, price):
+        # The contract has no price update, the offer is re-posted under a new real id
+        self.cancel_offer(offer)
+        return self.create_new_offer(offer.energy, price, offer.seller)
+
     def handle_blockchain_trade_event(self, offer, buyer, original_offer, residual_offer):
         trade_id, new_offer_id = trade_offer(
             self.bc_interface, self.bc_contract, offer.real_id, offer.energy, buyer
@@ -74,6 +74,7 @@ class MarketRedisEventSubscriber:
             self._offer_channel: self._offer,
             self._delete_offer_channel: self._delete_offer,
             self._accept_offer_channel: self._accept_offer,
+            self._update_offer_price_channel: self._update_offer_price,
         })
 
     def _stop_futures(self):
@@ -105,6 +106,10 @@ class MarketRedisEventSubscriber:
     def _accept_offer_channel(self):
         return f"{self.market.id}/ACCEPT_OFFER"
 
+    @property
+    def _update_offer_price_channel(self):
+        return f"{self.market.id}/UPDATE_OFFER_PRICE"
+
     @property
     def _offer_response_channel(self):
         return f"{self._offer_channel}/RESPONSE"
@@ -117,6 +122,10 @@ class MarketRedisEventSubscriber:
     def _accept_offer_response_channel(self):
         return f"{self._accept_offer_channel}/RESPONSE"
 
+    @property
+    def _update_offer_price_response_channel(self):
+        return f"{self._update_offer_price_channel}/RESPONSE"
+
     def _parse_payload(self, payload):
         data_dict = json.loads(payload["data"])
         return MarketRedisEventSubscriber.sanitize_parameters(data_dict, self.market.now)
@@ -193,6 +202,26 @@ class MarketRedisEventSubscriber:
                          {"status": "ready", "exception": str(type(e)),
                           "error_message": str(e), "transaction_uuid": transaction_uuid})
 
+    def _update_offer_price(self, payload):
+        def thread_cb():
+            return self._update_offer_price_impl(self._parse_payload(payload))
+        self.futures.append(self.executor.submit(thread_cb))
+
+    def _update_offer_price_impl(self, arguments):
+        transaction_uuid = arguments.pop("transaction_uuid", None)
+        try:
+            offer = self.market.update_offer_price(**arguments)
+            self.publish(self._update_offer_price_response_channel,
+                         {"status": "ready", "offer": offer.to_JSON_string(),
+                          "transaction_uuid": transaction_uuid})
+        except Exception as e:
+            logging.error(f"Error when handling update_offer_price on market "
+                          f"{self.market.name}: Exception: {str(e)}, "
+                          f"Update Offer Price Arguments: {arguments}")
+            self.publish(self._update_offer_price_response_channel,
+                         {"status": "error",  "exception": str(type(e)),
+                          "error_message": str(e), "transaction_uuid": transaction_uuid})
+
 
 class TwoSidedMarketRedisEventSubscriber(MarketRedisEventSubscriber):
     def __init__(self, market):
@@ -203,6 +232,7 @@ class TwoSidedMarketRedisEventSubscriber(MarketRedisEventSubscriber):
             self._offer_channel: self._offer,
             self._delete_offer_channel: self._delete_offer,
             self._accept_offer_channel: self._accept_offer,
+            self._update_offer_price_channel: self._update_offer_price,
             self._bid_channel: self._bid,
             self._delete_bid_channel: self._delete_bid,
             self._accept_bid_channel: self._accept_bid,
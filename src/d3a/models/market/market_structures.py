@@ -17,11 +17,15 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from collections import namedtuple
 from typing import Dict  # noqa
-from copy import deepcopy
 import json
 from pendulum import DateTime, parse
+import d3a.constants
 from d3a.events import MarketEvent
 from d3a_interface.utils import datetime_to_string_incl_seconds
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 Clearing = namedtuple('Clearing', ('rate', 'energy'))
 
@@ -31,7 +35,40 @@ def my_converter(o):
         return o.isoformat()
 
 
+def _time_to_JSON(time):
+    return time.isoformat() if isinstance(time, DateTime) else time
+
+
+# Created once, json.dumps would otherwise create a new encoder on every call with a default
+_json_encoder = json.JSONEncoder(default=my_converter)
+
+
+def _use_orjson():
+    return orjson is not None and d3a.constants.JSON_SERIALIZATION_BACKEND == "orjson"
+
+
+def json_dumps(obj_dict):
+    """
+    Serializes the dict of a market structure with the configured JSON backend.
+    """
+    if _use_orjson():
+        return orjson.dumps(obj_dict, default=my_converter).decode()
+    return _json_encoder.encode(obj_dict)
+
+
+def json_loads(obj_string):
+    """
+    Parses the JSON string of a market structure with the configured JSON backend.
+    """
+    if _use_orjson():
+        return orjson.loads(obj_string)
+    return json.loads(obj_string)
+
+
 class Offer:
+    __slots__ = ('id', 'real_id', 'price', 'original_offer_price', 'energy', 'seller',
+                 'seller_origin', 'energy_rate', 'time')
+
     def __init__(self, id, time, price, energy, seller,
                  original_offer_price=None, seller_origin=None):
         self.id = str(id)
@@ -58,10 +95,18 @@ class Offer:
             .format(s=self, rate=self.energy_rate)
 
     def to_JSON_string(self):
-        offer_dict = deepcopy(self.__dict__)
-        offer_dict["type"] = "Offer"
-        offer_dict.pop('energy_rate', None)
-        return json.dumps(offer_dict, default=my_converter)
+        offer_dict = {
+            "id": self.id,
+            "real_id": self.real_id,
+            "price": self.price,
+            "original_offer_price": self.original_offer_price,
+            "energy": self.energy,
+            "seller": self.seller,
+            "seller_origin": self.seller_origin,
+            "time": _time_to_JSON(self.time),
+            "type": "Offer"
+        }
+        return json_dumps(offer_dict)
 
     def serializable_dict(self):
         return {
@@ -99,20 +144,24 @@ def copy_offer(offer):
                  offer.original_offer_price, offer.seller_origin)
 
 
-def offer_from_JSON_string(offer_string, current_time):
-    offer_dict = json.loads(offer_string)
-    object_type = offer_dict.pop("type")
-    assert object_type == "Offer"
-    real_id = offer_dict.pop('real_id')
-    offer_dict.pop('energy_rate', None)
-    offer_dict['time'] = current_time
-    offer = Offer(**offer_dict)
-    offer.real_id = real_id
+def _offer_from_dict(offer_dict, current_time):
+    offer = Offer(offer_dict['id'], current_time, offer_dict['price'], offer_dict['energy'],
+                  offer_dict['seller'], offer_dict.get('original_offer_price'),
+                  offer_dict.get('seller_origin'))
+    offer.real_id = offer_dict['real_id']
     return offer
 
 
+def offer_from_JSON_string(offer_string, current_time):
+    offer_dict = json_loads(offer_string)
+    assert offer_dict["type"] == "Offer"
+    return _offer_from_dict(offer_dict, current_time)
+
+
 class Bid(namedtuple('Bid', ('id', 'time', 'price', 'energy', 'buyer', 'seller',
                              'original_bid_price', 'buyer_origin', 'energy_rate'))):
+    __slots__ = ()
+
     def __new__(cls, id, time, price, energy, buyer, seller, original_bid_price=None,
                 buyer_origin=None, energy_rate=None):
         if energy_rate is None:
@@ -142,9 +191,10 @@ class Bid(namedtuple('Bid', ('id', 'time', 'price', 'energy', 'buyer', 'seller',
         return rate, self.energy, self.price, self.buyer
 
     def to_JSON_string(self):
-        bid_dict = self._asdict()
+        bid_dict = dict(zip(self._fields, self))
+        bid_dict["time"] = _time_to_JSON(self.time)
         bid_dict["type"] = "Bid"
-        return json.dumps(bid_dict, default=my_converter)
+        return json_dumps(bid_dict)
 
     def serializable_dict(self):
         return {
@@ -159,42 +209,47 @@ class Bid(namedtuple('Bid', ('id', 'time', 'price', 'energy', 'buyer', 'seller',
         }
 
 
+def _bid_from_dict(bid_dict, time):
+    return Bid(bid_dict['id'], time, bid_dict['price'], bid_dict['energy'], bid_dict['buyer'],
+               bid_dict['seller'], bid_dict.get('original_bid_price'),
+               bid_dict.get('buyer_origin'), bid_dict.get('energy_rate'))
+
+
 def bid_from_JSON_string(bid_string):
-    bid_dict = json.loads(bid_string)
-    object_type = bid_dict.pop("type")
-    assert object_type == "Bid"
-    return Bid(**bid_dict)
+    bid_dict = json_loads(bid_string)
+    assert bid_dict["type"] == "Bid"
+    return _bid_from_dict(bid_dict, bid_dict['time'])
 
 
 def offer_or_bid_from_JSON_string(offer_or_bid, current_time):
-    offer_bid_dict = json.loads(offer_or_bid)
-    object_type = offer_bid_dict.pop("type")
-    offer_bid_dict['time'] = current_time
+    offer_bid_dict = json_loads(offer_or_bid)
+    object_type = offer_bid_dict["type"]
     if object_type == "Offer":
-        real_id = offer_bid_dict.pop('real_id')
-        offer = Offer(**offer_bid_dict)
-        offer.real_id = real_id
-        return offer
+        return _offer_from_dict(offer_bid_dict, current_time)
     elif object_type == "Bid":
-        return Bid(**offer_bid_dict)
+        return _bid_from_dict(offer_bid_dict, current_time)
 
 
 class TradeBidInfo(namedtuple('TradeBidInfo',
                               ('original_bid_rate', 'propagated_bid_rate',
                                'original_offer_rate', 'propagated_offer_rate',
                                'trade_rate'))):
+    __slots__ = ()
+
     def to_JSON_string(self):
-        return json.dumps(self._asdict(), default=my_converter)
+        return json_dumps(dict(zip(self._fields, self)))
 
 
 def trade_bid_info_from_JSON_string(info_string):
-    info_dict = json.loads(info_string)
+    info_dict = json_loads(info_string)
     return TradeBidInfo(**info_dict)
 
 
 class Trade(namedtuple('Trade', ('id', 'time', 'offer', 'seller', 'buyer', 'residual',
                                  'already_tracked', 'offer_bid_trade_info', 'seller_origin',
                                  'buyer_origin', 'fee_price'))):
+    __slots__ = ()
+
     def __new__(cls, id, time, offer, seller, buyer, residual=None,
                 already_tracked=False, offer_bid_trade_info=None,
                 seller_origin=None, buyer_origin=None, fee_price=None):
@@ -221,12 +276,15 @@ class Trade(namedtuple('Trade', ('id', 'time', 'offer', 'seller', 'buyer', 'resi
         return self[1:2] + (rate, self.offer.energy) + self[3:5]
 
     def to_JSON_string(self):
-        trade_dict = self._asdict()
-        trade_dict['offer'] = trade_dict['offer'].to_JSON_string()
-        trade_dict['residual'] = trade_dict['residual'].to_JSON_string() \
-            if trade_dict['residual'] is not None else None
-        trade_dict['time'] = trade_dict['time'].isoformat()
-        return json.dumps(trade_dict)
+        trade_dict = dict(zip(self._fields, self))
+        trade_dict['offer'] = self.offer.to_JSON_string()
+        trade_dict['residual'] = self.residual.to_JSON_string() \
+            if self.residual is not None else None
+        trade_dict['time'] = self.time.isoformat()
+        if isinstance(self.offer_bid_trade_info, tuple):
+            # Serialized as a JSON array by all backends, same as the json module does
+            trade_dict['offer_bid_trade_info'] = list(self.offer_bid_trade_info)
+        return json_dumps(trade_dict)
 
     def serializable_dict(self):
         return {
@@ -247,7 +305,7 @@ class Trade(namedtuple('Trade', ('id', 'time', 'offer', 'seller', 'buyer', 'resi
 
 
 def trade_from_JSON_string(trade_string, current_time):
-    trade_dict = json.loads(trade_string)
+    trade_dict = json_loads(trade_string)
     trade_dict['offer'] = offer_or_bid_from_JSON_string(trade_dict['offer'], current_time)
     if 'residual' in trade_dict and trade_dict['residual'] is not None:
         trade_dict['residual'] = offer_or_bid_from_JSON_string(trade_dict['residual'],
@@ -259,6 +317,7 @@ def trade_from_JSON_string(trade_string, current_time):
 
 
 class BalancingOffer(Offer):
+    __slots__ = ()
 
     def __repr__(self):
         return "<BalancingOffer('{s.id!s:.6s}', '{s.energy} kWh@{s.price}', '{s.seller} {rate}'>"\
@@ -273,6 +332,8 @@ class BalancingOffer(Offer):
 class BalancingTrade(namedtuple('BalancingTrade', ('id', 'time', 'offer', 'seller',
                                                    'buyer', 'residual', 'offer_bid_trade_info',
                                                    'seller_origin', 'buyer_origin', 'fee_price'))):
+    __slots__ = ()
+
     def __new__(cls, id, time, offer, seller, buyer, residual=None, offer_bid_trade_info=None,
                 seller_origin=None, buyer_origin=None, fee_price=None):
         # overridden to give the residual field a default value
@@ -96,7 +96,7 @@ class OneSidedMarket(Market):
 
         self.offers[offer.id] = offer
         if add_to_history is True:
-            self.offer_history.append(offer)
+            self._add_to_history(self.offer_history, self._offer_history_positions, offer)
             self._update_min_max_avg_offer_prices()
 
         log.debug(f"[OFFER][NEW][{self.name}][{self.time_slot_str}] {offer}")
@@ -123,6 +123,44 @@ class OneSidedMarket(Market):
         # TODO: Once we add event-driven blockchain, this should be asynchronous
         self._notify_listeners(MarketEvent.OFFER_DELETED, offer=offer)
 
+    @lock_market_action
+    def update_offer_price(self, offer_or_id: Union[str, Offer], price: float,
+                           original_offer_price=None, adapt_price_with_fees=True) -> Offer:
+        """
+        Changes the price of an open offer without deleting and re-posting it. The repriced
+        offer keeps the id of the original one and replaces it in the order book, otherwise
+        it is posted like a new offer (validation and blockchain). Its entry in the offer history
+        is updated instead of adding another one, and instead of OFFER_DELETED and OFFER, only an
+        OFFER_REPRICED event is dispatched.
+        """
+        if self.readonly:
+            raise MarketReadOnlyException()
+        if isinstance(offer_or_id, Offer):
+            offer_or_id = offer_or_id.id
+        offer = self.offers.get(offer_or_id)
+        if not offer:
+            raise OfferNotFoundException()
+        if original_offer_price is None:
+            original_offer_price = price
+
+        if adapt_price_with_fees:
+            price = self._update_new_offer_price_with_fee(price, original_offer_price,
+                                                          offer.energy)
+
+        real_id = self.bc_interface.change_offer_price(offer, price)
+        repriced_offer = self.offer(price, offer.energy, offer.seller, offer.seller_origin,
+                                    offer_id=offer.id, original_offer_price=original_offer_price,
+                                    dispatch_event=False, adapt_price_with_fees=False,
+                                    add_to_history=False)
+        repriced_offer.real_id = real_id
+        self._replace_in_history(self.offer_history, self._offer_history_positions,
+                                 repriced_offer)
+        self._update_min_max_avg_offer_prices()
+
+        log.debug(f"[OFFER][REPRICED][{self.name}][{self.time_slot_str}] {repriced_offer}")
+        self._notify_listeners(MarketEvent.OFFER_REPRICED, offer=repriced_offer)
+        return repriced_offer
+
     def _update_offer_fee_and_calculate_final_price(self, energy, trade_rate,
                                                     energy_portion, original_price):
         if self._is_constant_fees:
@@ -0,0 +1,200 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from itertools import count
+from sortedcontainers import SortedList
+
+_MISSING = object()
+
+
+def _order_book_from_dict(orders, owner_attribute):
+    return OrderBook(orders, owner_attribute=owner_attribute)
+
+
+class OrderBook(dict):
+    """
+    Dict of offers or bids (order-id -> order) that keeps an index of its orders sorted
+    by energy_rate, as well as the total price and energy of its orders. The index is updated
+    on every insertion / removal, therefore sorted access does not need to re-sort the whole
+    book and best-price / rate-range queries are O(log n). The totals are accumulated on
+    insertion, a removal only marks them as outdated and they are summed again over the orders
+    of the book on the next read. This yields exactly the sum of the dict values, subtracting
+    removed orders would accumulate floating point errors.
+    Orders with the same rate keep their insertion order, same as sorting the dict values.
+    If owner_attribute is given (e.g. 'seller' for offers, 'buyer' for bids), the orders are
+    additionally indexed by the value of this attribute, see orders_of.
+    """
+
+    def __init__(self, *args, owner_attribute=None, **kwargs):
+        super().__init__()
+        # Each entry is (energy_rate, insertion sequence, key). The rate is captured at
+        # insertion time, because Offer.update_price can modify an order in place. Orders of
+        # the book are therefore repriced through update_price, which keeps the index in sync.
+        self._index = SortedList()
+        self._index_entries = {}
+        self._sequence = count()
+        self._total_price = 0
+        self._total_energy = 0
+        self._totals_outdated = False
+        self.owner_attribute = owner_attribute
+        # owner -> {key: None}, dicts are used as insertion ordered sets
+        self._keys_by_owner = {}
+        # Keys in the order they were inserted, a removed key is logged again on re-insertion
+        self._inserted_keys = []
+        self.update(*args, **kwargs)
+
+    def __reduce__(self):
+        return _order_book_from_dict, (dict(self), self.owner_attribute)
+
+    @property
+    def total_price(self):
+        self._update_totals()
+        return self._total_price
+
+    @property
+    def total_energy(self):
+        self._update_totals()
+        return self._total_energy
+
+    def _update_totals(self):
+        if self._totals_outdated:
+            self._total_price = sum(order.price for order in self.values())
+            self._total_energy = sum(order.energy for order in self.values())
+            self._totals_outdated = False
+
+    def _add_to_index(self, key, order, sequence):
+        entry = (order.energy_rate, sequence, key)
+        self._index.add(entry)
+        owner = getattr(order, self.owner_attribute) if self.owner_attribute else None
+        self._index_entries[key] = (entry, owner)
+        if self.owner_attribute:
+            self._keys_by_owner.setdefault(owner, {})[key] = None
+        if not self._totals_outdated:
+            self._total_price += order.price
+            self._total_energy += order.energy
+
+    def _remove_from_index(self, key):
+        entry, owner = self._index_entries.pop(key)
+        self._index.remove(entry)
+        if self.owner_attribute:
+            owner_keys = self._keys_by_owner[owner]
+            del owner_keys[key]
+            if not owner_keys:
+                del self._keys_by_owner[owner]
+        if self._index_entries:
+            self._totals_outdated = True
+        else:
+            self._total_price = 0
+            self._total_energy = 0
+            self._totals_outdated = False
+        return entry
+
+    def __setitem__(self, key, order):
+        if key in self._index_entries:
+            sequence = self._remove_from_index(key)[1]
+        else:
+            sequence = next(self._sequence)
+            self._inserted_keys.append(key)
+        self._add_to_index(key, order, sequence)
+        super().__setitem__(key, order)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._remove_from_index(key)
+
+    def pop(self, key, default=_MISSING):
+        if key not in self:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        self._remove_from_index(key)
+        return super().pop(key)
+
+    def popitem(self):
+        key, order = super().popitem()
+        self._remove_from_index(key)
+        return key, order
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update_price(self, key, price):
+        """Updates the price of an order of the book in place and re-indexes it"""
+        order = dict.__getitem__(self, key)
+        order.update_price(price)
+        self[key] = order
+
+    def update(self, *args, **kwargs):
+        for key, order in dict(*args, **kwargs).items():
+            self[key] = order
+
+    def clear(self):
+        super().clear()
+        self._index.clear()
+        self._index_entries.clear()
+        self._keys_by_owner.clear()
+        self._total_price = 0
+        self._total_energy = 0
+        self._totals_outdated = False
+
+    def copy(self):
+        return self.__class__(self, owner_attribute=self.owner_attribute)
+
+    def sorted_values(self, reverse_order=False):
+        """
+        Orders of the book sorted by energy_rate, ascending unless reverse_order is set.
+        """
+        entries = reversed(self._index) if reverse_order else self._index
+        return [dict.__getitem__(self, entry[2]) for entry in entries]
+
+    def lowest(self):
+        """Order with the lowest energy_rate, None if the book is empty"""
+        return dict.__getitem__(self, self._index[0][2]) if self._index else None
+
+    def highest(self):
+        """Order with the highest energy_rate, None if the book is empty"""
+        return dict.__getitem__(self, self._index[-1][2]) if self._index else None
+
+    def in_rate_range(self, min_rate=None, max_rate=None):
+        """
+        Orders with min_rate <= energy_rate <= max_rate in ascending rate order.
+        Omitted limits are considered open.
+        """
+        min_entry = (min_rate, ) if min_rate is not None else None
+        max_entry = (max_rate, float("inf")) if max_rate is not None else None
+        return [dict.__getitem__(self, entry[2])
+                for entry in self._index.irange(min_entry, max_entry)]
+
+    def keys_inserted_since(self, position):
+        """
+        Keys that were inserted into the book since the given position of its insertion log,
+        and the current position of the log. Keys may since have been removed again.
+        """
+        return self._inserted_keys[position:], len(self._inserted_keys)
+
+    def insertion_sequence(self, key):
+        """Sort key that orders the keys of the book in the order the book iterates them"""
+        return self._index_entries[key][0][1]
+
+    def orders_of(self, owner):
+        """
+        Orders whose owner_attribute equals owner, in the order they were (re)inserted.
+        Requires the book to be created with an owner_attribute.
+        """
+        return [dict.__getitem__(self, key) for key in self._keys_by_owner.get(owner, ())]
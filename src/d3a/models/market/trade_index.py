@@ -0,0 +1,103 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from d3a.d3a_core.util import area_name_from_area_or_iaa_name
+
+
+class TradeIndex:
+    """
+    Trades of a market indexed by the names of their seller, buyer, seller_origin and
+    buyer_origin, each list in order of occurrence. Kept up to date by
+    Market._update_stats_after_trade, so that the trades of one trader can be looked up
+    without scanning all trades of the market.
+
+    The area names of the seller and buyer of each trade are resolved once, when the trade is
+    added, see trades_with_area_names.
+    """
+
+    def __init__(self):
+        self.by_seller = {}
+        self.by_buyer = {}
+        self.by_seller_origin = {}
+        self.by_buyer_origin = {}
+        # Trades in which the trader is either the seller or the buyer
+        self.by_trader = {}
+        # (seller area name, buyer area name) of each trade, parallel to the trades of the market
+        self.area_names = []
+
+    @staticmethod
+    def _add(index, name, trade):
+        if name is None:
+            return
+        trades = index.get(name)
+        if trades is None:
+            index[name] = [trade]
+        else:
+            trades.append(trade)
+
+    def add(self, trade):
+        self.area_names.append((area_name_from_area_or_iaa_name(trade.seller),
+                                area_name_from_area_or_iaa_name(trade.buyer)))
+        self._add(self.by_seller, trade.seller, trade)
+        self._add(self.by_buyer, trade.buyer, trade)
+        self._add(self.by_seller_origin, trade.seller_origin, trade)
+        self._add(self.by_buyer_origin, trade.buyer_origin, trade)
+        self._add(self.by_trader, trade.seller, trade)
+        if trade.buyer != trade.seller:
+            self._add(self.by_trader, trade.buyer, trade)
+
+
+def _trade_index(market):
+    trade_index = getattr(market, "trade_index", None)
+    return trade_index if isinstance(trade_index, TradeIndex) else None
+
+
+def trades_with_area_names(market):
+    """
+    Trades of the market in order of occurrence, each paired with the area names of its seller
+    and buyer: (trade, (seller area name, buyer area name))
+    """
+    trade_index = _trade_index(market)
+    if trade_index is None:
+        return [(t, (area_name_from_area_or_iaa_name(t.seller),
+                     area_name_from_area_or_iaa_name(t.buyer)))
+                for t in market.trades]
+    return zip(market.trades, trade_index.area_names)
+
+
+def trades_of_trader(market, name):
+    """Trades of the market with name as seller or buyer"""
+    trade_index = _trade_index(market)
+    if trade_index is None:
+        return [t for t in market.trades if t.seller == name or t.buyer == name]
+    return trade_index.by_trader.get(name, [])
+
+
+def trades_sold_by(market, seller):
+    """Trades of the market with seller as seller"""
+    trade_index = _trade_index(market)
+    if trade_index is None:
+        return [t for t in market.trades if t.seller == seller]
+    return trade_index.by_seller.get(seller, [])
+
+
+def trades_bought_by(market, buyer):
+    """Trades of the market with buyer as buyer"""
+    trade_index = _trade_index(market)
+    if trade_index is None:
+        return [t for t in market.trades if t.buyer == buyer]
+    return trade_index.by_buyer.get(buyer, [])
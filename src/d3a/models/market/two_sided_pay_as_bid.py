@@ -19,9 +19,11 @@ import uuid
 from typing import Union  # noqa
 from logging import getLogger
 
+import d3a.constants
 from d3a.models.market import lock_market_action
 from d3a.models.market.one_sided import OneSidedMarket
-from d3a.d3a_core.exceptions import BidNotFound, InvalidBid, InvalidTrade
+from d3a.d3a_core.exceptions import BidNotFound, InvalidBid, InvalidTrade, \
+    MarketReadOnlyException
 from d3a.models.market.market_structures import Bid, Trade, TradeBidInfo
 from d3a.events.event_structures import MarketEvent
 from d3a.constants import FLOATING_POINT_TOLERANCE
@@ -61,9 +63,14 @@ class TwoSidedPayAsBid(OneSidedMarket):
     def get_bids(self):
         return self.bids
 
+    @lock_market_action
+    def get_bids_of_buyer(self, buyer):
+        return self.bids.orders_of(buyer)
+
     @lock_market_action
     def bid(self, price: float, energy: float, buyer: str, seller: str, buyer_origin,
-            bid_id: str = None, original_bid_price=None, adapt_price_with_fees=True) -> Bid:
+            bid_id: str = None, original_bid_price=None, adapt_price_with_fees=True,
+            add_to_history=True) -> Bid:
         if energy <= 0:
             raise InvalidBid()
 
@@ -76,7 +83,8 @@ class TwoSidedPayAsBid(OneSidedMarket):
         bid = Bid(str(uuid.uuid4()) if bid_id is None else bid_id,
                   self.now, price, energy, buyer, seller, original_bid_price, buyer_origin)
         self.bids[bid.id] = bid
-        self.bid_history.append(bid)
+        if add_to_history is True:
+            self._add_to_history(self.bid_history, self._bid_history_positions, bid)
         log.debug(f"[BID][NEW][{self.time_slot_str}] {bid}")
         return bid
 
@@ -90,6 +98,32 @@ class TwoSidedPayAsBid(OneSidedMarket):
         log.debug(f"[BID][DEL][{self.time_slot_str}] {bid}")
         self._notify_listeners(MarketEvent.BID_DELETED, bid=bid)
 
+    @lock_market_action
+    def update_bid_price(self, bid_or_id: Union[str, Bid], price: float,
+                         original_bid_price=None, adapt_price_with_fees=True) -> Bid:
+        """
+        Changes the price of an open bid without deleting and re-posting it. The repriced
+        bid keeps the id of the original one and replaces it in the order book, otherwise
+        it is posted like a new bid (validation). Its entry in the bid history is updated instead
+        of adding another one, and instead of BID_DELETED and a new bid, only a BID_REPRICED
+        event is dispatched.
+        """
+        if self.readonly:
+            raise MarketReadOnlyException()
+        if isinstance(bid_or_id, Bid):
+            bid_or_id = bid_or_id.id
+        bid = self.bids.get(bid_or_id)
+        if not bid:
+            raise BidNotFound(bid_or_id)
+        repriced_bid = self.bid(price, bid.energy, bid.buyer, bid.seller, bid.buyer_origin,
+                                bid_id=bid.id, original_bid_price=original_bid_price,
+                                adapt_price_with_fees=adapt_price_with_fees,
+                                add_to_history=False)
+        self._replace_in_history(self.bid_history, self._bid_history_positions, repriced_bid)
+        log.debug(f"[BID][REPRICED][{self.time_slot_str}] {repriced_bid}")
+        self._notify_listeners(MarketEvent.BID_REPRICED, bid=repriced_bid)
+        return repriced_bid
+
     def split_bid(self, original_bid, energy, orig_bid_price):
 
         self.bids.pop(original_bid.id, None)
@@ -192,6 +226,8 @@ class TwoSidedPayAsBid(OneSidedMarket):
         return trade
 
     def _perform_pay_as_bid_matching(self):
+        if d3a.constants.PAY_AS_BID_MATCHING_ALGORITHM == 2:
+            return self._perform_merge_pay_as_bid_matching()
         # Pay as bid first
         # There are 2 simplistic approaches to the problem
         # 1. Match the cheapest offer with the most expensive bid. This will favor the sellers
@@ -216,6 +252,38 @@ class TwoSidedPayAsBid(OneSidedMarket):
                     break
         return offer_bid_pairs
 
+    def _perform_merge_pay_as_bid_matching(self):
+        # Produces the same pairs as the nested scan, in a single pass over both sorted lists:
+        # Every offer is matched with the most expensive bid that is not yet selected,
+        # that is expensive enough for the offer and that does not belong to the offer seller.
+        sorted_bids = self.sorting(self.bids, True)
+        sorted_offers = self.sorting(self.offers, True)
+
+        # Bids that were expensive enough for an already visited offer, but were skipped
+        # because they belong to its seller. Since offers are visited in descending rate order,
+        # these bids are expensive enough for all following offers.
+        skipped_bids = []
+        bid_index = 0
+        offer_bid_pairs = []
+        for offer in sorted_offers:
+            matched_bid = None
+            for index, bid in enumerate(skipped_bids):
+                if offer.seller != bid.buyer:
+                    matched_bid = skipped_bids.pop(index)
+                    break
+            while matched_bid is None and bid_index < len(sorted_bids) and \
+                    (offer.energy_rate - sorted_bids[bid_index].energy_rate) <= \
+                    FLOATING_POINT_TOLERANCE:
+                bid = sorted_bids[bid_index]
+                bid_index += 1
+                if offer.seller != bid.buyer:
+                    matched_bid = bid
+                else:
+                    skipped_bids.append(bid)
+            if matched_bid is not None:
+                offer_bid_pairs.append(tuple((matched_bid, offer)))
+        return offer_bid_pairs
+
     def accept_bid_offer_pair(self, bid, offer, clearing_rate, trade_bid_info, selected_energy):
         already_tracked = bid.buyer == offer.seller
         trade = self.accept_offer(offer_or_id=offer,
@@ -237,8 +305,9 @@ class TwoSidedPayAsBid(OneSidedMarket):
         return bid_trade, trade
 
     def match_offers_bids(self):
-        while len(self._perform_pay_as_bid_matching()) > 0:
-            for bid, offer in self._perform_pay_as_bid_matching():
+        offer_bid_pairs = self._perform_pay_as_bid_matching()
+        while len(offer_bid_pairs) > 0:
+            for bid, offer in offer_bid_pairs:
                 selected_energy = bid.energy if bid.energy < offer.energy else offer.energy
                 original_bid_rate = bid.original_bid_price / bid.energy
                 matched_rate = bid.energy_rate
@@ -252,3 +321,4 @@ class TwoSidedPayAsBid(OneSidedMarket):
 
                 self.accept_bid_offer_pair(bid, offer, matched_rate,
                                            trade_bid_info, selected_energy)
+            offer_bid_pairs = self._perform_pay_as_bid_matching()
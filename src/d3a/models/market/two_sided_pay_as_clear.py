@@ -18,6 +18,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import math
 from logging import getLogger
 from collections import OrderedDict
+import numpy as np
 
 from d3a.models.market.two_sided_pay_as_bid import TwoSidedPayAsBid
 from d3a.models.market.market_structures import MarketClearingState, BidOfferMatch, \
@@ -110,6 +111,50 @@ class TwoSidedPayAsClear(TwoSidedPayAsBid):
             if len(clearing) > 0:
                 return clearing[-1].rate, clearing[-1].energy
 
+    @staticmethod
+    def _rate_energy_arrays(offer_bid):
+        count = len(offer_bid)
+        rates = np.fromiter((o.price / o.energy for o in offer_bid), dtype=float, count=count)
+        energy = np.fromiter((o.energy for o in offer_bid), dtype=float, count=count)
+        return rates, energy
+
+    def _vectorized_clearing_point(self):
+        """
+        Calculates the same clearing point as _clearing_point_from_supply_demand_curve,
+        using NumPy arrays for the cumulative supply and demand curves instead of iterating
+        over all bid / offer rate combinations.
+        """
+        # Bids in descending, offers in ascending rate order, same as the sorted bids / offers
+        bid_rates, bid_energy = self._rate_energy_arrays(self.sorted_bids)
+        offer_rates, offer_energy = self._rate_energy_arrays(self.sorted_offers)
+        cumulative_bid_energy = np.cumsum(bid_energy)
+        cumulative_offer_energy = np.cumsum(offer_energy)
+
+        # Demand curve with unique rates in ascending order. The cumulative demand of a rate
+        # is the one of its last bid in descending order, thus includes all bids with this rate.
+        demand_rates, first_index = np.unique(bid_rates[::-1], return_index=True)
+        demand_energy = cumulative_bid_energy[::-1][first_index]
+
+        self.state.cumulative_bids[self.now] = \
+            dict(zip(demand_rates[::-1].tolist(), demand_energy[::-1].tolist()))
+        self.state.cumulative_offers[self.now] = \
+            dict(zip(offer_rates.tolist(), cumulative_offer_energy.tolist()))
+
+        # Cumulative supply of all offers that are cheap enough for each demand rate
+        supply_index = np.searchsorted(
+            offer_rates, demand_rates + FLOATING_POINT_TOLERANCE, side="right") - 1
+        has_supply = supply_index >= 0
+        supply_energy = np.where(has_supply, cumulative_offer_energy[supply_index], 0.0)
+
+        # Cheapest demand rate whose demand can be covered completely by the supply
+        covered = np.flatnonzero(has_supply & (supply_energy >= demand_energy))
+        if len(covered) > 0:
+            return float(demand_rates[covered[0]]), float(demand_energy[covered[0]])
+        # Otherwise the supply is not enough for any demand rate, therefore the most expensive
+        # demand rate clears the whole supply that is cheap enough for it
+        if has_supply[-1]:
+            return float(demand_rates[-1]), float(supply_energy[-1])
+
     def _perform_pay_as_clear_matching(self):
         self.sorted_bids = self.sorting(self.bids, True)
 
@@ -130,6 +175,8 @@ class TwoSidedPayAsClear(TwoSidedPayAsBid):
             max_rate = self._populate_market_cumulative_offer_and_bid(cumulative_bids,
                                                                       cumulative_offers)
             return self._get_clearing_point(max_rate)
+        elif ConstSettings.IAASettings.PAY_AS_CLEAR_AGGREGATION_ALGORITHM == 3:
+            return self._vectorized_clearing_point()
 
     def _populate_market_cumulative_offer_and_bid(self, cumulative_bids, cumulative_offers):
         max_rate = max(
@@ -17,7 +17,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from pendulum import duration, DateTime  # NOQA
 from typing import Dict  # NOQA
-from collections import namedtuple
+from collections import namedtuple, deque
 from enum import Enum
 from math import isclose
 from d3a_interface.constants_limits import ConstSettings
@@ -63,6 +63,19 @@ class ESSEnergyOrigin(Enum):
 EnergyOrigin = namedtuple('EnergyOrigin', ('origin', 'value'))
 
 
+class BuyClamp:
+    """
+    Market slots of a buy clamp (see StorageState.clamp_energy_to_buy_kWh) with their
+    accumulated bought and sought energy. The sums are taken when the clamp is created, energy
+    that is sought afterwards is added by StorageState.add_offered_buy_kWh.
+    """
+
+    def __init__(self, slot_count, bought_kWh, sought_kWh):
+        self.slot_count = slot_count
+        self.bought_kWh = bought_kWh
+        self.sought_kWh = sought_kWh
+
+
 class StorageState:
     def __init__(self,
                  initial_soc=StorageSettings.MIN_ALLOWED_SOC,
@@ -113,7 +126,10 @@ class StorageState:
 
         self._used_storage = initial_capacity_kWh
         self._battery_energy_per_slot = 0.0
-        self._used_storage_share = [EnergyOrigin(initial_energy_origin, initial_capacity_kWh)]
+        # Stored energy per origin, first in first out. Adjacent shares of the same origin are
+        # merged
+        self._used_storage_share = deque()
+        self.update_used_storage_share(initial_capacity_kWh, initial_energy_origin)
 
     @property
     def used_storage(self):
@@ -123,11 +139,38 @@ class StorageState:
         return self._used_storage
 
     def update_used_storage_share(self, energy, source=ESSEnergyOrigin.UNKNOWN):
-        self._used_storage_share.append(EnergyOrigin(source, energy))
+        shares = self._used_storage_share
+        if shares and shares[-1].origin == source:
+            shares[-1] = EnergyOrigin(source, shares[-1].value + energy)
+        else:
+            shares.append(EnergyOrigin(source, energy))
+
+    def consume_used_storage_share(self, energy):
+        """
+        Removes sold energy from the used storage shares, based on a FIRST-IN FIRST-OUT mechanism
+        """
+        shares = self._used_storage_share
+        while limit_float_precision(energy) > 0:
+            first_in_energy_with_origin = shares[0]
+            origin = first_in_energy_with_origin.origin
+            if energy >= first_in_energy_with_origin.value:
+                energy -= first_in_energy_with_origin.value
+                shares.popleft()
+            else:
+                residual = first_in_energy_with_origin.value - energy
+                shares[0] = EnergyOrigin(origin, residual)
+                energy = 0
 
     @property
     def get_used_storage_share(self):
-        return self._used_storage_share
+        return list(self._used_storage_share)
+
+    @property
+    def used_storage_per_origin(self):
+        used_storage_per_origin = {origin: 0. for origin in ESSEnergyOrigin}
+        for energy_type in self._used_storage_share:
+            used_storage_per_origin[energy_type.origin] += energy_type.value
+        return used_storage_per_origin
 
     def free_storage(self, time_slot):
         """
@@ -162,47 +205,69 @@ class StorageState:
         """
         Determines available energy to sell for each active market and returns a dict[TIME, FLOAT]
         """
+        if not market_slot_time_list:
+            return {}
         accumulated_pledged = 0
         accumulated_offered = 0
         for time_slot in market_slot_time_list:
             accumulated_pledged += self.pledged_sell_kWh[time_slot]
             accumulated_offered += self.offered_sell_kWh[time_slot]
 
-        energy = self.used_storage \
-            - accumulated_pledged \
-            - accumulated_offered \
-            - self.min_allowed_soc_ratio * self.capacity
+        energy = (self.used_storage
+                  - accumulated_pledged
+                  - accumulated_offered
+                  - self.min_allowed_soc_ratio * self.capacity) / len(market_slot_time_list)
         storage_dict = {}
         for time_slot in market_slot_time_list:
             storage_dict[time_slot] = limit_float_precision(min(
-                                                            energy / len(market_slot_time_list),
+                                                            energy,
                                                             self.max_offer_energy_kWh(time_slot),
                                                             self._battery_energy_per_slot))
-            self.energy_to_sell_dict[time_slot] = storage_dict[time_slot]
+        self.energy_to_sell_dict.update(storage_dict)
 
         return storage_dict
 
     def clamp_energy_to_buy_kWh(self, market_slot_time_list):
         """
         Determines amount of energy that can be bought for each active market and writes it to
-        self.energy_to_buy_dict
+        self.energy_to_buy_dict. Returns the BuyClamp of the markets, for update_energy_to_buy_kWh
         """
-
         accumulated_bought = 0
         accumulated_sought = 0
         for time_slot in market_slot_time_list:
             accumulated_bought += self.pledged_buy_kWh[time_slot]
             accumulated_sought += self.offered_buy_kWh[time_slot]
-        energy = limit_float_precision((self.capacity
-                                        - self.used_storage
-                                        - accumulated_bought
-                                        - accumulated_sought) / len(market_slot_time_list))
+        buy_clamp = BuyClamp(len(market_slot_time_list), accumulated_bought, accumulated_sought)
 
         for time_slot in market_slot_time_list:
-            clamped_energy = limit_float_precision(
-                min(energy, self.max_buy_energy_kWh(time_slot), self._battery_energy_per_slot))
-            clamped_energy = max(clamped_energy, 0)
-            self.energy_to_buy_dict[time_slot] = clamped_energy
+            self.update_energy_to_buy_kWh(time_slot, buy_clamp)
+        return buy_clamp
+
+    def add_offered_buy_kWh(self, time_slot, energy, buy_clamp):
+        """
+        Adds energy that the storage wants to buy in one of the markets of buy_clamp, keeping
+        the accumulated sought energy of the clamp up to date
+        """
+        self.offered_buy_kWh[time_slot] += energy
+        buy_clamp.sought_kWh += energy
+
+    def update_energy_to_buy_kWh(self, time_slot, buy_clamp):
+        """
+        Clamps the energy that can be bought in one of the markets of buy_clamp again, from the
+        accumulated energy of the clamp and the current used storage
+        """
+        if buy_clamp.slot_count == 0:
+            self.energy_to_buy_dict[time_slot] = 0
+            return 0
+        energy = limit_float_precision((self.capacity
+                                        - self.used_storage
+                                        - buy_clamp.bought_kWh
+                                        - buy_clamp.sought_kWh)
+                                       / buy_clamp.slot_count)
+        clamped_energy = limit_float_precision(
+            min(energy, self.max_buy_energy_kWh(time_slot), self._battery_energy_per_slot))
+        self.energy_to_buy_dict[time_slot] = max(clamped_energy, 0)
+        return self.energy_to_buy_dict[time_slot]
 
     def check_state(self, time_slot):
         """
@@ -252,5 +317,5 @@ class StorageState:
         self.offered_history[time_slot] = self.offered_sell_kWh[time_slot]
 
         if past_time_slot:
-            for energy_type in self._used_storage_share:
-                self.time_series_ess_share[past_time_slot][energy_type.origin] += energy_type.value
+            for origin, energy in self.used_storage_per_origin.items():
+                self.time_series_ess_share[past_time_slot][origin] += energy
@@ -17,7 +17,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import json
 from logging import getLogger
-from typing import List, Dict, Any, Union  # noqa
+from typing import List, Dict, Set, Any, Union  # noqa
 from uuid import uuid4
 
 from d3a.d3a_core.exceptions import SimulationException
@@ -31,6 +31,7 @@ from d3a.events import EventMixin
 from d3a.d3a_core.exceptions import D3ARedisException
 from d3a.d3a_core.util import append_or_create_key
 from d3a.models.market.market_structures import trade_from_JSON_string, offer_from_JSON_string
+from d3a.models.market.trade_index import trades_of_trader
 from d3a.d3a_core.redis_connections.redis_area_market_communicator import BlockingCommunicator
 from d3a.constants import FLOATING_POINT_TOLERANCE
 
@@ -42,10 +43,7 @@ class _TradeLookerUpper:
         self.owner_name = owner_name
 
     def __getitem__(self, market):
-        for trade in market.trades:
-            owner_name = self.owner_name
-            if trade.seller == owner_name or trade.buyer == owner_name:
-                yield trade
+        yield from trades_of_trader(market, self.owner_name)
 
 
 class Offers:
@@ -62,10 +60,44 @@ class Offers:
     def __init__(self, strategy):
         self.strategy = strategy
         self.bought = {}  # type: Dict[Offer, str]
-        self.posted = {}  # type: Dict[Offer, str]
         self.sold = {}  # type: Dict[str, List[Offer]]
+        # market-id -> ids of the sold offers, mirrors self.sold
+        self._sold_ids = {}  # type: Dict[str, Set[str]]
+        self.posted = {}  # type: Dict[Offer, str]
         self.split = {}  # type: Dict[str, Offer]
 
+    @property
+    def posted(self):
+        return self._posted
+
+    @posted.setter
+    def posted(self, posted):
+        self._posted = {}
+        # Posted offers, and the subset of them that has not been sold yet, by market id and
+        # offer id. Keep posting order, so that they can be used instead of scanning self.posted
+        self._posted_by_market = {}  # type: Dict[str, Dict[str, Offer]]
+        self._open_by_market = {}  # type: Dict[str, Dict[str, Offer]]
+        self._open = {}  # type: Dict[Offer, str]
+        for offer, market_id in posted.items():
+            self._add_posted(offer, market_id)
+
+    def _add_posted(self, offer, market_id):
+        if self._posted.get(offer, market_id) != market_id:
+            self._remove_posted(offer)
+        self._posted[offer] = market_id
+        self._posted_by_market.setdefault(market_id, {})[offer.id] = offer
+        if offer.id not in self._sold_ids.get(market_id, ()):
+            self._open_by_market.setdefault(market_id, {})[offer.id] = offer
+            self._open[offer] = market_id
+
+    def _remove_posted(self, offer):
+        market_id = self._posted.pop(offer)
+        self._posted_by_market.get(market_id, {}).pop(offer.id, None)
+        open_offer = self._open_by_market.get(market_id, {}).pop(offer.id, None)
+        if open_offer is not None:
+            self._open.pop(open_offer, None)
+        return market_id
+
     @property
     def area(self):
         # TODO: Remove the owner and area distinction from the AreaBehaviorBase class
@@ -86,23 +118,20 @@ class Offers:
 
     @property
     def open(self):
-        open_offers = {}
-        for offer, market_id in self.posted.items():
-            if market_id not in self.sold:
-                self.sold[market_id] = []
-            if offer not in self.sold[market_id]:
-                open_offers[offer] = market_id
-        return open_offers
+        return dict(self._open)
 
     def bought_offer(self, offer, market_id):
         self.bought[offer] = market_id
 
     def sold_offer(self, offer, market_id):
         self.sold = append_or_create_key(self.sold, market_id, offer)
+        self._sold_ids.setdefault(market_id, set()).add(offer.id)
+        open_offer = self._open_by_market.get(market_id, {}).pop(offer.id, None)
+        if open_offer is not None:
+            self._open.pop(open_offer, None)
 
     def is_offer_posted(self, market_id, offer_id):
-        return offer_id in [offer.id for offer, _market in self.posted.items()
-                            if market_id == _market]
+        return offer_id in self._posted_by_market.get(market_id, {})
 
     def get_sold_offer_ids_in_market(self, market_id):
         sold_offer_ids = []
@@ -111,21 +140,16 @@ class Offers:
         return sold_offer_ids
 
     def open_in_market(self, market_id):
-        open_offers = []
-        sold_offer_ids = self.get_sold_offer_ids_in_market(market_id)
-        for offer, _market in self.posted.items():
-            if offer.id not in sold_offer_ids and market_id == _market:
-                open_offers.append(offer)
-        return open_offers
+        return list(self._open_by_market.get(market_id, {}).values())
 
     def open_offer_energy(self, market_id):
-        return sum(o.energy for o in self.open_in_market(market_id))
+        return sum(o.energy for o in self._open_by_market.get(market_id, {}).values())
 
     def posted_in_market(self, market_id):
-        return [offer for offer, _market in self.posted.items() if market_id == _market]
+        return list(self._posted_by_market.get(market_id, {}).values())
 
     def posted_offer_energy(self, market_id):
-        return sum(o.energy for o in self.posted_in_market(market_id))
+        return sum(o.energy for o in self._posted_by_market.get(market_id, {}).values())
 
     def can_offer_be_posted(self, offer_energy, available_energy, market):
         posted_energy = (offer_energy + self.posted_offer_energy(market.id))
@@ -140,13 +164,17 @@ class Offers:
     def post(self, offer, market_id):
         # If offer was split already, don't post one with the same uuid again
         if offer.id not in self.split:
-            self.posted[offer] = market_id
+            self._add_posted(offer, market_id)
+
+    def _posted_with_id(self, offer_id):
+        return [offers[offer_id] for offers in self._posted_by_market.values()
+                if offer_id in offers]
 
     def remove_offer_from_cache_and_market(self, market, offer_id=None):
         if offer_id is None:
             to_delete_offers = self.open_in_market(market.id)
         else:
-            to_delete_offers = [o for o, m in self.posted.items() if o.id == offer_id]
+            to_delete_offers = self._posted_with_id(offer_id)
         deleted_offer_ids = []
         for offer in to_delete_offers:
             market.delete_offer(offer.id)
@@ -156,18 +184,18 @@ class Offers:
 
     def remove_offer_by_id(self, market_id, offer_id=None):
         try:
-            offer = [o for o, m in self.posted.items() if o.id == offer_id][0]
+            offer = self._posted_with_id(offer_id)[0]
             self.remove(offer)
         except (IndexError, KeyError):
             self.strategy.warning(f"Could not find offer to remove: {offer_id}")
 
     def remove(self, offer):
         try:
-            market_id = self.posted.pop(offer)
+            market_id = self._remove_posted(offer)
             assert type(market_id) == str
-            if market_id in self.sold and offer in self.sold[market_id]:
+            if offer.id in self._sold_ids.get(market_id, ()):
                 self.strategy.log.warning("Offer already sold, cannot remove it.")
-                self.posted[offer] = market_id
+                self._add_posted(offer, market_id)
             else:
                 return True
         except KeyError:
@@ -281,6 +309,14 @@ class BaseStrategy(TriggerMixin, EventMixin, AreaBehaviorBase):
         self.offer_buffer = None
         return offer
 
+    def update_offer_price(self, market_id, offer_args):
+        self._send_events_to_market("UPDATE_OFFER_PRICE", market_id, offer_args,
+                                    self._offer_response)
+        offer = self.offer_buffer
+        assert offer is not None
+        self.offer_buffer = None
+        return offer
+
     def _offer_response(self, payload):
         data = json.loads(payload["data"])
         # TODO: is this additional parsing needed?
@@ -391,12 +427,20 @@ class BaseStrategy(TriggerMixin, EventMixin, AreaBehaviorBase):
         if self.enabled or event_type in self._allowed_disable_events:
             super().event_listener(event_type, **kwargs)
 
+    def event_listener_batch(self, event_type: MarketEvent, market_id, events: List[dict]):
+        if self.enabled or event_type in self._allowed_disable_events:
+            super().event_listener_batch(event_type, market_id, events)
+
     def event_trade(self, *, market_id, trade):
         self.offers.on_trade(market_id, trade)
 
     def event_offer_split(self, *, market_id, original_offer, accepted_offer, residual_offer):
         self.offers.on_offer_split(original_offer, accepted_offer, residual_offer, market_id)
 
+    def event_offer_repriced(self, *, market_id, offer):
+        # A repriced offer can be bought at its new price like a newly posted one
+        self.event_offer(market_id=market_id, offer=offer)
+
     def event_market_cycle(self):
         if not ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
             self.offers.delete_past_markets_offers()
@@ -418,8 +462,10 @@ class BaseStrategy(TriggerMixin, EventMixin, AreaBehaviorBase):
 class BidEnabledStrategy(BaseStrategy):
     def __init__(self):
         super().__init__()
-        self._bids = {}
-        self._traded_bids = {}
+        # market-id -> {bid-id -> Bid}
+        self._bids = {}  # type: Dict[str, Dict[str, Bid]]
+        # market-id -> [Bid]
+        self._traded_bids = {}  # type: Dict[str, List[Bid]]
 
     def post_bid(self, market, price, energy, buyer_origin=None):
         bid = market.bid(
@@ -433,42 +479,44 @@ class BidEnabledStrategy(BaseStrategy):
         self.add_bid_to_posted(market.id, bid)
         return bid
 
+    def update_bid_price(self, market, bid, price):
+        """Reprices a posted bid in place, keeping its id"""
+        repriced_bid = market.update_bid_price(bid, price, original_bid_price=price)
+        self.add_bid_to_posted(market.id, repriced_bid)
+        return repriced_bid
+
     def can_bid_be_posted(self, bid_energy, required_energy_kWh, market):
         posted_energy = (bid_energy + self.posted_bid_energy(market.id))
         return posted_energy <= required_energy_kWh
 
     def is_bid_posted(self, market, bid_id):
-        return bid_id in [bid.id for bid in self.get_posted_bids(market)]
+        return bid_id in self._bids.get(market.id, {})
 
     def posted_bid_energy(self, market_id):
         if market_id not in self._bids:
             return 0.0
-        return sum(b.energy for b in self._bids[market_id])
+        return sum(b.energy for b in self._bids[market_id].values())
 
     def remove_bid_from_pending(self, market_id, bid_id=None):
         market = self.area.get_future_market_from_id(market_id)
         if market is None:
             return
+        posted_bids = self._bids.get(market.id, {})
         if bid_id is None:
-            deleted_bid_ids = [bid.id for bid in self.get_posted_bids(market)]
+            deleted_bid_ids = list(posted_bids.keys())
         else:
             deleted_bid_ids = [bid_id]
         for b_id in deleted_bid_ids:
             if b_id in market.bids.keys():
                 market.delete_bid(b_id)
-        self._bids[market.id] = [bid for bid in self.get_posted_bids(market)
-                                 if bid.id not in deleted_bid_ids]
+            posted_bids.pop(b_id, None)
         return deleted_bid_ids
 
     def add_bid_to_posted(self, market_id, bid):
-        if market_id not in self._bids.keys():
-            self._bids[market_id] = []
-        self._bids[market_id].append(bid)
+        self._bids.setdefault(market_id, {})[bid.id] = bid
 
     def add_bid_to_bought(self, bid, market_id, remove_bid=True):
-        if market_id not in self._traded_bids:
-            self._traded_bids[market_id] = []
-        self._traded_bids[market_id].append(bid)
+        self._traded_bids.setdefault(market_id, []).append(bid)
         if remove_bid:
             self.remove_bid_from_pending(market_id, bid.id)
 
@@ -479,9 +527,7 @@ class BidEnabledStrategy(BaseStrategy):
             return self._traded_bids[market.id]
 
     def are_bids_posted(self, market_id):
-        if market_id not in self._bids:
-            return False
-        return len(self._bids[market_id]) > 0
+        return len(self._bids.get(market_id, {})) > 0
 
     def post_first_bid(self, market, energy_Wh):
         # TODO: It will be safe to remove this check once we remove the event_market_cycle being
@@ -489,7 +535,7 @@ class BidEnabledStrategy(BaseStrategy):
         # should be only bid from a device to a market at all times, which will be replaced if
         # it needs to be updated. If this check is not there, the market cycle event will post
         # one bid twice, which actually happens on the very first market slot cycle.
-        if not all(bid.buyer != self.owner.name for bid in market.get_bids().values()):
+        if market.get_bids_of_buyer(self.owner.name):
             self.owner.log.warning(f"There is already another bid posted on the market, therefore"
                                    f" do not repost another first bid.")
             return None
@@ -503,7 +549,7 @@ class BidEnabledStrategy(BaseStrategy):
     def get_posted_bids(self, market):
         if market.id not in self._bids:
             return []
-        return self._bids[market.id]
+        return list(self._bids[market.id].values())
 
     def event_bid_deleted(self, *, market_id, bid):
         assert ConstSettings.IAASettings.MARKET_TYPE != 1, \
@@ -536,5 +582,5 @@ class BidEnabledStrategy(BaseStrategy):
 
     def assert_if_trade_bid_price_is_too_high(self, market, trade):
         if isinstance(trade.offer, Bid) and trade.offer.buyer == self.owner.name:
-            bid = [b for b in self.get_posted_bids(market) if b.id == trade.offer.id][0]
+            bid = self._bids[market.id][trade.offer.id]
             assert trade.offer.energy_rate <= bid.energy_rate + FLOATING_POINT_TOLERANCE
@@ -0,0 +1,72 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import d3a.constants
+from d3a.models.market.order_book import OrderBook
+
+
+def _best_rate(orders, highest):
+    if isinstance(orders, OrderBook):
+        best_order = orders.highest() if highest else orders.lowest()
+        return best_order.energy_rate if best_order is not None else None
+    rates = [order.energy_rate for order in orders.values()]
+    if not rates:
+        return None
+    return max(rates) if highest else min(rates)
+
+
+class ForwardingPolicy:
+    """
+    Decides whether an IAAEngine forwards a usable offer or bid to its target market.
+    The base policy forwards all of them.
+    """
+
+    def forward_offer(self, offer, target_market) -> bool:
+        return True
+
+    def forward_bid(self, bid, target_market) -> bool:
+        return True
+
+
+class PriceBandForwardingPolicy(ForwardingPolicy):
+    """
+    Forwards an offer only if its energy rate is at most price_band above the highest bid of
+    the target market, and a bid only if its energy rate is at most price_band below the
+    lowest offer of the target market. Orders on the other side of the best opposing rate can
+    be matched and are always forwarded, as are orders to a target market without opposing
+    orders.
+    """
+
+    def __init__(self, price_band: float):
+        assert price_band >= 0
+        self.price_band = price_band
+
+    def forward_offer(self, offer, target_market) -> bool:
+        highest_bid_rate = _best_rate(target_market.bids, highest=True)
+        return highest_bid_rate is None or \
+            offer.energy_rate <= highest_bid_rate + self.price_band
+
+    def forward_bid(self, bid, target_market) -> bool:
+        lowest_offer_rate = _best_rate(target_market.offers, highest=False)
+        return lowest_offer_rate is None or \
+            bid.energy_rate >= lowest_offer_rate - self.price_band
+
+
+def forwarding_policy_from_settings():
+    if d3a.constants.IAA_FORWARDING_POLICY == d3a.constants.IAA_FORWARD_PRICE_BAND:
+        return PriceBandForwardingPolicy(d3a.constants.IAA_FORWARDING_PRICE_BAND)
+    return ForwardingPolicy()
@@ -0,0 +1,146 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from heapq import heappop, heappush
+from itertools import count
+from operator import itemgetter
+from typing import Dict, List  # noqa
+
+from d3a.models.market.order_book import OrderBook
+
+
+class ForwardingSchedule:
+    """
+    Ages of the orders of the source market of an IAAEngine, and the orders that have reached
+    the minimum age for forwarding.
+
+    New orders are taken from the insertion log of the source order book, orders waiting for
+    their minimum age are kept in a min-heap by age, therefore a tick only touches the orders
+    that are new or become forwardable. Orders that were forwarded are set aside until they
+    are no longer forwarded (see forwarding_removed).
+
+    The age dict is shared with the engine (offer_age / bid_age). Each registration gets a
+    sequence number, entries of the heap and of the due orders whose sequence does not match
+    the registration are stale and skipped.
+    """
+
+    def __init__(self):
+        self.ages = {}  # type: Dict[str, int]
+        self._sequences = {}  # type: Dict[str, int]
+        self._sequence = count()
+        # (age, sequence, order id), orders that have not reached their minimum age yet
+        self._pending = []
+        # order id -> sequence, orders that have reached their minimum age
+        self._due = {}  # type: Dict[str, int]
+        self._forwarded = {}  # type: Dict[str, int]
+        self._to_register = {}  # type: Dict[str, None]
+        # (order book, position in its insertion log)
+        self._log_position = (None, 0)
+
+    def _is_registered(self, order_id, sequence):
+        return order_id in self.ages and self._sequences.get(order_id) == sequence
+
+    def new_order_ids(self, orders):
+        """
+        Ids of the orders that were inserted into orders since the last call, and of the
+        orders passed to remove, in the order orders iterates them. Every order id is
+        returned if orders is not an OrderBook.
+        """
+        if not isinstance(orders, OrderBook):
+            return list(orders.keys())
+        book, position = self._log_position
+        if book is not orders:
+            position = 0
+        inserted_ids, position = orders.keys_inserted_since(position)
+        self._log_position = (orders, position)
+        candidate_ids = list(self._to_register) + inserted_ids
+        self._to_register = {}
+        return sorted({order_id: None for order_id in candidate_ids if order_id in orders},
+                      key=orders.insertion_sequence)
+
+    def register(self, order_id, age):
+        sequence = next(self._sequence)
+        self.ages[order_id] = age
+        self._sequences[order_id] = sequence
+        heappush(self._pending, (age, sequence, order_id))
+
+    def remove(self, order_id):
+        """
+        Removes the age of the order. If the order is still in the source market, it is
+        returned again by the next call of new_order_ids.
+        """
+        self.ages.pop(order_id, None)
+        self._to_register[order_id] = None
+
+    def reschedule(self, order_id):
+        """Forwarding of a registered order is considered again once it is due"""
+        sequence = self._sequences.get(order_id)
+        if self._is_registered(order_id, sequence):
+            self._forwarded.pop(order_id, None)
+            heappush(self._pending, (self.ages[order_id], sequence, order_id))
+
+    def move(self, order_id, new_order_id):
+        """The age of order_id is kept for new_order_id (e.g. for the residual of a split)"""
+        if order_id in self.ages:
+            self.register(new_order_id, self.ages.pop(order_id))
+
+    def due_order_ids(self, current_tick, min_age, orders=None):
+        """
+        Ids of the orders that have reached min_age and are not set aside as forwarded, in the
+        order of their registration. If orders is given, due orders that are no longer in it
+        are discarded and the others are returned in the order orders iterates them.
+        """
+        pending = self._pending
+        while pending and current_tick - pending[0][0] >= min_age:
+            _, sequence, order_id = heappop(pending)
+            if self._is_registered(order_id, sequence):
+                self._due[order_id] = sequence
+        due = []
+        for order_id, sequence in list(self._due.items()):
+            if not self._is_registered(order_id, sequence) or \
+                    (orders is not None and order_id not in orders):
+                del self._due[order_id]
+            elif current_tick - self.ages[order_id] < min_age:
+                # The minimum age was raised
+                del self._due[order_id]
+                heappush(pending, (self.ages[order_id], sequence, order_id))
+            else:
+                due.append((order_id, sequence))
+        if isinstance(orders, OrderBook):
+            return sorted((order_id for order_id, _ in due), key=orders.insertion_sequence)
+        return [order_id for order_id, _ in sorted(due, key=itemgetter(1))]
+
+    def set_forwarded(self, order_id):
+        """The due order is set aside until forwarding_removed is called for it"""
+        sequence = self._due.pop(order_id, None)
+        if sequence is not None:
+            self._forwarded[order_id] = sequence
+
+    def defer(self, order_id, current_tick):
+        """
+        The due order is not forwarded for now, it is due again once the minimum age has
+        passed since current_tick
+        """
+        sequence = self._due.pop(order_id, None)
+        if sequence is not None:
+            heappush(self._pending, (current_tick, sequence, order_id))
+
+    def forwarding_removed(self, order_id):
+        """The order is no longer forwarded, it is due again if it is still registered"""
+        sequence = self._forwarded.pop(order_id, None)
+        if sequence is not None and self._is_registered(order_id, sequence):
+            self._due[order_id] = sequence
@@ -50,6 +50,11 @@ class InterAreaAgent(BaseStrategy):
         for engine in sorted(self.engines, key=lambda _: random()):
             engine.min_offer_age = min_offer_age
 
+    @property
+    def pruned_forward_count(self):
+        """Number of offer and bid forwards that the forwarding policy of the engines kept back"""
+        return sum(engine.pruned_forward_count for engine in self.engines)
+
     @property
     def trades(self):
         return _TradeLookerUpper(self.name)
@@ -66,6 +66,10 @@ class OneSidedAgent(InterAreaAgent):
         for engine in sorted(self.engines, key=lambda _: random()):
             engine.event_offer_deleted(offer=offer)
 
+    def event_offer_repriced(self, *, market_id, offer):
+        for engine in sorted(self.engines, key=lambda _: random()):
+            engine.event_offer_repriced(offer=offer)
+
     def event_offer_split(self, *, market_id,  original_offer, accepted_offer, residual_offer):
         for engine in sorted(self.engines, key=lambda _: random()):
             engine.event_offer_split(market_id=market_id,
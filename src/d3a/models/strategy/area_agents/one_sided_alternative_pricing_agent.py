@@ -59,7 +59,7 @@ class OneSidedAlternativePricingAgent(OneSidedAgent):
                         sell_rate = area.config.market_maker_rate[self.lower_market.time_slot]
                     else:
                         raise MarketException
-                    offer.update_price(offer.energy * sell_rate)
+                    self.lower_market.offers.update_price(offer.id, offer.energy * sell_rate)
                     self.accept_offer(self.lower_market, offer)
 
         except MarketException:
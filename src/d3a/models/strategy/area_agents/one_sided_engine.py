@@ -20,8 +20,11 @@ from typing import Dict, Set  # noqa
 from d3a.constants import FLOATING_POINT_TOLERANCE
 from d3a_interface.constants_limits import ConstSettings
 from d3a.d3a_core.util import short_offer_bid_log_str
-from d3a.d3a_core.exceptions import MarketException, OfferNotFoundException
+from d3a.d3a_core.exceptions import MarketException, OfferNotFoundException, \
+    D3ARedisException
 from d3a.models.market.market_structures import copy_offer
+from d3a.models.strategy.area_agents.forwarding_schedule import ForwardingSchedule
+from d3a.models.strategy.area_agents.forwarding_policy import forwarding_policy_from_settings
 
 
 OfferInfo = namedtuple('OfferInfo', ('source_offer', 'target_offer'))
@@ -31,29 +34,35 @@ ResidualInfo = namedtuple('ResidualInfo', ('forwarded', 'age'))
 
 class IAAEngine:
     def __init__(self, name: str, market_1, market_2, min_offer_age: int,
-                 owner: "InterAreaAgent"):
+                 owner: "InterAreaAgent", forwarding_policy=None):
         self.name = name
         self.markets = Markets(market_1, market_2)
         self.min_offer_age = min_offer_age
         self.owner = owner
+        self.forwarding_policy = forwarding_policy \
+            if forwarding_policy is not None else forwarding_policy_from_settings()
 
-        self.offer_age = {}  # type: Dict[str, int]
+        self._offer_schedule = ForwardingSchedule()
+        self.offer_age = self._offer_schedule.ages  # type: Dict[str, int]
         # Offer.id -> OfferInfo
         self.forwarded_offers = {}  # type: Dict[str, OfferInfo]
         self.trade_residual = {}  # type Dict[str, Offer]
         self.ignored_offers = set()  # type: Set[str]
+        # Number of forwards that the forwarding policy kept back
+        self.pruned_forward_count = 0
 
     def __repr__(self):
         return "<IAAEngine [{s.owner.name}] {s.name} {s.markets.source.time_slot:%H:%M}>".format(
             s=self
         )
 
-    def _offer_in_market(self, offer):
-        updated_price = self.markets.target.fee_class.update_forwarded_offer_with_fee(
+    def _forwarded_offer_price(self, offer):
+        return self.markets.target.fee_class.update_forwarded_offer_with_fee(
             offer.energy_rate, offer.original_offer_price / offer.energy) * offer.energy
 
+    def _offer_in_market(self, offer):
         kwargs = {
-            "price": updated_price,
+            "price": self._forwarded_offer_price(offer),
             "energy": offer.energy,
             "seller": self.owner.name,
             "original_offer_price": offer.original_offer_price,
@@ -66,6 +75,19 @@ class IAAEngine:
         else:
             return self.markets.target.offer(**kwargs)
 
+    def _update_offer_price_in_market(self, target_offer, offer):
+        kwargs = {
+            "price": self._forwarded_offer_price(offer),
+            "original_offer_price": offer.original_offer_price,
+        }
+
+        if ConstSettings.GeneralSettings.EVENT_DISPATCHING_VIA_REDIS:
+            kwargs["offer_or_id"] = target_offer.to_JSON_string()
+            return self.owner.update_offer_price(market_id=self.markets.target,
+                                                 offer_args=kwargs)
+        else:
+            return self.markets.target.update_offer_price(target_offer, **kwargs)
+
     def _forward_offer(self, offer):
         # TODO: This is an ugly solution. After the december release this check needs to
         #  implemented after grid fee being incorporated while forwarding in target market
@@ -87,21 +109,21 @@ class IAAEngine:
             return
         self.forwarded_offers.pop(offer_info.target_offer.id, None)
         self.forwarded_offers.pop(offer_info.source_offer.id, None)
+        self._offer_schedule.forwarding_removed(offer_info.source_offer.id)
 
     def tick(self, *, area):
         self.propagate_offer(area.current_tick)
 
     def propagate_offer(self, current_tick):
-        # Store age of offer
-        for offer in self.markets.source.offers.values():
-            if offer.id not in self.offer_age:
-                self.offer_age[offer.id] = current_tick
+        schedule = self._offer_schedule
+        # Store age of new offers
+        for offer_id in schedule.new_order_ids(self.markets.source.offers):
+            if offer_id not in self.offer_age:
+                schedule.register(offer_id, current_tick)
 
-        # Use `list()` to avoid in place modification errors
-        for offer_id, age in list(self.offer_age.items()):
+        for offer_id in schedule.due_order_ids(current_tick, self.min_offer_age):
             if offer_id in self.forwarded_offers:
-                continue
-            if current_tick - age < self.min_offer_age:
+                schedule.set_forwarded(offer_id)
                 continue
             offer = self.markets.source.offers.get(offer_id)
             if not offer:
@@ -110,22 +132,32 @@ class IAAEngine:
                 # be modified, thus causing a removal from the offer_age dict. In such a case, even
                 # if the offer is no longer in the offer_age dict, the execution should continue
                 # normally.
-                self.offer_age.pop(offer_id, None)
+                schedule.remove(offer_id)
                 continue
             if not self.owner.usable_offer(offer):
-                # Forbidden offer (i.e. our counterpart's)
-                self.offer_age.pop(offer_id, None)
+                # Forbidden offer (i.e. our counterpart's), its age is stored again on the next
+                # tick
+                schedule.remove(offer_id)
                 continue
 
             # Should never reach this point.
             # This means that the IAA is forwarding offers with the same seller and buyer name.
             # If we ever again reach a situation like this, we should never forward the offer.
             if self.owner.name == offer.seller:
-                self.offer_age.pop(offer_id, None)
+                schedule.remove(offer_id)
+                continue
+
+            if not self.forwarding_policy.forward_offer(offer, self.markets.target):
+                # Offer is considered again once the minimum offer age has passed
+                schedule.defer(offer_id, current_tick)
+                self.pruned_forward_count += 1
+                self.owner.log.trace(f"Offer {offer_id} is not forwarded by the forwarding "
+                                     f"policy of {self.name}")
                 continue
 
             forwarded_offer = self._forward_offer(offer)
             if forwarded_offer:
+                schedule.set_forwarded(offer_id)
                 self.owner.log.debug(f"Forwarded offer to {self.markets.source.name} "
                                      f"{self.owner.name}, {self.name} {forwarded_offer}")
 
@@ -164,7 +196,7 @@ class IAAEngine:
                 f"[{self.markets.source.time_slot_str}] Offer accepted {trade_source}")
 
             self._delete_forwarded_offer_entries(offer_info.source_offer)
-            self.offer_age.pop(offer_info.source_offer.id, None)
+            self._offer_schedule.remove(offer_info.source_offer.id)
 
         elif trade.offer.id == offer_info.source_offer.id:
             # Offer was bought in source market by another party
@@ -176,7 +208,7 @@ class IAAEngine:
                 self.owner.log.error("Error deleting InterAreaAgent offer: {}".format(ex))
 
             self._delete_forwarded_offer_entries(offer_info.source_offer)
-            self.offer_age.pop(offer_info.source_offer.id, None)
+            self._offer_schedule.remove(offer_info.source_offer.id)
         else:
             raise RuntimeError("Unknown state. Can't happen")
 
@@ -186,7 +218,7 @@ class IAAEngine:
     def event_offer_deleted(self, *, offer):
         if offer.id in self.offer_age:
             # Offer we're watching in source market was deleted - remove
-            del self.offer_age[offer.id]
+            self._offer_schedule.remove(offer.id)
 
         offer_info = self.forwarded_offers.get(offer.id)
         if not offer_info:
@@ -204,6 +236,21 @@ class IAAEngine:
         # TODO: Should potentially handle the flip side, by not deleting the source market offer
         # but by deleting the offered_offers entries
 
+    def event_offer_repriced(self, *, offer):
+        offer_info = self.forwarded_offers.get(offer.id)
+        if not offer_info or offer_info.source_offer.id != offer.id:
+            # Repricing doesn't concern us
+            return
+
+        # Offer in source market of an offer we're already offering in the target market
+        # was repriced - also reprice the forwarded offer in place
+        try:
+            repriced_offer = self._update_offer_price_in_market(offer_info.target_offer, offer)
+        except (MarketException, D3ARedisException):
+            self.owner.log.exception("Error repricing InterAreaAgent offer")
+            return
+        self._add_to_forward_offers(offer, repriced_offer)
+
     def event_offer_split(self, *, market_id, original_offer, accepted_offer, residual_offer):
         market = self.owner._get_market_from_market_id(market_id)
         if market is None:
@@ -246,8 +293,7 @@ class IAAEngine:
         else:
             return
 
-        if original_offer.id in self.offer_age:
-            self.offer_age[residual_offer.id] = self.offer_age.pop(original_offer.id)
+        self._offer_schedule.move(original_offer.id, residual_offer.id)
 
         self.owner.log.debug(f"Offer {short_offer_bid_log_str(local_offer)} was split into "
                              f"{short_offer_bid_log_str(local_split_offer)} and "
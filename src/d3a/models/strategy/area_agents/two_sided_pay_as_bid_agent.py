@@ -48,6 +48,10 @@ class TwoSidedPayAsBidAgent(OneSidedAgent):
         for engine in sorted(self.engines, key=lambda _: random()):
             engine.event_bid_deleted(bid=bid)
 
+    def event_bid_repriced(self, *, market_id, bid):
+        for engine in sorted(self.engines, key=lambda _: random()):
+            engine.event_bid_repriced(bid=bid)
+
     def event_bid_split(self, *, market_id, original_bid, accepted_bid, residual_bid):
         for engine in sorted(self.engines, key=lambda _: random()):
             engine.event_bid_split(market_id=market_id,
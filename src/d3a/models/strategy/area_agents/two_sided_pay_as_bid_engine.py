@@ -21,6 +21,7 @@ from d3a.models.strategy.area_agents.inter_area_agent import InterAreaAgent  # N
 from d3a.models.strategy.area_agents.one_sided_engine import IAAEngine
 from d3a.d3a_core.exceptions import BidNotFound, MarketException
 from d3a.models.market.market_structures import Bid
+from d3a.models.strategy.area_agents.forwarding_schedule import ForwardingSchedule
 from d3a.d3a_core.util import short_offer_bid_log_str
 from d3a.constants import FLOATING_POINT_TOLERANCE
 
@@ -30,17 +31,22 @@ BidInfo = namedtuple('BidInfo', ('source_bid', 'target_bid'))
 
 class TwoSidedPayAsBidEngine(IAAEngine):
     def __init__(self, name: str, market_1, market_2, min_offer_age: int, min_bid_age: int,
-                 owner: "InterAreaAgent"):
-        super().__init__(name, market_1, market_2, min_offer_age, owner)
+                 owner: "InterAreaAgent", forwarding_policy=None):
+        super().__init__(name, market_1, market_2, min_offer_age, owner, forwarding_policy)
         self.forwarded_bids = {}  # type: Dict[str, BidInfo]
         self.bid_trade_residual = {}  # type: Dict[str, Bid]
         self.min_bid_age = min_bid_age
-        self.bid_age = {}
+        self._bid_schedule = ForwardingSchedule()
+        self.bid_age = self._bid_schedule.ages  # type: Dict[str, int]
 
     def __repr__(self):
         return "<TwoSidedPayAsBidEngine [{s.owner.name}] {s.name} " \
                "{s.markets.source.time_slot:%H:%M}>".format(s=self)
 
+    def _forwarded_bid_price(self, bid):
+        return self.markets.source.fee_class.update_forwarded_bid_with_fee(
+            bid.price / bid.energy, bid.original_bid_price / bid.energy) * bid.energy
+
     def _forward_bid(self, bid):
         if bid.buyer == self.markets.target.name and \
            bid.seller == self.markets.source.name:
@@ -49,8 +55,7 @@ class TwoSidedPayAsBidEngine(IAAEngine):
             return
 
         forwarded_bid = self.markets.target.bid(
-            price=(self.markets.source.fee_class.update_forwarded_bid_with_fee(
-                bid.price / bid.energy, bid.original_bid_price / bid.energy)) * bid.energy,
+            price=self._forwarded_bid_price(bid),
             energy=bid.energy,
             buyer=self.owner.name,
             seller=self.markets.target.name,
@@ -68,6 +73,7 @@ class TwoSidedPayAsBidEngine(IAAEngine):
             return
         self.forwarded_bids.pop(bid_info.target_bid.id, None)
         self.forwarded_bids.pop(bid_info.source_bid.id, None)
+        self._bid_schedule.forwarding_removed(bid_info.source_bid.id)
 
     def should_forward_bid(self, bid, current_tick):
 
@@ -88,12 +94,34 @@ class TwoSidedPayAsBidEngine(IAAEngine):
     def tick(self, *, area):
         super().tick(area=area)
 
-        for bid_id, bid in self.markets.source.get_bids().items():
-            if bid.id not in self.bid_age:
-                self.bid_age[bid.id] = area.current_tick
-
-            if self.should_forward_bid(bid, area.current_tick):
-                self._forward_bid(bid)
+        schedule = self._bid_schedule
+        bids = self.markets.source.get_bids()
+        for bid_id in schedule.new_order_ids(bids):
+            if bid_id not in self.bid_age:
+                schedule.register(bid_id, area.current_tick)
+            else:
+                # Bid was re-inserted into the source market
+                schedule.reschedule(bid_id)
+
+        for bid_id in schedule.due_order_ids(area.current_tick, self.min_bid_age, bids):
+            bid = bids.get(bid_id)
+            if bid is None:
+                continue
+            if bid_id in self.forwarded_bids:
+                schedule.set_forwarded(bid_id)
+            elif self.should_forward_bid(bid, area.current_tick):
+                if not self.forwarding_policy.forward_bid(bid, self.markets.target):
+                    # Bid is considered again once the minimum bid age has passed
+                    schedule.defer(bid_id, area.current_tick)
+                    self.pruned_forward_count += 1
+                    self.owner.log.trace(f"Bid {bid_id} is not forwarded by the forwarding "
+                                         f"policy of {self.name}")
+                elif self._forward_bid(bid):
+                    schedule.set_forwarded(bid_id)
+            else:
+                # Forbidden bid (i.e. our counterpart's or our own), its age is stored again on
+                # the next tick
+                schedule.remove(bid_id)
 
     def delete_forwarded_bids(self, bid_info):
         try:
@@ -145,12 +173,12 @@ class TwoSidedPayAsBidEngine(IAAEngine):
                 seller_origin=bid_trade.seller_origin
             )
             self.delete_forwarded_bids(bid_info)
-            self.bid_age.pop(bid_info.source_bid.id, None)
+            self._bid_schedule.remove(bid_info.source_bid.id)
 
         elif bid_trade.offer.id == bid_info.source_bid.id:
             # Bid was traded in the source market by someone else
             self.delete_forwarded_bids(bid_info)
-            self.bid_age.pop(bid_info.source_bid.id, None)
+            self._bid_schedule.remove(bid_info.source_bid.id)
         else:
             raise Exception(f"Invalid bid state for IAA {self.owner.name}: "
                             f"traded bid {bid_trade} was not in offered bids tuple {bid_info}")
@@ -171,7 +199,24 @@ class TwoSidedPayAsBidEngine(IAAEngine):
             except MarketException:
                 self.owner.log.exception("Error deleting InterAreaAgent bid")
         self._delete_forwarded_bid_entries(bid_info.source_bid)
-        self.bid_age.pop(bid_info.source_bid.id, None)
+        self._bid_schedule.remove(bid_info.source_bid.id)
+
+    def event_bid_repriced(self, *, bid):
+        bid_info = self.forwarded_bids.get(bid.id)
+        if not bid_info or bid_info.source_bid.id != bid.id:
+            # Repricing doesn't concern us
+            return
+
+        # Bid in source market of a bid we're already bidding in the target market
+        # was repriced - also reprice the forwarded bid in place
+        try:
+            repriced_bid = self.markets.target.update_bid_price(
+                bid_info.target_bid, self._forwarded_bid_price(bid),
+                original_bid_price=bid.original_bid_price)
+        except MarketException:
+            self.owner.log.exception("Error repricing InterAreaAgent bid")
+            return
+        self._add_to_forward_bids(bid, repriced_bid)
 
     def event_bid_split(self, *, market_id, original_bid, accepted_bid, residual_bid):
         market = self.owner._get_market_from_market_id(market_id)
@@ -193,7 +238,7 @@ class TwoSidedPayAsBidEngine(IAAEngine):
             self._add_to_forward_bids(local_residual_bid, residual_bid)
             self._add_to_forward_bids(local_split_bid, accepted_bid)
 
-            self.bid_age[local_residual_bid.id] = self.bid_age.pop(local_bid.id)
+            self._bid_schedule.move(local_bid.id, local_residual_bid.id)
 
         elif market == self.markets.source and accepted_bid.id in self.forwarded_bids:
             # bid in the source market was split, also split the corresponding forwarded bid
@@ -214,7 +259,7 @@ class TwoSidedPayAsBidEngine(IAAEngine):
             self._add_to_forward_bids(residual_bid, local_residual_bid)
             self._add_to_forward_bids(accepted_bid, local_split_bid)
 
-            self.bid_age[residual_bid.id] = self.bid_age.pop(original_bid.id)
+            self._bid_schedule.move(original_bid.id, residual_bid.id)
 
         else:
             return
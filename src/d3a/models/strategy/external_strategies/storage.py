@@ -177,8 +177,7 @@ class StorageExternalMixin(ExternalMixin):
     def _list_bids_impl(self, arguments, response_channel):
         try:
             filtered_bids = [{"id": v.id, "price": v.price, "energy": v.energy}
-                             for _, v in self.market.get_bids().items()
-                             if v.buyer == self.device.name]
+                             for v in self.market.get_bids_of_buyer(self.device.name)]
             self.redis.publish_json(
                 response_channel,
                 {"command": "list_bids", "status": "ready", "bid_list": filtered_bids,
@@ -550,8 +549,7 @@ class StorageExternalMixin(ExternalMixin):
     def _list_bids_aggregator(self, arguments):
         try:
             filtered_bids = [{"id": v.id, "price": v.price, "energy": v.energy}
-                             for _, v in self.market.get_bids().items()
-                             if v.buyer == self.device.name]
+                             for v in self.market.get_bids_of_buyer(self.device.name)]
             return {
                 "command": "list_bids", "status": "ready", "bid_list": filtered_bids,
                 "area_uuid": self.device.uuid,
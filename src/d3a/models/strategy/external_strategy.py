@@ -223,8 +223,7 @@ class RedisExternalStrategyConnection(TwoSidedMarketRedisEventSubscriber):
     def _list_bids(self, payload):
         try:
             filtered_bids = [{"id": v.id, "price": v.price, "energy": v.energy}
-                             for _, v in self.market.get_bids().items()
-                             if v.buyer == self.area.name]
+                             for v in self.market.get_bids_of_buyer(self.area.name)]
             self.publish(self._list_bids_response_channel,
                          {"status": "ready", "bid_list": filtered_bids})
         except Exception as e:
@@ -245,6 +245,7 @@ class LoadHoursStrategy(BidEnabledStrategy):
         self.bid_update.update_posted_bids_over_ticks(market, self)
 
     def event_tick(self):
+        bid_update_markets = self.bid_update.markets_due_for_price_update(self)
         for market in self.active_markets:
             if market.time_slot not in self.energy_requirement_Wh:
                 continue
@@ -255,7 +256,8 @@ class LoadHoursStrategy(BidEnabledStrategy):
                 self._one_sided_market_event_tick(market)
             elif ConstSettings.IAASettings.MARKET_TYPE == 2 or \
                     ConstSettings.IAASettings.MARKET_TYPE == 3:
-                self._double_sided_market_event_tick(market)
+                if market in bid_update_markets:
+                    self._double_sided_market_event_tick(market)
 
         self.bid_update.increment_update_counter_all_markets(self)
 
@@ -20,11 +20,10 @@ from collections import namedtuple
 from enum import Enum
 from pendulum import duration
 
-from d3a import limit_float_precision
 from d3a.constants import FLOATING_POINT_TOLERANCE
 from d3a.d3a_core.exceptions import MarketException
 from d3a.d3a_core.util import area_name_from_area_or_iaa_name, generate_market_slot_list
-from d3a.models.state import StorageState, ESSEnergyOrigin, EnergyOrigin
+from d3a.models.state import StorageState, ESSEnergyOrigin
 from d3a.models.strategy import BidEnabledStrategy
 from d3a_interface.constants_limits import ConstSettings
 from d3a_interface.device_validator import validate_storage_device
@@ -283,20 +282,26 @@ class StorageStrategy(BidEnabledStrategy):
             raise ValueError("energy_rate_change_per_update should be a non-negative value.")
 
     def event_tick(self):
-        self.state.clamp_energy_to_buy_kWh([ma.time_slot for ma in self.area.all_markets])
+        buy_clamp = \
+            self.state.clamp_energy_to_buy_kWh([ma.time_slot for ma in self.area.all_markets])
+        bid_update_markets = self.bid_update.markets_due_for_price_update(self)
 
         for market in self.area.all_markets:
             if ConstSettings.IAASettings.MARKET_TYPE == 2 or \
                     ConstSettings.IAASettings.MARKET_TYPE == 3:
-                self.state.clamp_energy_to_buy_kWh([ma.time_slot for ma in self.area.all_markets])
                 if self.are_bids_posted(market.id):
-                    self.bid_update.update_posted_bids_over_ticks(market, self)
+                    if market in bid_update_markets:
+                        self.bid_update.update_posted_bids_over_ticks(market, self)
                 else:
-                    energy_kWh = self.state.energy_to_buy_dict[market.time_slot]
+                    # Bids posted to the previous markets and the storage losses change the
+                    # energy that can be bought. Bid trades only move energy from offered to
+                    # pledged, which leaves the sums of the clamp unchanged
+                    energy_kWh = self.state.update_energy_to_buy_kWh(market.time_slot, buy_clamp)
                     if energy_kWh > 0:
                         first_bid = self.post_first_bid(market, energy_kWh * 1000.0)
                         if first_bid is not None:
-                            self.state.offered_buy_kWh[market.time_slot] += first_bid.energy
+                            self.state.add_offered_buy_kWh(market.time_slot, first_bid.energy,
+                                                           buy_clamp)
 
             self.state.tick(self.area, market.time_slot)
         if self.cap_price_strategy is False:
@@ -328,17 +333,7 @@ class StorageStrategy(BidEnabledStrategy):
 
     # ESS Energy being utilized based on FIRST-IN FIRST-OUT mechanism
     def _track_energy_sell_type(self, trade):
-        energy = trade.offer.energy
-        while limit_float_precision(energy) > 0:
-            first_in_energy_with_origin = self.state.get_used_storage_share[0]
-            if energy >= first_in_energy_with_origin.value:
-                energy -= first_in_energy_with_origin.value
-                self.state.get_used_storage_share.pop(0)
-            elif energy < first_in_energy_with_origin.value:
-                residual = first_in_energy_with_origin.value - energy
-                self.state._used_storage_share[0] = \
-                    EnergyOrigin(first_in_energy_with_origin.origin, residual)
-                energy = 0
+        self.state.consume_used_storage_share(trade.offer.energy)
 
     def _track_energy_bought_type(self, trade):
         if area_name_from_area_or_iaa_name(trade.seller) == self.area.name:
@@ -360,8 +355,7 @@ class StorageStrategy(BidEnabledStrategy):
     def event_market_cycle(self):
         super().event_market_cycle()
         self.offer_update.update_market_cycle_offers(self)
-        for market in self.area.all_markets[:-1]:
-            self.bid_update.update_counter[market.time_slot] = 0
+        self.bid_update.reset_update_counters(self)
         current_market = self.area.next_market
         past_market = self.area.last_past_market
 
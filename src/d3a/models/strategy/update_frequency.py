@@ -15,7 +15,7 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
-
+from functools import lru_cache
 from pendulum import duration
 
 from d3a.d3a_core.exceptions import MarketException
@@ -24,6 +24,21 @@ from d3a.models.read_user_profile import read_arbitrary_profile, InputProfileTyp
 from d3a.d3a_core.util import generate_market_slot_list
 
 
+@lru_cache(maxsize=None)
+def _price_update_ticks(update_interval_s, tick_length_s, ticks_per_slot):
+    """
+    Tick numbers in the slot at which the n-th price update of a market becomes due, i.e. the
+    first ticks at which n * update_interval has elapsed. Updates that would only become due
+    after the last tick of the slot are left out. None if update_interval_s is 0, the price
+    update is due on every tick then.
+    """
+    if update_interval_s == 0:
+        return None
+    last_tick_s = (ticks_per_slot - 1) * tick_length_s
+    return tuple(-(-update_number * update_interval_s // tick_length_s)
+                 for update_number in range(last_tick_s // update_interval_s + 1))
+
+
 class UpdateFrequencyMixin:
     def __init__(self, initial_rate, final_rate, fit_to_limit=True,
                  energy_rate_change_per_update=None, update_interval=duration(
@@ -42,6 +57,9 @@ class UpdateFrequencyMixin:
             self.energy_rate_change_per_update = None
         self.update_interval = update_interval
         self.update_counter = read_arbitrary_profile(InputProfileTypes.IDENTITY, 0)
+        # (slot number, first tick in the slot at which a price update of any market is due),
+        # None if it has to be calculated again
+        self._next_price_update = None
         self.number_of_available_updates = 0
         self.rate_limit_object = rate_limit_object
 
@@ -91,6 +109,7 @@ class UpdateFrequencyMixin:
         self.number_of_available_updates = \
             self._calculate_number_of_available_updates_per_slot
         self._set_or_update_energy_rate_change_per_update()
+        self._next_price_update = None
 
     def get_updated_rate(self, time_slot):
         calculated_rate = \
@@ -104,58 +123,111 @@ class UpdateFrequencyMixin:
         current_tick_number = strategy.area.current_tick % strategy.area.config.ticks_per_slot
         return current_tick_number * strategy.area.config.tick_length.seconds
 
+    @staticmethod
+    def _tick_in_slot(strategy):
+        return strategy.area.current_tick % strategy.area.config.ticks_per_slot
+
+    def _price_update_ticks(self, strategy):
+        return _price_update_ticks(self.update_interval.seconds,
+                                   strategy.area.config.tick_length.seconds,
+                                   strategy.area.config.ticks_per_slot)
+
+    def _is_price_update_due(self, price_update_ticks, tick_in_slot, time_slot):
+        if price_update_ticks is None:
+            return True
+        update_counter = self.update_counter[time_slot]
+        return update_counter < len(price_update_ticks) and \
+            tick_in_slot >= price_update_ticks[update_counter]
+
+    def _next_price_update_tick(self, strategy, price_update_ticks):
+        if price_update_ticks is None:
+            return 0
+        next_update_ticks = [price_update_ticks[self.update_counter[market.time_slot]]
+                             for market in strategy.area.all_markets
+                             if self.update_counter[market.time_slot] < len(price_update_ticks)]
+        return min(next_update_ticks, default=float("inf"))
+
+    def _is_before_next_price_update(self, strategy):
+        """
+        True if no price update of the markets of the strategy's area is due on the current tick.
+        The first tick at which an update is due is calculated again in a new slot or after an
+        update counter changed.
+        """
+        slot_number, tick_in_slot = divmod(strategy.area.current_tick,
+                                           strategy.area.config.ticks_per_slot)
+        if self._next_price_update is None or self._next_price_update[0] != slot_number:
+            self._next_price_update = (slot_number, self._next_price_update_tick(
+                strategy, self._price_update_ticks(strategy)))
+        return tick_in_slot < self._next_price_update[1]
+
+    def markets_due_for_price_update(self, strategy):
+        """
+        Markets of the strategy's area whose price update is due on the current tick. The markets
+        are only checked on ticks at which the update of at least one market is due.
+        """
+        if self._is_before_next_price_update(strategy):
+            return []
+        price_update_ticks = self._price_update_ticks(strategy)
+        tick_in_slot = self._tick_in_slot(strategy)
+        return [market for market in strategy.area.all_markets
+                if self._is_price_update_due(price_update_ticks, tick_in_slot,
+                                             market.time_slot)]
+
     def increment_update_counter_all_markets(self, strategy):
-        should_update = [
-            self.increment_update_counter(strategy, market.time_slot)
-            for market in strategy.area.all_markets]
-        return any(should_update)
+        due_markets = self.markets_due_for_price_update(strategy)
+        for market in due_markets:
+            self.update_counter[market.time_slot] += 1
+        if due_markets:
+            self._next_price_update = None
+        return len(due_markets) > 0
 
     def increment_update_counter(self, strategy, time_slot):
         if self.time_for_price_update(strategy, time_slot):
             self.update_counter[time_slot] += 1
+            self._next_price_update = None
             return True
         return False
 
+    def reset_update_counters(self, strategy):
+        """Resets the update counters of the markets, except for the newly created one"""
+        for market in strategy.area.all_markets[:-1]:
+            self.update_counter[market.time_slot] = 0
+        self._next_price_update = None
+
     def time_for_price_update(self, strategy, time_slot):
-        return self.elapsed_seconds(strategy) >= \
-               self.update_interval.seconds * (self.update_counter[time_slot])
+        return self._is_price_update_due(self._price_update_ticks(strategy),
+                                         self._tick_in_slot(strategy), time_slot)
 
     def update_energy_price(self, market, strategy):
-        if market.id not in strategy.offers.open.values():
+        open_offers = strategy.offers.open_in_market(market.id)
+        if not open_offers:
+            return
+        iterated_market = strategy.area.get_future_market_from_id(market.id)
+        if iterated_market is None:
             return
 
-        for offer, iterated_market_id in strategy.offers.open.items():
-            iterated_market = strategy.area.get_future_market_from_id(iterated_market_id)
-            if market is None or iterated_market is None or iterated_market.id != market.id:
-                continue
+        for offer in open_offers:
+            updated_price = round(offer.energy * self.get_updated_rate(market.time_slot), 10)
             try:
-                iterated_market.delete_offer(offer.id)
-                updated_price = round(offer.energy * self.get_updated_rate(market.time_slot), 10)
-                new_offer = iterated_market.offer(
-                    updated_price,
-                    offer.energy,
-                    strategy.owner.name,
-                    original_offer_price=updated_price,
-                    seller_origin=offer.seller_origin
-                )
-                strategy.offers.replace(offer, new_offer, iterated_market.id)
+                repriced_offer = iterated_market.update_offer_price(
+                    offer, updated_price, original_offer_price=updated_price)
             except MarketException:
                 continue
+            strategy.offers.replace(offer, repriced_offer, iterated_market.id)
 
     def update_market_cycle_offers(self, strategy):
+        self.reset_update_counters(strategy)
         for market in strategy.area.all_markets[:-1]:
-            self.update_counter[market.time_slot] = 0
             self.update_energy_price(market, strategy)
 
     def update_offer(self, strategy):
-        for market in strategy.area.all_markets:
-            if self.time_for_price_update(strategy, market.time_slot):
-                self.update_energy_price(market, strategy)
+        for market in self.markets_due_for_price_update(strategy):
+            self.update_energy_price(market, strategy)
 
     def update_market_cycle_bids(self, strategy):
+        self.reset_update_counters(strategy)
         # decrease energy rate for each market again, except for the newly created one
         for market in strategy.area.all_markets[:-1]:
-            self.update_counter[market.time_slot] = 0
             self._post_bids(market, strategy)
 
     def _post_bids(self, market, strategy):
@@ -164,13 +236,13 @@ class UpdateFrequencyMixin:
             assert bid.buyer == strategy.owner.name
             if bid.id in market.bids.keys():
                 bid = market.bids[bid.id]
-            market.delete_bid(bid.id)
-
-            strategy.remove_bid_from_pending(market.id, bid.id)
-            strategy.post_bid(market, bid.energy * self.get_updated_rate(market.time_slot),
-                              bid.energy, buyer_origin=bid.buyer_origin)
+            strategy.update_bid_price(market, bid,
+                                      bid.energy * self.get_updated_rate(market.time_slot))
 
     def update_posted_bids_over_ticks(self, market, strategy):
-        if self.time_for_price_update(strategy, market.time_slot):
-            if strategy.are_bids_posted(market.id):
-                self._post_bids(market, strategy)
+        """
+        Updates the price of the posted bids in market. Is called for the markets returned by
+        markets_due_for_price_update.
+        """
+        if strategy.are_bids_posted(market.id):
+            self._post_bids(market, strategy)
@@ -17,18 +17,20 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 from pendulum import duration, today
 from collections import OrderedDict
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, call, patch
 import unittest
 from parameterized import parameterized
+import d3a.constants
 from d3a.events.event_structures import AreaEvent, MarketEvent
 from d3a.models.area import Area
 from d3a.models.area.events import Events
 from d3a.models.area.markets import AreaMarkets
 from d3a.models.appliance.simple import SimpleAppliance
+from d3a.models.strategy import BaseStrategy
 from d3a.models.strategy.storage import StorageStrategy
 from d3a.models.config import SimulationConfig
 from d3a.models.market import Market
-from d3a.models.market.market_structures import Offer
+from d3a.models.market.market_structures import Offer, Trade
 from d3a_interface.constants_limits import ConstSettings, GlobalConfig
 from d3a.constants import TIME_ZONE
 from d3a.d3a_core.device_registry import DeviceRegistry
@@ -295,6 +297,20 @@ class TestEventDispatcher(unittest.TestCase):
         assert area.strategy.event_listener.call_count == 0
         assert area.appliance.event_listener.call_count == 0
 
+    @parameterized.expand([(True, True, 1), (False, True, 0), (True, False, 0)])
+    def test_event_listener_batch_dispatches_to_strategy_appliance_if_enabled_connected(
+            self, is_enabled, is_connected, expected_call_count):
+        area = self.strategy_appliance_mock()
+        area.events.is_enabled = is_enabled
+        area.events.is_connected = is_connected
+        events = [{"offer": MagicMock()}, {"offer": MagicMock()}]
+        area.dispatcher.event_listener_batch(MarketEvent.OFFER, "market_id", events)
+        assert area.strategy.event_listener_batch.call_count == expected_call_count
+        assert area.appliance.event_listener_batch.call_count == expected_call_count
+        if expected_call_count:
+            area.strategy.event_listener_batch.assert_called_with(
+                MarketEvent.OFFER, "market_id", events)
+
     def test_event_on_disabled_area_triggered_for_market_cycle_on_disabled_area(self):
         area = self.strategy_appliance_mock()
         area.strategy.event_on_disabled_area = MagicMock()
@@ -302,3 +318,108 @@ class TestEventDispatcher(unittest.TestCase):
         area.events.is_connected = True
         area.dispatcher.event_listener(AreaEvent.MARKET_CYCLE)
         assert area.strategy.event_on_disabled_area.call_count == 1
+
+    def test_broadcast_tick_dispatches_to_agents_of_current_markets(self):
+        area = Area(name="test_area")
+        area.events = MagicMock(spec=Events)
+        area.events.is_enabled = True
+        area.events.is_connected = True
+        past_agent, current_agent = MagicMock(), MagicMock()
+        area._markets.markets = {0: MagicMock(), 1: MagicMock()}
+        area.dispatcher._add_agent("past", past_agent, 0, is_spot_market=True)
+        area.dispatcher._add_agent("current", current_agent, 1, is_spot_market=True)
+        area.dispatcher.broadcast_tick()
+        past_agent.event_listener.assert_called_once_with(AreaEvent.TICK)
+
+        area._markets.markets.pop(0)
+        area.dispatcher._delete_past_agents(area.dispatcher.interarea_agents)
+        assert area.dispatcher.active_interarea_agents == {1: {"current": current_agent}}
+        area.dispatcher.broadcast_tick()
+        assert past_agent.event_listener.call_count == 1
+        assert current_agent.event_listener.call_count == 2
+
+    def test_broadcast_tick_ticks_child_areas_before_their_strategies(self):
+        child = self.strategy_appliance_mock()
+        child.events.is_enabled = True
+        child.events.is_connected = True
+        area = Area(name="parent", children=[child])
+        calls = MagicMock()
+        child.tick = calls.tick
+        child.strategy = calls.strategy
+        child.appliance = None
+        area.dispatcher.broadcast_tick()
+        assert calls.method_calls == [call.tick(), call.strategy.event_listener(AreaEvent.TICK)]
+
+    @patch("d3a.constants.DISPATCH_EVENTS_BOTTOM_TO_TOP", False)
+    def test_broadcast_tick_skips_subtree_of_child_disabled_by_its_tick(self):
+        grandchild = self.strategy_appliance_mock()
+        grandchild.events.is_enabled = True
+        grandchild.events.is_connected = True
+        grandchild.tick = MagicMock()
+        child = Area(name="child", children=[grandchild])
+        child.events = MagicMock(spec=Events)
+        child.events.is_enabled = True
+        child.events.is_connected = True
+        child.strategy = MagicMock()
+
+        def disable_child():
+            child.events.is_enabled = False
+        child.tick = MagicMock(side_effect=disable_child)
+        area = Area(name="parent", children=[child])
+        area.dispatcher.broadcast_tick()
+        child.tick.assert_called_once_with()
+        assert grandchild.tick.call_count == 0
+        assert child.strategy.event_listener.call_count == 0
+
+
+class EventRecordingStrategy(BaseStrategy):
+    def __init__(self):
+        super().__init__()
+        self.received_events = []
+
+    @staticmethod
+    def _describe(event_type, kwargs):
+        offers = [value.offer if isinstance(value, Trade) else value
+                  for value in kwargs.values() if isinstance(value, (Offer, Trade))]
+        return event_type, [(offer.seller, offer.price, offer.energy) for offer in offers]
+
+    def event_listener(self, event_type, **kwargs):
+        self.received_events.append(self._describe(event_type, kwargs))
+        super().event_listener(event_type, **kwargs)
+
+    def event_listener_batch(self, event_type, market_id, events):
+        self.received_events.extend(self._describe(event_type, kwargs) for kwargs in events)
+        super().event_listener_batch(event_type, market_id, events)
+
+
+class TestMarketEventDelivery(unittest.TestCase):
+
+    def _run_market_cycle(self, delivery_mode):
+        config = SimulationConfig(
+            sim_duration=duration(hours=1), slot_length=duration(minutes=15),
+            tick_length=duration(seconds=15), market_count=2, cloud_coverage=0,
+            external_connection_enabled=False)
+        strategies = [EventRecordingStrategy(), EventRecordingStrategy()]
+        with patch("d3a.constants.MARKET_EVENT_DELIVERY_MODE", delivery_mode):
+            grid = Area("Grid", children=[Area("H1", strategy=strategies[0]),
+                                          Area("H2", strategy=strategies[1])], config=config)
+            grid.activate()
+            for market in grid.all_markets:
+                offer = market.offer(10, 2, "H1", "H1")
+                market.offer(20, 1, "H2", "H2")
+                market.accept_offer(offer, "H2", energy=1)
+            grid.current_tick += config.ticks_per_slot
+            grid._cycle_markets()
+        return [strategy.received_events for strategy in strategies]
+
+    def test_batched_delivery_delivers_events_of_markets_that_move_to_past(self):
+        immediate_events = self._run_market_cycle(d3a.constants.MARKET_EVENT_DELIVERY_IMMEDIATE)
+        batched_events = self._run_market_cycle(d3a.constants.MARKET_EVENT_DELIVERY_BATCHED)
+        for immediate, batched in zip(immediate_events, batched_events):
+            # Batched events are delivered at the end of the step, after the area events
+            assert [event for event in batched if isinstance(event[0], MarketEvent)] == \
+                [event for event in immediate if isinstance(event[0], MarketEvent)]
+            event_types = [event_type for event_type, _ in batched]
+            assert event_types.count(MarketEvent.TRADE) == 2
+            assert event_types.index(MarketEvent.TRADE) < \
+                event_types.index(AreaEvent.MARKET_CYCLE)
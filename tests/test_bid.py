@@ -15,7 +15,7 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
-from d3a.models.market.market_structures import Bid
+from d3a.models.market.market_structures import Bid, Trade
 import pendulum
 
 
@@ -24,3 +24,10 @@ def test_offer_id_stringified():
 
     assert isinstance(bid.id, str)
     assert "<object object at" in bid.id
+
+
+def test_bid_and_trade_do_not_allocate_instance_dict():
+    bid = Bid('id', pendulum.now(), 10, 20, 'A', 'B')
+    trade = Trade('trade_id', pendulum.now(), bid, 'B', 'A')
+    assert not hasattr(bid, '__dict__')
+    assert not hasattr(trade, '__dict__')
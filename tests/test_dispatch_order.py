@@ -0,0 +1,54 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from collections import Counter
+
+import pytest
+from numpy import random
+
+from d3a.d3a_core.dispatch_order import DispatchOrder
+
+
+@pytest.mark.parametrize("length", [0, 1, 2, 4, 5, 6, 12])
+def test_dispatch_order_keeps_all_items(length):
+    items = list(range(length))
+    shuffled = DispatchOrder(seed=1).shuffled(items)
+    assert sorted(shuffled) == items
+    assert shuffled is not items
+    assert items == list(range(length))
+
+
+def test_dispatch_order_shuffles_dict_keys():
+    agents = {"IAA 1": 1, "IAA 2": 2, "IAA 3": 3}
+    assert sorted(DispatchOrder(seed=1).shuffled(agents)) == ["IAA 1", "IAA 2", "IAA 3"]
+
+
+def test_dispatch_order_is_reproducible_with_the_simulation_seed():
+    random.seed(42)
+    first = [DispatchOrder().shuffled(range(8)) for _ in range(5)]
+    random.seed(42)
+    assert first == [DispatchOrder().shuffled(range(8)) for _ in range(5)]
+
+
+@pytest.mark.parametrize("length", [3, 7])
+def test_dispatch_order_is_fair(length):
+    dispatch_order = DispatchOrder(seed=3)
+    draws = 7000
+    first_listeners = Counter(dispatch_order.shuffled(range(length))[0] for _ in range(draws))
+    assert set(first_listeners.keys()) == set(range(length))
+    for count in first_listeners.values():
+        assert abs(count - draws / length) < 0.15 * draws / length
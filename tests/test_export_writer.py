@@ -0,0 +1,163 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import csv
+import gzip
+import os
+import pytest
+
+from d3a.d3a_core.export_writer import StreamingExportWriter
+
+LABELS = ("slot", "energy")
+
+
+def _read_csv(path, opener=open):
+    with opener(path, 'rt') as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_export_writer_writes_rows_of_slot_in_one_batch(tmpdir):
+    path = os.path.join(str(tmpdir), "house-trades.csv")
+    writer = StreamingExportWriter(file_format="csv", flush_slot_count=1)
+    writer.write_rows(path, LABELS, [(0, 1.5)], write_labels=True)
+    writer.write_rows(path, LABELS, [(0, 2)])
+    assert not os.path.exists(path)
+    writer.end_slot()
+    assert _read_csv(path) == [["slot", "energy"], ["0", "1.5"], ["0", "2"]]
+    writer.write_rows(path, LABELS, [(1, 3)])
+    writer.end_slot()
+    writer.close()
+    assert _read_csv(path) == [["slot", "energy"], ["0", "1.5"], ["0", "2"], ["1", "3"]]
+
+
+def test_export_writer_creates_files_without_rows(tmpdir):
+    path = os.path.join(str(tmpdir), "house-bids.csv")
+    writer = StreamingExportWriter(file_format="csv")
+    writer.write_rows(path, LABELS, [])
+    writer.close()
+    assert os.path.getsize(path) == 0
+
+
+def test_export_writer_flushes_files_as_configured(tmpdir):
+    path = os.path.join(str(tmpdir), "house.csv")
+    writer = StreamingExportWriter(file_format="csv", flush_slot_count=2)
+    for slot in range(2):
+        writer.write_rows(path, LABELS, [(slot, 1)], write_labels=slot == 0)
+        writer.end_slot()
+        assert len(_read_csv(path)) == (0 if slot == 0 else 3)
+    writer.close()
+
+
+def test_export_writer_keeps_first_files_open_and_appends_to_the_others(tmpdir):
+    paths = [os.path.join(str(tmpdir), f"house-{i}.csv") for i in range(5)]
+    writer = StreamingExportWriter(file_format="csv", max_open_files=2)
+    for slot in range(4):
+        for path in paths:
+            writer.write_rows(path, LABELS, [(slot, 1)], write_labels=slot == 0)
+        writer.end_slot()
+        assert writer.open_file_count == 2
+        assert [export_file.keeps_file_open for export_file in writer._files.values()] == \
+            [True, True, False, False, False]
+    writer.close()
+    assert writer.open_file_count == 0
+    for path in paths:
+        assert _read_csv(path) == [["slot", "energy"]] + [[str(slot), "1"] for slot in range(4)]
+
+
+def test_export_writer_writes_gzip_compressed_csv_files(tmpdir):
+    path = os.path.join(str(tmpdir), "house.csv")
+    writer = StreamingExportWriter(file_format="csv.gz")
+    for slot in range(2):
+        writer.write_rows(path, LABELS, [(slot, 1)], write_labels=slot == 0)
+        writer.end_slot()
+    writer.close()
+    assert not os.path.exists(path)
+    assert _read_csv(path + ".gz", gzip.open) == [["slot", "energy"], ["0", "1"], ["1", "1"]]
+
+
+def test_export_writer_writes_parquet_files(tmpdir):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    path = os.path.join(str(tmpdir), "house.csv")
+    writer = StreamingExportWriter(file_format="parquet")
+    for slot in range(2):
+        writer.write_rows(path, LABELS, [(slot, 1.5), (slot, None)], write_labels=slot == 0)
+        writer.end_slot()
+    writer.close()
+    table = pyarrow_parquet.read_table(os.path.join(str(tmpdir), "house.parquet"))
+    assert table.to_pydict() == {"slot": ["0", "0", "1", "1"],
+                                 "energy": ["1.5", None, "1.5", None]}
+
+
+def test_export_writer_writes_parquet_row_group_per_flush(tmpdir):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    path = os.path.join(str(tmpdir), "house.csv")
+    writer = StreamingExportWriter(file_format="parquet", flush_slot_count=2)
+    for slot in range(5):
+        writer.write_rows(path, LABELS, [(slot, 1), (slot, 2)], write_labels=slot == 0)
+        writer.end_slot()
+    writer.close()
+    parquet_file = pyarrow_parquet.ParquetFile(os.path.join(str(tmpdir), "house.parquet"))
+    assert parquet_file.metadata.num_row_groups == 3
+    assert [parquet_file.metadata.row_group(i).num_rows for i in range(3)] == [4, 4, 2]
+
+
+def test_export_writer_writes_parquet_files_beyond_open_file_limit_on_close(tmpdir):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    paths = [os.path.join(str(tmpdir), f"house-{i}.csv") for i in range(5)]
+    writer = StreamingExportWriter(file_format="parquet", flush_slot_count=2,
+                                   max_open_files=2)
+    for slot in range(4):
+        for path in paths:
+            writer.write_rows(path, LABELS, [(slot, 1)], write_labels=slot == 0)
+        writer.end_slot()
+        assert writer.open_file_count == 2
+    assert sorted(os.listdir(str(tmpdir))) == ["house-0.parquet", "house-1.parquet"]
+    writer.close()
+    assert sorted(os.listdir(str(tmpdir))) == [f"house-{i}.parquet" for i in range(5)]
+    for i in range(5):
+        parquet_file = pyarrow_parquet.ParquetFile(os.path.join(str(tmpdir), f"house-{i}.parquet"))
+        assert parquet_file.metadata.num_row_groups == 2
+        assert parquet_file.read().to_pydict() == \
+            {"slot": ["0", "1", "2", "3"], "energy": ["1", "1", "1", "1"]}
+
+
+def test_export_writer_writes_rows_of_closed_parquet_files_to_part_files(tmpdir):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    path = os.path.join(str(tmpdir), "house.csv")
+    writer = StreamingExportWriter(file_format="parquet")
+    writer.write_rows(path, LABELS, [(0, 1)], write_labels=True)
+    writer.end_slot()
+    writer.close()
+    writer.write_rows(path, LABELS, [(1, 1)])
+    writer.end_slot()
+    writer.close()
+    assert pyarrow_parquet.read_table(os.path.join(str(tmpdir), "house.parquet")).to_pydict() == \
+        {"slot": ["0"], "energy": ["1"]}
+    assert pyarrow_parquet.read_table(
+        os.path.join(str(tmpdir), "house.1.parquet")).to_pydict() == \
+        {"slot": ["1"], "energy": ["1"]}
+
+
+def test_export_writer_logs_export_errors_and_writes_other_files(tmpdir, caplog):
+    paths = [os.path.join(str(tmpdir), f"house-{i}.csv") for i in range(2)]
+    writer = StreamingExportWriter(file_format="csv")
+    writer.write_rows(paths[0], LABELS, [1])
+    writer.write_rows(paths[1], LABELS, [(0, 1)])
+    writer.end_slot()
+    writer.close()
+    assert f"Could not export {paths[0]}" in caplog.text
+    assert _read_csv(paths[1]) == [["0", "1"]]
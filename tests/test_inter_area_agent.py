@@ -19,11 +19,14 @@ import pytest
 from copy import deepcopy
 import pendulum
 from math import isclose
+from unittest.mock import MagicMock
 
 from d3a.constants import TIME_FORMAT
 from d3a.constants import TIME_ZONE
 from d3a.models.area import DEFAULT_CONFIG
 from d3a.models.market.market_structures import Offer, Trade, Bid
+from d3a.models.market.order_book import OrderBook
+from d3a.models.strategy.area_agents.forwarding_policy import PriceBandForwardingPolicy
 from d3a.models.strategy.area_agents.one_sided_agent import OneSidedAgent
 from d3a.models.strategy.area_agents.two_sided_pay_as_bid_agent import TwoSidedPayAsBidAgent
 from d3a.models.strategy.area_agents.two_sided_pay_as_bid_engine import BidInfo
@@ -35,6 +38,7 @@ from d3a.models.market.grid_fees.base_model import GridFees
 
 def teardown_function():
     ConstSettings.IAASettings.MARKET_TYPE = 1
+    ConstSettings.GeneralSettings.EVENT_DISPATCHING_VIA_REDIS = False
     ConstSettings.IAASettings.PAY_AS_CLEAR_AGGREGATION_ALGORITHM = 1
 
 
@@ -165,6 +169,32 @@ class FakeMarket:
     def dispatch_market_offer_event(self, offer):
         pass
 
+    def update_offer_price(self, offer_or_id, price, original_offer_price=None,
+                           adapt_price_with_fees=True):
+        offer = self.offers[offer_or_id.id]
+        if original_offer_price is None:
+            original_offer_price = price
+        if adapt_price_with_fees:
+            price = self._update_new_offer_price_with_fee(price, original_offer_price,
+                                                          offer.energy)
+        repriced_offer = Offer(offer.id, pendulum.now(), price, offer.energy, offer.seller,
+                               original_offer_price, seller_origin=offer.seller_origin)
+        self.offers[offer.id] = repriced_offer
+        return repriced_offer
+
+    def update_bid_price(self, bid_or_id, price, original_bid_price=None,
+                         adapt_price_with_fees=True):
+        bid_index = [b.id for b in self._bids].index(bid_or_id.id)
+        bid = self._bids[bid_index]
+        if original_bid_price is None:
+            original_bid_price = price
+        if adapt_price_with_fees:
+            price = self._update_new_bid_price_with_fee(price, original_bid_price)
+        repriced_bid = Bid(bid.id, pendulum.now(), price, bid.energy, bid.buyer, bid.seller,
+                           original_bid_price=original_bid_price, buyer_origin=bid.buyer_origin)
+        self._bids[bid_index] = repriced_bid
+        return repriced_bid
+
     def bid(self, price: float, energy: float, buyer: str, seller: str,
             bid_id: str = None, original_bid_price=None, buyer_origin=None,
             adapt_price_with_fees=True):
@@ -294,6 +324,105 @@ def test_iaa_event_trade_deletes_forwarded_offer_when_sold(iaa, called):
     assert len(iaa.lower_market.delete_offer.calls) == 1
 
 
+def test_iaa_reprices_forwarded_offer_in_place(iaa):
+    engine = iaa.engines[1]
+    forwarded_offer = engine.forwarded_offers['id'].target_offer
+    repriced_offer = Offer('id', pendulum.now(), 0.5, 1, 'other', 0.5)
+    iaa.event_offer_repriced(market_id=iaa.lower_market.id, offer=repriced_offer)
+    assert iaa.higher_market.offer_call_count == 1
+    offer_info = engine.forwarded_offers['id']
+    assert offer_info.source_offer.price == 0.5
+    assert offer_info.target_offer.id == forwarded_offer.id
+    assert offer_info.target_offer.price == 0.5
+    assert iaa.higher_market.offers[forwarded_offer.id].price == 0.5
+    assert engine.forwarded_offers[forwarded_offer.id] == offer_info
+
+
+def test_iaa_reprices_forwarded_offer_via_redis(iaa):
+    ConstSettings.GeneralSettings.EVENT_DISPATCHING_VIA_REDIS = True
+    engine = iaa.engines[1]
+    forwarded_offer = engine.forwarded_offers['id'].target_offer
+    repriced_forwarded_offer = Offer(forwarded_offer.id, pendulum.now(), 0.5, 1, 'owner', 0.5)
+    iaa.update_offer_price = MagicMock(return_value=repriced_forwarded_offer)
+    repriced_offer = Offer('id', pendulum.now(), 0.5, 1, 'other', 0.5)
+    iaa.event_offer_repriced(market_id=iaa.lower_market.id, offer=repriced_offer)
+    iaa.update_offer_price.assert_called_once_with(
+        market_id=iaa.higher_market,
+        offer_args={"price": 0.5, "original_offer_price": 0.5,
+                    "offer_or_id": forwarded_offer.to_JSON_string()})
+    assert engine.forwarded_offers['id'].target_offer == repriced_forwarded_offer
+
+
+def test_iaa_ignores_repriced_offers_it_did_not_forward(iaa):
+    forwarded_offers = [dict(engine.forwarded_offers) for engine in iaa.engines]
+    iaa.event_offer_repriced(market_id=iaa.lower_market.id,
+                             offer=Offer('other_id', pendulum.now(), 0.5, 1, 'other', 0.5))
+    assert [engine.forwarded_offers for engine in iaa.engines] == forwarded_offers
+
+
+def test_iaa_forwards_new_offers_of_order_book_once_they_reach_min_offer_age():
+    lower_market = FakeMarket([])
+    lower_market.offers = OrderBook()
+    higher_market = FakeMarket([])
+    owner = FakeArea('owner')
+    iaa = OneSidedAgent(owner=owner, higher_market=higher_market, lower_market=lower_market,
+                        min_offer_age=2)
+    iaa.event_tick()
+    lower_market.offers['id'] = Offer('id', pendulum.now(), 1, 1, 'other', 1)
+    for current_tick, expected_offer_call_count in [(10, 0), (11, 0), (12, 1), (13, 1)]:
+        owner.current_tick = current_tick
+        iaa.event_tick()
+        assert higher_market.offer_call_count == expected_offer_call_count
+    engine = iaa.engines[1]
+    assert engine.offer_age == {'id': 10}
+    assert engine.forwarded_offers['id'].target_offer.id == 'uuid'
+
+
+def test_iaa_forwards_offer_again_after_its_forwarded_offer_was_deleted():
+    lower_market = FakeMarket([])
+    lower_market.offers = OrderBook({'id': Offer('id', pendulum.now(), 1, 1, 'other', 1)})
+    higher_market = FakeMarket([])
+    owner = FakeArea('owner')
+    iaa = OneSidedAgent(owner=owner, higher_market=higher_market, lower_market=lower_market,
+                        min_offer_age=0)
+    iaa.event_tick()
+    assert higher_market.offer_call_count == 1
+    engine = iaa.engines[1]
+    engine._delete_forwarded_offer_entries(engine.forwarded_offers['id'].source_offer)
+    owner.current_tick = 11
+    iaa.event_tick()
+    assert higher_market.offer_call_count == 2
+
+
+def test_iaa_prunes_offers_above_the_price_band_of_the_target_market():
+    lower_market = FakeMarket([Offer('cheap', pendulum.now(), 1, 1, 'other', 1),
+                               Offer('expensive', pendulum.now(), 30, 1, 'other', 30)])
+    higher_market = FakeMarket([], [Bid('bid', pendulum.now(), 10, 1, 'buyer', 'owner', 10)])
+    owner = FakeArea('owner')
+    iaa = OneSidedAgent(owner=owner, higher_market=higher_market, lower_market=lower_market,
+                        min_offer_age=2)
+    for engine in iaa.engines:
+        engine.forwarding_policy = PriceBandForwardingPolicy(5)
+    iaa.event_tick()
+    owner.current_tick = 12
+    iaa.event_tick()
+    assert higher_market.offer_call_count == 1
+    assert 'cheap' in iaa.engines[1].forwarded_offers
+    assert iaa.engines[1].pruned_forward_count == 1
+    assert iaa.pruned_forward_count == 1
+
+    # The pruned offer is considered again once the minimum offer age has passed
+    higher_market.bids['bid'] = Bid('bid', pendulum.now(), 25, 1, 'buyer', 'owner', 25)
+    owner.current_tick = 13
+    iaa.event_tick()
+    assert higher_market.offer_call_count == 1
+    owner.current_tick = 14
+    iaa.event_tick()
+    assert higher_market.offer_call_count == 2
+    assert 'expensive' in iaa.engines[1].forwarded_offers
+    assert iaa.pruned_forward_count == 1
+
+
 @pytest.fixture
 def iaa_bid():
     ConstSettings.IAASettings.MARKET_TYPE = 2
@@ -319,6 +448,36 @@ def test_iaa_forwards_bids(iaa_bid):
     assert iaa_bid.higher_market.bid_call_count == 1
 
 
+def test_iaa_prunes_bids_below_the_price_band_of_the_target_market():
+    ConstSettings.IAASettings.MARKET_TYPE = 2
+    lower_market = FakeMarket([], [Bid('low', pendulum.now(), 1, 1, 'this', 'other', 1),
+                                   Bid('high', pendulum.now(), 20, 1, 'this', 'other', 20)])
+    lower_market.bids = OrderBook(lower_market.bids)
+    higher_market = FakeMarket([Offer('offer', pendulum.now(), 24, 1, 'seller', 24)])
+    owner = FakeArea('owner')
+    iaa = TwoSidedPayAsBidAgent(owner=owner, higher_market=higher_market,
+                                lower_market=lower_market, min_offer_age=0, min_bid_age=2)
+    for engine in iaa.engines:
+        engine.forwarding_policy = PriceBandForwardingPolicy(5)
+    iaa.event_tick()
+    owner.current_tick = 12
+    iaa.event_tick()
+    assert higher_market.bid_call_count == 1
+    assert iaa.engines[1].forwarded_bids['high'].source_bid.id == 'high'
+    assert iaa.pruned_forward_count == 1
+
+    # The pruned bid is considered again once the minimum bid age has passed
+    higher_market.offers['offer'] = Offer('offer', pendulum.now(), 5, 1, 'seller', 5)
+    owner.current_tick = 13
+    iaa.event_tick()
+    assert higher_market.bid_call_count == 1
+    owner.current_tick = 14
+    iaa.event_tick()
+    assert higher_market.bid_call_count == 2
+    assert iaa.engines[1].forwarded_bids['low'].source_bid.id == 'low'
+    assert iaa.pruned_forward_count == 1
+
+
 def test_iaa_does_not_forward_bids_if_the_IAA_name_is_the_same_as_the_target_market(iaa_bid):
     assert iaa_bid.lower_market.bid_call_count == 2
     assert iaa_bid.higher_market.bid_call_count == 1
@@ -331,6 +490,30 @@ def test_iaa_does_not_forward_bids_if_the_IAA_name_is_the_same_as_the_target_mar
     assert iaa_bid.higher_market.bid_call_count == 1
 
 
+def test_iaa_does_not_keep_own_and_counterpart_bids_due(iaa_bid):
+    engine = next(filter(lambda e: e.name == 'Low -> High', iaa_bid.engines))
+    iaa_bid.lower_market.bids['own'] = Bid('own', pendulum.now(), 1, 1, iaa_bid.name, 'other')
+    for current_tick in range(15, 40):
+        iaa_bid.owner.current_tick = current_tick
+        iaa_bid.event_tick()
+        assert all(not engine._bid_schedule._due for engine in iaa_bid.engines)
+    assert 'own' not in engine.forwarded_bids
+    assert iaa_bid.higher_market.bid_call_count == 1
+
+
+def test_iaa_reprices_forwarded_bid_in_place(iaa_bid):
+    engine = iaa_bid.engines[1]
+    forwarded_bid = engine.forwarded_bids['id'].target_bid
+    repriced_bid = Bid('id', pendulum.now(), 2, 1, 'this', 'other', 2, buyer_origin='id')
+    iaa_bid.event_bid_repriced(market_id=iaa_bid.lower_market.id, bid=repriced_bid)
+    assert iaa_bid.higher_market.bid_call_count == 1
+    bid_info = engine.forwarded_bids['id']
+    assert bid_info.source_bid == repriced_bid
+    assert bid_info.target_bid.id == forwarded_bid.id
+    assert bid_info.target_bid.price == 2
+    assert engine.forwarded_bids[forwarded_bid.id] == bid_info
+
+
 def test_iaa_forwarded_bids_adhere_to_iaa_overhead(iaa_bid):
     assert iaa_bid.higher_market.bid_call_count == 1
     expected_price = \
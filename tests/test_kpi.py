@@ -0,0 +1,173 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from unittest.mock import MagicMock
+from uuid import uuid4
+import pytest
+from pendulum import today
+
+from d3a.models.market.market_structures import Trade
+from d3a.models.state import LoadState
+from d3a.models.strategy.load_hours import LoadHoursStrategy
+from d3a.models.strategy.pv import PVStrategy
+from d3a.d3a_core.sim_results.kpi import KPI
+from d3a_interface.constants_limits import ConstSettings
+
+
+class FakeArea:
+    def __init__(self, name, children=(), strategy=None):
+        self.name = name
+        self.uuid = str(uuid4())
+        self.strategy = strategy
+        self.children = list(children)
+        self.parent = None
+        for child in self.children:
+            child.parent = self
+        self.past_markets = []
+
+    def add_past_market(self, market):
+        if ConstSettings.GeneralSettings.KEEP_PAST_MARKETS:
+            self.past_markets.append(market)
+        else:
+            self.past_markets = [market]
+
+
+class FakeMarket:
+    def __init__(self, time_slot, trades):
+        self.time_slot = time_slot
+        self.trades = trades
+
+
+class FakeOffer:
+    def __init__(self, energy):
+        self.energy = energy
+        self.price = energy * 30
+
+
+def _trade(seller, buyer, energy, seller_origin=None, buyer_origin=None):
+    return Trade('id', 0, FakeOffer(energy), seller, buyer,
+                 seller_origin=seller_origin or seller, buyer_origin=buyer_origin or buyer)
+
+
+def _pv(name):
+    return FakeArea(name, strategy=MagicMock(spec=PVStrategy))
+
+
+def _load(name):
+    load = FakeArea(name, strategy=MagicMock(spec=LoadHoursStrategy))
+    load.strategy.state = LoadState()
+    return load
+
+
+@pytest.fixture
+def keep_past_markets(request):
+    original_value = ConstSettings.GeneralSettings.KEEP_PAST_MARKETS
+    ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = request.param
+    yield request.param
+    ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = original_value
+
+
+def _grid():
+    return FakeArea('grid', [FakeArea('house1', [_pv('pv'), _load('load1')]),
+                             FakeArea('house2', [_load('load2')])])
+
+
+def _run_slot(grid, slot):
+    house1, house2 = grid.children
+    time_slot = today().add(hours=slot)
+    house1.add_past_market(FakeMarket(time_slot, [
+        _trade('pv', 'load1', 0.5), _trade('pv', 'IAA house1', 0.2 * (slot + 1))]))
+    house2.add_past_market(FakeMarket(time_slot, [
+        _trade('IAA house2', 'load2', 0.2 * (slot + 1), seller_origin='pv')]))
+    grid.add_past_market(FakeMarket(time_slot, [
+        _trade('IAA house1', 'IAA house2', 0.2 * (slot + 1), 'pv', 'load2')]))
+    for load in (house1.children[1], house2.children[0]):
+        load.strategy.state.total_energy_demanded_wh += 1000
+
+
+def _kpis_per_slot(slot_count):
+    grid = _grid()
+    kpi = KPI()
+    kpis = []
+    for slot in range(slot_count):
+        _run_slot(grid, slot)
+        kpi.update_kpis_from_area(grid)
+        kpis.append(dict(kpi.performance_indices))
+    return kpis
+
+
+@pytest.mark.parametrize("keep_past_markets", [True, False], indirect=True)
+def test_kpi_accounts_trades_of_every_slot_once(keep_past_markets):
+    kpis = _kpis_per_slot(3)
+    assert kpis[-1]['house1']['total_energy_produced_wh'] == pytest.approx(2700)
+    assert kpis[-1]['house1']['total_self_consumption_wh'] == pytest.approx(1500)
+    assert kpis[-1]['house1']['total_energy_demanded_wh'] == 3000
+    assert kpis[-1]['grid']['total_energy_produced_wh'] == pytest.approx(2700)
+    assert kpis[-1]['grid']['total_self_consumption_wh'] == pytest.approx(2700)
+    assert kpis[-1]['grid']['total_energy_demanded_wh'] == 6000
+    assert set(kpis[-1].keys()) == {'grid', 'house1', 'house2'}
+
+
+def test_kpi_does_not_depend_on_keeping_past_markets():
+    original_value = ConstSettings.GeneralSettings.KEEP_PAST_MARKETS
+    try:
+        ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = True
+        kept_markets_kpis = _kpis_per_slot(4)
+        ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = False
+        last_market_kpis = _kpis_per_slot(4)
+    finally:
+        ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = original_value
+    assert kept_markets_kpis == last_market_kpis
+
+
+@pytest.mark.parametrize("keep_past_markets", [True, False], indirect=True)
+def test_kpi_does_not_account_market_twice(keep_past_markets):
+    grid = _grid()
+    kpi = KPI()
+    _run_slot(grid, 0)
+    kpi.update_kpis_from_area(grid)
+    kpis = dict(kpi.performance_indices)
+    kpi.update_kpis_from_area(grid)
+    assert kpi.performance_indices == kpis
+    assert kpi.performance_indices['house1']['total_energy_produced_wh'] == pytest.approx(700)
+
+
+@pytest.mark.parametrize("keep_past_markets", [True], indirect=True)
+def test_kpi_indexes_devices_again_if_the_topology_changes(keep_past_markets):
+    grid = _grid()
+    house2 = grid.children[1]
+    kpi = KPI()
+    _run_slot(grid, 0)
+    kpi.update_kpis_from_area(grid)
+    assert kpi.state['house2'].producer_set == set()
+
+    # Added device
+    pv2 = _pv('pv2')
+    pv2.parent = house2
+    house2.children.append(pv2)
+    house2.add_past_market(FakeMarket(today().add(hours=1), [_trade('pv2', 'load2', 0.3)]))
+    kpi.update_kpis_from_area(grid)
+    assert kpi.state['house2'].producer_set == {'pv2'}
+    assert kpi.performance_indices['house2']['total_energy_produced_wh'] == pytest.approx(300)
+    assert kpi.performance_indices['house2']['total_self_consumption_wh'] == \
+        pytest.approx(300)
+
+    # Changed strategy type
+    house2.children[0].strategy = MagicMock(spec=PVStrategy)
+    kpi.update_kpis_from_area(grid)
+    assert kpi.state['house2'].producer_set == {'pv2', 'load2'}
+    assert [area.name for area in kpi.state['house2'].load_areas] == []
@@ -21,6 +21,7 @@ from copy import deepcopy
 import pytest
 from pendulum import DateTime, now
 
+import d3a.constants
 from d3a.constants import TIME_ZONE
 from d3a.events.event_structures import MarketEvent
 
@@ -39,6 +40,7 @@ from d3a.models.market.balancing import BalancingMarket
 from d3a_interface.constants_limits import ConstSettings
 from d3a.d3a_core.util import add_or_create_key, subtract_or_create_key
 from d3a.models.market import TransferFees
+from d3a.models.market.trade_index import trades_with_area_names
 
 from d3a.d3a_core.device_registry import DeviceRegistry
 device_registry_dict = {
@@ -510,6 +512,23 @@ def test_market_avg_offer_price_empty(market):
     assert market.avg_offer_price == 0
 
 
+def test_market_min_max_avg_offer_price_follow_open_offers():
+    market = OneSidedMarket(time_slot=now())
+    offer1 = market.offer(1, 1, 'A', 'A')
+    market.offer(6, 2, 'A', 'A')
+    offer3 = market.offer(10, 2, 'A', 'A')
+    assert (market.min_offer_price, market.max_offer_price) == (1, 5)
+    assert market.avg_offer_price == 3.4
+
+    market.delete_offer(offer3)
+    assert (market.min_offer_price, market.max_offer_price) == (1, 3)
+    assert market.avg_offer_price == round(7 / 3, 4)
+
+    market.accept_offer(offer1, 'B')
+    assert (market.min_offer_price, market.max_offer_price) == (3, 3)
+    assert market.avg_offer_price == 3
+
+
 @pytest.mark.parametrize("market, offer", [
     (OneSidedMarket(time_slot=now()), "offer"),
     (BalancingMarket(time_slot=now()), "balancing_offer")
@@ -619,6 +638,57 @@ def test_market_listeners_offer_deleted(market, offer, delete_offer, add_listene
     assert called.calls[1][1] == {'offer': repr(e_offer), 'market_id': repr(market.id)}
 
 
+def test_market_update_offer_price_reprices_offer_in_place(called):
+    market = OneSidedMarket(time_slot=now())
+    cheap_offer = market.offer(10, 10, 'A', 'A')
+    e_offer = market.offer(30, 10, 'B', 'B')
+    market.add_listener(called)
+    repriced_offer = market.update_offer_price(e_offer, 5)
+
+    assert repriced_offer.id == e_offer.id
+    assert (repriced_offer.price, repriced_offer.original_offer_price) == (5, 5)
+    assert (repriced_offer.energy, repriced_offer.seller) == (10, 'B')
+    assert market.offers[e_offer.id] is repriced_offer
+    assert market.sorted_offers == [repriced_offer, cheap_offer]
+    assert market.offer_history == [cheap_offer, repriced_offer]
+    assert market.min_offer_price == 0.5
+    assert len(called.calls) == 1
+    assert called.calls[0][0] == (repr(MarketEvent.OFFER_REPRICED), )
+    assert called.calls[0][1] == {'offer': repr(repriced_offer), 'market_id': repr(market.id)}
+
+    with pytest.raises(OfferNotFoundException):
+        market.update_offer_price("no such offer", 5)
+
+
+def test_market_update_offer_price_readonly(market):
+    e_offer = market.offer(20, 10, 'someone', 'someone')
+    market.readonly = True
+    with pytest.raises(MarketReadOnlyException):
+        market.update_offer_price(e_offer, 10)
+
+
+def test_market_update_bid_price_reprices_bid_in_place(market: TwoSidedPayAsBid, called):
+    bid = market.bid(20, 10, 'someone', 'noone', 'someone')
+    market.add_listener(called)
+    repriced_bid = market.update_bid_price(bid.id, 25)
+
+    assert repriced_bid.id == bid.id
+    assert (repriced_bid.price, repriced_bid.original_bid_price) == (25, 25)
+    assert repriced_bid.energy_rate == 2.5
+    assert market.bids[bid.id] == repriced_bid
+    assert market.bid_history == [repriced_bid]
+    assert len(called.calls) == 1
+    assert called.calls[0][0] == (repr(MarketEvent.BID_REPRICED), )
+    assert called.calls[0][1] == {'bid': repr(repriced_bid), 'market_id': repr(market.id)}
+
+    with pytest.raises(BidNotFound):
+        market.update_bid_price("no such bid", 25)
+
+    market.readonly = True
+    with pytest.raises(MarketReadOnlyException):
+        market.update_bid_price(bid.id, 30)
+
+
 @pytest.mark.parametrize(
     ('last_offer_size', 'traded_energy'),
     (
@@ -675,7 +745,7 @@ def pac_market():
     # ([2, 3, 6, 7, 7, 7, 7], [7, 5, 5, 2, 2, 2, 2], 5, 2),
     # ([2, 2, 4, 4, 4, 4, 6], [6, 6, 6, 6, 2, 2, 2], 4, 4),
 ])
-@pytest.mark.parametrize("algorithm", [1])
+@pytest.mark.parametrize("algorithm", [1, 3])
 def test_double_sided_market_performs_pay_as_clear_matching(pac_market, offer, bid, mcp_rate,
                                                             mcp_energy, algorithm):
     ConstSettings.IAASettings.PAY_AS_CLEAR_AGGREGATION_ALGORITHM = algorithm
@@ -700,8 +770,9 @@ def test_double_sided_market_performs_pay_as_clear_matching(pac_market, offer, b
     assert matched_energy == mcp_energy
 
 
-def test_double_sided_pay_as_clear_market_works_with_floats(pac_market):
-    ConstSettings.IAASettings.PAY_AS_CLEAR_AGGREGATION_ALGORITHM = 1
+@pytest.mark.parametrize("algorithm", [1, 3])
+def test_double_sided_pay_as_clear_market_works_with_floats(pac_market, algorithm):
+    ConstSettings.IAASettings.PAY_AS_CLEAR_AGGREGATION_ALGORITHM = algorithm
     pac_market.offers = {"offer1": Offer('id1', now(), 1.1, 1, 'other'),
                          "offer2": Offer('id2', now(), 2.2, 1, 'other'),
                          "offer3": Offer('id3', now(), 3.3, 1, 'other')}
@@ -746,6 +817,114 @@ def test_double_sided_pay_as_bid_market_match_offer_bids(pab_market):
     assert bid.price == source_bid.price
 
 
+@pytest.mark.parametrize("market_class", [OneSidedMarket, TwoSidedPayAsBid, TwoSidedPayAsClear])
+def test_market_binds_lock_free_actions_in_lock_free_mode(market_class):
+    default_mode = d3a.constants.MARKET_CONCURRENCY_MODE
+    try:
+        d3a.constants.MARKET_CONCURRENCY_MODE = d3a.constants.MARKET_CONCURRENCY_LOCK_FREE
+        market = market_class(time_slot=now())
+        assert "offer" in market.__dict__ and "accept_offer" in market.__dict__
+        assert market.offer.__func__ is market_class.offer.__wrapped__
+
+        d3a.constants.MARKET_CONCURRENCY_MODE = d3a.constants.MARKET_CONCURRENCY_LOCKED
+        market = market_class(time_slot=now())
+        assert "offer" not in market.__dict__
+        assert market.offer.__func__ is market_class.offer
+    finally:
+        d3a.constants.MARKET_CONCURRENCY_MODE = default_mode
+
+
+@pytest.mark.parametrize("mode", [d3a.constants.MARKET_CONCURRENCY_LOCKED,
+                                  d3a.constants.MARKET_CONCURRENCY_LOCK_FREE])
+def test_market_actions_behave_the_same_in_all_concurrency_modes(mode):
+    default_mode = d3a.constants.MARKET_CONCURRENCY_MODE
+    try:
+        d3a.constants.MARKET_CONCURRENCY_MODE = mode
+        market = OneSidedMarket(time_slot=now())
+        offer = market.offer(10, 2, 'A', 'A')
+        trade = market.accept_offer(offer, 'B', energy=1)
+        assert trade.offer.energy == 1
+        assert list(market.get_offers().values())[0].energy == 1
+        market.delete_offer(trade.residual)
+        assert len(market.offers) == 0
+    finally:
+        d3a.constants.MARKET_CONCURRENCY_MODE = default_mode
+
+
+def test_market_delivers_batches_of_consecutive_events_in_order_of_occurrence(called):
+    market = OneSidedMarket(time_slot=now())
+    batches = []
+    market.add_listener(called)
+    market.add_batch_listener(lambda event, market_id, events: batches.append(
+        (event, market_id, [list(kwargs.values())[0].id for kwargs in events])))
+    offers = [market.offer(10, 1, 'A', 'A') for _ in range(3)]
+    market.delete_offer(offers[0])
+    offer = market.offer(20, 1, 'A', 'A')
+    assert len(called.calls) == 5
+    assert batches == []
+
+    assert market.deliver_pending_events() is True
+    assert batches == [
+        (MarketEvent.OFFER, market.id, [o.id for o in offers]),
+        (MarketEvent.OFFER_DELETED, market.id, [offers[0].id]),
+        (MarketEvent.OFFER, market.id, [offer.id]),
+    ]
+    assert market.deliver_pending_events() is False
+
+
+def test_market_delivers_events_raised_during_batch_delivery():
+    market = OneSidedMarket(time_slot=now())
+    batches = []
+
+    def listener(event, market_id, events):
+        batches.append((event, len(events)))
+        if event == MarketEvent.OFFER:
+            for kwargs in events:
+                market.accept_offer(kwargs["offer"], 'B')
+
+    market.add_batch_listener(listener)
+    market.offer(10, 1, 'A', 'A')
+    market.offer(10, 1, 'A', 'A')
+    assert market.deliver_pending_events() is True
+    assert batches == [(MarketEvent.OFFER, 2), (MarketEvent.TRADE, 2)]
+    assert len(market.trades) == 2
+
+
+def test_market_indexes_trades_by_seller_buyer_and_origins():
+    market = OneSidedMarket(time_slot=now())
+    trades = [
+        market.accept_offer(market.offer(10, 1, 'A', 'A origin'), 'B', buyer_origin='B origin'),
+        market.accept_offer(market.offer(20, 2, 'B', 'B'), 'C', buyer_origin='C'),
+        market.accept_offer(market.offer(30, 3, 'A', 'A origin'), 'C', buyer_origin='C'),
+    ]
+    trade_index = market.trade_index
+    assert trade_index.by_seller == {'A': [trades[0], trades[2]], 'B': [trades[1]]}
+    assert trade_index.by_buyer == {'B': [trades[0]], 'C': [trades[1], trades[2]]}
+    assert trade_index.by_seller_origin == {'A origin': [trades[0], trades[2]],
+                                            'B': [trades[1]]}
+    assert trade_index.by_buyer_origin == {'B origin': [trades[0]],
+                                           'C': [trades[1], trades[2]]}
+    assert trade_index.by_trader['B'] == [trades[0], trades[1]]
+    assert market.bought_energy('C') == 5
+    assert market.total_spent('C') == 50
+    assert market.total_earned('A') == 40
+    assert market.total_earned('nobody') == 0
+
+
+def test_market_resolves_area_names_of_trade_sellers_and_buyers():
+    market = OneSidedMarket(time_slot=now())
+    trades = [market.accept_offer(market.offer(10, 1, 'IAA House 1', 'PV'), 'Load',
+                                  buyer_origin='Load'),
+              market.accept_offer(market.offer(10, 1, 'PV', 'PV'), 'IAA House 2',
+                                  buyer_origin='Load 2')]
+    expected = [(trades[0], ('House 1', 'Load')), (trades[1], ('PV', 'House 2'))]
+    assert list(trades_with_area_names(market)) == expected
+    assert market.trade_index.area_names == [('House 1', 'Load'), ('PV', 'House 2')]
+
+    market_without_index = type('FakeMarket', (), {'trades': trades})()
+    assert list(trades_with_area_names(market_without_index)) == expected
+
+
 class MarketStateMachine(RuleBasedStateMachine):
     offers = Bundle('Offers')
     actors = Bundle('Actors')
@@ -81,7 +81,8 @@ class TestMarketRedisEventSubscriber(unittest.TestCase):
             {
                 "id/OFFER": self.subscriber._offer,
                 "id/DELETE_OFFER": self.subscriber._delete_offer,
-                "id/ACCEPT_OFFER": self.subscriber._accept_offer
+                "id/ACCEPT_OFFER": self.subscriber._accept_offer,
+                "id/UPDATE_OFFER_PRICE": self.subscriber._update_offer_price
             }
         )
 
@@ -189,6 +190,28 @@ class TestMarketRedisEventSubscriber(unittest.TestCase):
             json.dumps({"status": "ready", "transaction_uuid": "trans_id"})
         )
 
+    def test_update_offer_price_calls_market_method_and_publishes_response(self):
+        offer = Offer("o_id", now(), 32, 12, "o_seller")
+        payload = {"data": json.dumps({
+                "offer_or_id": offer.to_JSON_string(),
+                "price": 24,
+                "transaction_uuid": "trans_id"
+            })
+        }
+        repriced_offer = Offer("o_id", now(), 24, 12, "o_seller")
+        self.market.update_offer_price = MagicMock(return_value=repriced_offer)
+        self.subscriber._update_offer_price(payload)
+        sleep(0.01)
+        self.subscriber.market.update_offer_price.assert_called_once_with(
+            offer_or_id=offer, price=24
+        )
+        self.subscriber.redis_db.publish.assert_called_once_with(
+            "id/UPDATE_OFFER_PRICE/RESPONSE", json.dumps({
+                "status": "ready", "offer": repriced_offer.to_JSON_string(),
+                "transaction_uuid": "trans_id"
+            })
+        )
+
 
 class TestTwoSidedMarketRedisEventSubscriber(unittest.TestCase):
 
@@ -207,6 +230,7 @@ class TestTwoSidedMarketRedisEventSubscriber(unittest.TestCase):
                 "id/OFFER": self.subscriber._offer,
                 "id/DELETE_OFFER": self.subscriber._delete_offer,
                 "id/ACCEPT_OFFER": self.subscriber._accept_offer,
+                "id/UPDATE_OFFER_PRICE": self.subscriber._update_offer_price,
                 "id/DELETE_BID": self.subscriber._delete_bid,
                 "id/ACCEPT_BID": self.subscriber._accept_bid,
                 "id/BID": self.subscriber._bid,
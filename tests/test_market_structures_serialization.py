@@ -0,0 +1,66 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import json
+import pytest
+import pendulum
+
+import d3a.constants
+from d3a.models.market.market_structures import Offer, Bid, Trade, TradeBidInfo, \
+    bid_from_JSON_string, trade_from_JSON_string, trade_bid_info_from_JSON_string, orjson
+
+backends = ["json", pytest.param("orjson", marks=pytest.mark.skipif(
+    orjson is None, reason="orjson is not installed"))]
+
+
+@pytest.fixture(params=backends)
+def json_backend(request):
+    d3a.constants.JSON_SERIALIZATION_BACKEND = request.param
+    yield request.param
+    d3a.constants.JSON_SERIALIZATION_BACKEND = "json"
+
+
+def test_bid_json_round_trip(json_backend):
+    bid = Bid('bid_id', pendulum.now(), 30, 1.5, 'B', 'S', 30, 'B')
+    bid_dict = json.loads(bid.to_JSON_string())
+    assert bid_dict["type"] == "Bid"
+    assert bid_dict["time"] == bid.time.isoformat()
+    parsed_bid = bid_from_JSON_string(bid.to_JSON_string())
+    assert parsed_bid._replace(time=bid.time) == bid
+
+
+@pytest.mark.parametrize("trade_bid_info", [None, TradeBidInfo(30, 30, 10, 10, 10)])
+def test_trade_json_round_trip(json_backend, trade_bid_info):
+    current_time = pendulum.now()
+    offer = Offer('offer_id', current_time, 12.5, 1.25, 'S', 12, 'S')
+    residual = Offer('residual_id', current_time, 25, 2.5, 'S', 24, 'S')
+    trade = Trade('trade_id', current_time, offer, 'S', 'B', residual,
+                  offer_bid_trade_info=trade_bid_info,
+                  seller_origin='S', buyer_origin='B', fee_price=0.1)
+    parsed_trade = trade_from_JSON_string(trade.to_JSON_string(), current_time)
+    assert parsed_trade.offer == offer
+    assert parsed_trade.residual == residual
+    assert parsed_trade.time == trade.time
+    assert parsed_trade._replace(offer=offer, residual=residual, time=trade.time,
+                                 offer_bid_trade_info=trade_bid_info) == trade
+    assert parsed_trade.offer_bid_trade_info == \
+        (list(trade_bid_info) if trade_bid_info is not None else None)
+
+
+def test_trade_bid_info_json_round_trip(json_backend):
+    info = TradeBidInfo(30, 30, 10, 10, 10)
+    assert trade_bid_info_from_JSON_string(info.to_JSON_string()) == info
@@ -15,9 +15,10 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
+import json
 import pytest
 import pendulum
-from d3a.models.market.market_structures import Offer, BalancingOffer
+from d3a.models.market.market_structures import Offer, BalancingOffer, offer_from_JSON_string
 
 
 @pytest.mark.parametrize("offer", [Offer, BalancingOffer])
@@ -26,3 +27,24 @@ def test_offer_id_stringified(offer):
 
     assert isinstance(offer.id, str)
     assert "<object object at" in offer.id
+
+
+@pytest.mark.parametrize("offer", [Offer, BalancingOffer])
+def test_offer_does_not_allocate_instance_dict(offer):
+    offer = offer('id', pendulum.now(), 10, 20, 'A')
+    assert not hasattr(offer, '__dict__')
+    with pytest.raises(AttributeError):
+        offer.unknown_attribute = 1
+
+
+def test_offer_json_round_trip_keeps_all_fields():
+    offer = Offer('id', pendulum.now(), 10, 20, 'A', original_offer_price=8, seller_origin='B')
+    offer.real_id = 'real_id'
+    offer_dict = json.loads(offer.to_JSON_string())
+    assert offer_dict == {"id": "id", "real_id": "real_id", "price": 10,
+                          "original_offer_price": 8, "energy": 20, "seller": "A",
+                          "seller_origin": "B", "time": offer.time.isoformat(), "type": "Offer"}
+    parsed_offer = offer_from_JSON_string(offer.to_JSON_string(), offer.time)
+    assert parsed_offer == offer
+    assert parsed_offer.real_id == 'real_id'
+    assert parsed_offer.energy_rate == offer.energy_rate
@@ -0,0 +1,170 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import pickle
+import random
+from copy import deepcopy
+
+import pytest
+from pendulum import now
+
+from d3a.models.market import Market
+from d3a.models.market.market_structures import Offer, Bid
+from d3a.models.market.one_sided import OneSidedMarket
+from d3a.models.market.order_book import OrderBook
+
+
+@pytest.fixture
+def offer_book():
+    book = OrderBook()
+    for offer_id, price in [("o1", 5), ("o2", 3), ("o3", 1), ("o4", 3), ("o5", 4)]:
+        book[offer_id] = Offer(offer_id, now(), price, 1, 'A')
+    return book
+
+
+def test_order_book_sorted_values_match_sorting_of_plain_dict(offer_book):
+    plain = dict(offer_book)
+    assert offer_book.sorted_values() == Market.sorting(plain)
+    assert offer_book.sorted_values(True) == Market.sorting(plain, True)
+    assert [o.id for o in offer_book.sorted_values()] == ["o3", "o2", "o4", "o5", "o1"]
+
+
+def test_order_book_updates_index_on_removal(offer_book):
+    assert offer_book.pop("o3").id == "o3"
+    assert offer_book.pop("o3", None) is None
+    with pytest.raises(KeyError):
+        offer_book.pop("o3")
+    del offer_book["o1"]
+    assert [o.id for o in offer_book.sorted_values()] == ["o2", "o4", "o5"]
+    offer_book.clear()
+    assert offer_book.sorted_values() == []
+    assert offer_book.lowest() is None
+    assert offer_book.highest() is None
+
+
+def test_order_book_replacing_order_keeps_insertion_position(offer_book):
+    offer_book["o2"] = Offer("o2", now(), 3, 1, 'B')
+    assert [o.id for o in offer_book.sorted_values()] == ["o3", "o2", "o4", "o5", "o1"]
+    offer_book["o2"] = Offer("o2", now(), 6, 1, 'B')
+    assert [o.id for o in offer_book.sorted_values()] == ["o3", "o4", "o5", "o1", "o2"]
+
+
+def test_order_book_keeps_total_price_and_energy(offer_book):
+    assert (offer_book.total_price, offer_book.total_energy) == (16, 5)
+    offer_book["o6"] = Offer("o6", now(), 4, 2, 'A')
+    offer_book["o1"] = Offer("o1", now(), 1, 1, 'A')
+    offer_book.pop("o2")
+    assert (offer_book.total_price, offer_book.total_energy) == (13, 6)
+    for offer_id in list(offer_book.keys()):
+        del offer_book[offer_id]
+    assert (offer_book.total_price, offer_book.total_energy) == (0, 0)
+
+
+def test_order_book_totals_are_sums_of_orders_after_removals():
+    book = OrderBook()
+    book["small"] = Offer("small", now(), 1, 1, 'A')
+    book["large"] = Offer("large", now(), 2.0 ** 53, 2.0 ** 53, 'A')
+    book.pop("large")
+    book["tiny"] = Offer("tiny", now(), 0.1, 0.1, 'A')
+    assert (book.total_price, book.total_energy) == (1.1, 1.1)
+
+
+def test_order_book_totals_follow_partial_accepts_and_removals():
+    random.seed(3)
+    market = OneSidedMarket(time_slot=now())
+    for _ in range(500):
+        action = random.random()
+        if action < 0.5 or not market.offers:
+            market.offer(random.uniform(1, 30), random.uniform(0.1, 5), 'A', 'A')
+        elif action < 0.8:
+            offer = random.choice(list(market.offers.values()))
+            market.accept_offer(offer, 'B', energy=offer.energy * random.uniform(0.1, 0.9))
+        else:
+            market.delete_offer(random.choice(list(market.offers)))
+        assert market.offers.total_price == sum(o.price for o in market.offers.values())
+        assert market.offers.total_energy == sum(o.energy for o in market.offers.values())
+
+
+def test_order_book_update_price_keeps_totals(offer_book):
+    offer_book.update_price("o1", 0.5)
+    assert (offer_book.total_price, offer_book.total_energy) == (11.5, 5)
+
+
+def test_order_book_best_price_and_range_queries(offer_book):
+    assert offer_book.lowest().id == "o3"
+    assert offer_book.highest().id == "o1"
+    assert [o.id for o in offer_book.in_rate_range(3, 4)] == ["o2", "o4", "o5"]
+    assert [o.id for o in offer_book.in_rate_range(min_rate=4)] == ["o5", "o1"]
+    assert [o.id for o in offer_book.in_rate_range(max_rate=2.9)] == ["o3"]
+
+
+def test_order_book_survives_copy_and_pickle(offer_book):
+    for book in [deepcopy(offer_book), pickle.loads(pickle.dumps(offer_book)),
+                 offer_book.copy()]:
+        assert isinstance(book, OrderBook)
+        assert book.sorted_values() == offer_book.sorted_values()
+
+
+def test_order_book_indexes_orders_by_owner():
+    book = OrderBook(owner_attribute="buyer")
+    for bid_id, buyer in [("b1", "A"), ("b2", "B"), ("b3", "A")]:
+        book[bid_id] = Bid(bid_id, now(), 2, 1, buyer, 'S')
+    assert [b.id for b in book.orders_of("A")] == ["b1", "b3"]
+    book.pop("b1")
+    del book["b2"]
+    assert [b.id for b in book.orders_of("A")] == ["b3"]
+    assert book.orders_of("B") == []
+    for copied_book in [book.copy(), pickle.loads(pickle.dumps(book))]:
+        assert [b.id for b in copied_book.orders_of("A")] == ["b3"]
+    book.clear()
+    assert book.orders_of("A") == []
+
+
+def test_order_book_logs_inserted_keys(offer_book):
+    keys, position = offer_book.keys_inserted_since(0)
+    assert (keys, position) == (["o1", "o2", "o3", "o4", "o5"], 5)
+    offer_book["o2"] = Offer("o2", now(), 6, 1, 'B')
+    offer_book["o6"] = Offer("o6", now(), 2, 1, 'A')
+    offer_book.pop("o1")
+    offer_book["o1"] = Offer("o1", now(), 5, 1, 'A')
+    assert offer_book.keys_inserted_since(position) == (["o6", "o1"], 7)
+    assert sorted(offer_book, key=offer_book.insertion_sequence) == list(offer_book)
+
+
+def test_market_wraps_assigned_dicts_in_order_book():
+    market = Market(time_slot=now())
+    market.bids = {"b1": Bid("b1", now(), 2, 1, 'B', 'S'),
+                   "b2": Bid("b2", now(), 9, 1, 'B', 'S')}
+    assert isinstance(market.bids, OrderBook)
+    assert market.bids.highest().id == "b2"
+    assert [b.id for b in market.bids.orders_of('B')] == ["b1", "b2"]
+    assert [b.id for b in market.sorting(market.bids, True)] == ["b2", "b1"]
+
+
+def test_order_book_update_price_reindexes_order(offer_book):
+    offer_book.update_price("o1", 0.5)
+    assert offer_book["o1"].price == 0.5
+    assert [o.id for o in offer_book.sorted_values()] == ["o1", "o3", "o2", "o4", "o5"]
+    assert offer_book.lowest().id == "o1"
+    assert [o.id for o in offer_book.in_rate_range(max_rate=1)] == ["o1", "o3"]
+
+
+def test_market_order_books_can_be_deleted():
+    market = Market(time_slot=now())
+    del market.offers
+    del market.bids
+    assert not hasattr(market, "offers") and not hasattr(market, "bids")
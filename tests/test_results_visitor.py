@@ -0,0 +1,222 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from types import SimpleNamespace
+from uuid import uuid4
+import pytest
+from pendulum import today
+
+from d3a.models.market.market_structures import Trade
+from d3a.d3a_core.sim_results.file_export_endpoints import FileExportEndpoints
+from d3a.d3a_core.sim_results.results_visitor import ResultsVisitor, walk_area_tree
+from d3a.d3a_core.sim_results.trade_ledger import TradeLedger
+from d3a_interface.constants_limits import ConstSettings
+
+SLOTS = [today(), today().add(hours=1)]
+
+
+class FakeArea:
+    def __init__(self, name, children=()):
+        self.name = name
+        self.slug = name
+        self.uuid = str(uuid4())
+        self.strategy = None
+        self.children = list(children)
+        self.parent = None
+        for child in self.children:
+            child.parent = self
+        self.past_markets = []
+        self.past_balancing_markets = []
+        self.current_balancing_market = None
+        self.stats = SimpleNamespace(market_trades={})
+        self.config = SimpleNamespace(market_slot_list=SLOTS)
+
+    @property
+    def current_market(self):
+        return self.past_markets[-1] if self.past_markets else None
+
+
+class FakeMarket:
+    def __init__(self, time_slot, trades):
+        self.time_slot = time_slot
+        self.trades = trades
+
+
+class FakeOffer:
+    def __init__(self, energy):
+        self.energy = energy
+        self.price = energy * 30
+
+
+def _trade(seller, buyer, energy):
+    return Trade('id', 0, FakeOffer(energy), seller, buyer,
+                 seller_origin=seller, buyer_origin=buyer)
+
+
+class RecordingVisitor(ResultsVisitor):
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def start_walk(self, root_area):
+        self.log.append((self.name, "start_walk", root_area.name))
+
+    def enter_area(self, area):
+        self.log.append((self.name, "enter_area", area.name))
+
+    def enter_market(self, area, market):
+        self.log.append((self.name, "enter_market", area.name, market.time_slot.hour))
+
+    def visit_trade(self, area, market, trade, seller, buyer):
+        self.log.append((self.name, "visit_trade", area.name, seller, buyer, trade.offer.energy))
+
+    def leave_area(self, area):
+        self.log.append((self.name, "leave_area", area.name))
+
+    def finish_walk(self, root_area):
+        self.log.append((self.name, "finish_walk", root_area.name))
+
+
+class TradeRecordingVisitor(ResultsVisitor):
+    def __init__(self, log):
+        self.log = log
+
+    def visit_trade(self, area, market, trade, seller, buyer):
+        self.log.append(("trades", "visit_trade", area.name, seller, buyer, trade.offer.energy))
+
+
+@pytest.fixture
+def keep_past_markets(request):
+    original_value = ConstSettings.GeneralSettings.KEEP_PAST_MARKETS
+    ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = request.param
+    yield request.param
+    ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = original_value
+
+
+def _grid():
+    return FakeArea('grid', [FakeArea('house1', [FakeArea('pv'), FakeArea('load1')]),
+                             FakeArea('house2', [FakeArea('load2')])])
+
+
+def _add_slot(grid, slot):
+    house1, house2 = grid.children
+    house1.past_markets.append(FakeMarket(SLOTS[slot], [
+        _trade('pv', 'load1', 0.5), _trade('pv', 'IAA house1', 0.2 * (slot + 1))]))
+    house2.past_markets.append(FakeMarket(SLOTS[slot], [
+        _trade('IAA house2', 'load2', 0.2 * (slot + 1))]))
+    grid.past_markets.append(FakeMarket(SLOTS[slot], [
+        _trade('IAA house1', 'IAA house2', 0.2 * (slot + 1))]))
+
+
+@pytest.mark.parametrize("keep_past_markets", [False], indirect=True)
+def test_walk_area_tree_calls_hooks_in_tree_and_visitor_order(keep_past_markets):
+    grid = _grid()
+    _add_slot(grid, 0)
+    log = []
+    areas = walk_area_tree(grid, [RecordingVisitor("a", log), TradeRecordingVisitor(log),
+                                  RecordingVisitor("b", log)])
+    assert [area.name for area in areas] == ['grid', 'house1', 'pv', 'load1', 'house2', 'load2']
+    assert log == [
+        ("a", "start_walk", "grid"), ("b", "start_walk", "grid"),
+        ("a", "enter_area", "grid"), ("b", "enter_area", "grid"),
+        ("a", "enter_market", "grid", 0), ("b", "enter_market", "grid", 0),
+        ("a", "visit_trade", "grid", "house1", "house2", 0.2),
+        ("trades", "visit_trade", "grid", "house1", "house2", 0.2),
+        ("b", "visit_trade", "grid", "house1", "house2", 0.2),
+        ("a", "enter_area", "house1"), ("b", "enter_area", "house1"),
+        ("a", "enter_market", "house1", 0), ("b", "enter_market", "house1", 0),
+        ("a", "visit_trade", "house1", "pv", "load1", 0.5),
+        ("trades", "visit_trade", "house1", "pv", "load1", 0.5),
+        ("b", "visit_trade", "house1", "pv", "load1", 0.5),
+        ("a", "visit_trade", "house1", "pv", "house1", 0.2),
+        ("trades", "visit_trade", "house1", "pv", "house1", 0.2),
+        ("b", "visit_trade", "house1", "pv", "house1", 0.2),
+        ("a", "enter_area", "pv"), ("b", "enter_area", "pv"),
+        ("a", "leave_area", "pv"), ("b", "leave_area", "pv"),
+        ("a", "enter_area", "load1"), ("b", "enter_area", "load1"),
+        ("a", "leave_area", "load1"), ("b", "leave_area", "load1"),
+        ("a", "leave_area", "house1"), ("b", "leave_area", "house1"),
+        ("a", "enter_area", "house2"), ("b", "enter_area", "house2"),
+        ("a", "enter_market", "house2", 0), ("b", "enter_market", "house2", 0),
+        ("a", "visit_trade", "house2", "house2", "load2", 0.2),
+        ("trades", "visit_trade", "house2", "house2", "load2", 0.2),
+        ("b", "visit_trade", "house2", "house2", "load2", 0.2),
+        ("a", "enter_area", "load2"), ("b", "enter_area", "load2"),
+        ("a", "leave_area", "load2"), ("b", "leave_area", "load2"),
+        ("a", "leave_area", "house2"), ("b", "leave_area", "house2"),
+        ("a", "leave_area", "grid"), ("b", "leave_area", "grid"),
+        ("a", "finish_walk", "grid"), ("b", "finish_walk", "grid"),
+    ]
+
+
+@pytest.mark.parametrize("keep_past_markets", [True, False], indirect=True)
+def test_walk_area_tree_streams_markets_of_slot(keep_past_markets):
+    grid = _grid()
+    _add_slot(grid, 0)
+    _add_slot(grid, 1)
+    log = []
+    walk_area_tree(grid, [RecordingVisitor("a", log)])
+    markets = [entry[2:] for entry in log if entry[1] == "enter_market"]
+    if keep_past_markets:
+        assert markets == [("grid", 0), ("grid", 1), ("house1", 0), ("house1", 1),
+                           ("house2", 0), ("house2", 1)]
+    else:
+        assert markets == [("grid", 1), ("house1", 1), ("house2", 1)]
+
+
+def _export_endpoints_after_slots(slot_count):
+    grid = _grid()
+    endpoints = FileExportEndpoints(False, TradeLedger())
+    for slot in range(slot_count):
+        _add_slot(grid, slot)
+        endpoints(grid)
+    return grid, endpoints
+
+
+@pytest.mark.parametrize("keep_past_markets", [False], indirect=True)
+def test_file_export_endpoints_snapshot_of_current_market(keep_past_markets):
+    grid, endpoints = _export_endpoints_after_slots(2)
+    house1 = grid.children[0]
+    traded_energy = endpoints.traded_energy_current[house1.uuid]
+    assert traded_energy["sold_energy"] == {
+        "pv": {"accumulated": {SLOTS[1]: pytest.approx(0.9)},
+               "load1": {SLOTS[1]: 0.5},
+               "house1": {SLOTS[1]: pytest.approx(0.4)}}}
+    assert traded_energy["bought_energy"] == {
+        "load1": {"accumulated": {SLOTS[1]: 0.5}, "pv": {SLOTS[1]: 0.5}},
+        "house1": {"accumulated": {SLOTS[1]: pytest.approx(0.4)},
+                   "pv": {SLOTS[1]: pytest.approx(0.4)}}}
+    assert endpoints.traded_energy_current[grid.uuid]["sold_energy"] == {
+        "house1": {"accumulated": {SLOTS[1]: pytest.approx(0.4)},
+                   "house2": {SLOTS[1]: pytest.approx(0.4)}}}
+    # Areas without markets (the devices) are not exported
+    assert set(endpoints.traded_energy_current.keys()) == \
+        {grid.uuid, house1.uuid, grid.children[1].uuid}
+
+
+@pytest.mark.parametrize("keep_past_markets", [True], indirect=True)
+def test_file_export_endpoints_snapshot_of_past_markets(keep_past_markets):
+    grid, endpoints = _export_endpoints_after_slots(2)
+    house1 = grid.children[0]
+    traded_energy = endpoints.traded_energy[house1.uuid]
+    assert traded_energy["sold_energy"] == {
+        "pv": {"accumulated": {SLOTS[0]: pytest.approx(0.7), SLOTS[1]: pytest.approx(0.9)},
+               "load1": {SLOTS[0]: 0.5, SLOTS[1]: 0.5},
+               "house1": {SLOTS[0]: pytest.approx(0.2), SLOTS[1]: pytest.approx(0.4)}}}
+    assert traded_energy == endpoints._calculate_devices_sold_bought_energy_past_markets(
+        house1, house1.past_markets)
+    assert endpoints.traded_energy[house1.name] is traded_energy
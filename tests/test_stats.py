@@ -219,7 +219,7 @@ def grid_fees():
 def test_energy_bills_accumulate_fees(grid_fees):
     ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = True
     m_bills = MarketEnergyBills()
-    m_bills._update_market_fees(grid_fees, 'past_markets')
+    m_bills.update(grid_fees)
     assert m_bills.market_fees['house2'] == 0.03
     assert m_bills.market_fees['street'] == 0.05
     assert m_bills.market_fees['house1'] == 0.08
@@ -228,7 +228,7 @@ def test_energy_bills_accumulate_fees(grid_fees):
 def test_energy_bills_use_only_last_market_if_not_keep_past_markets(grid_fees):
     ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = False
     m_bills = MarketEnergyBills()
-    m_bills._update_market_fees(grid_fees, 'past_markets')
+    m_bills.update(grid_fees)
     assert m_bills.market_fees['house2'] == 0.03
     assert m_bills.market_fees['street'] == 0.01
     assert m_bills.market_fees['house1'] == 0.06
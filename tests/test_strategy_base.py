@@ -16,6 +16,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 import pytest
+import uuid
 from unittest.mock import MagicMock
 import pendulum
 
@@ -96,8 +97,8 @@ class FakeMarket:
 
     def bid(self, price, energy, buyer, seller, original_bid_price=None,
             buyer_origin=None):
-        return Bid(123, pendulum.now(), price, energy, buyer, seller, original_bid_price,
-                   buyer_origin=buyer_origin)
+        return Bid(str(uuid.uuid4()), pendulum.now(), price, energy, buyer, seller,
+                   original_bid_price, buyer_origin=buyer_origin)
 
 
 @pytest.fixture
@@ -151,6 +152,23 @@ def test_offers_in_market(offers2):
     assert len(offers2.sold_in_market('market2')) == 0
 
 
+def test_offers_indexes_follow_post_sell_and_remove(offers2):
+    sold_offer = offers2.posted_in_market('market')[1]
+    offers2.sold_offer(sold_offer, 'market')
+    assert [o.id for o in offers2.open_in_market('market')] == ['id']
+    assert [o.id for o in offers2.open.keys()] == ['id', 'id3']
+    assert offers2.is_offer_posted('market', 'id2')
+    assert not offers2.is_offer_posted('market2', 'id2')
+
+    offers2.remove_offer_by_id('market2', 'id3')
+    assert offers2.open_in_market('market2') == []
+    assert not offers2.is_offer_posted('market2', 'id3')
+
+    offers2.posted = {FakeOffer('id4'): 'market', sold_offer: 'market'}
+    assert [o.id for o in offers2.posted_in_market('market')] == ['id4', 'id2']
+    assert [o.id for o in offers2.open_in_market('market')] == ['id4']
+
+
 @pytest.fixture
 def offer1():
     return Offer('id', pendulum.now(), 1, 3, 'FakeOwner', 'market')
@@ -263,7 +281,7 @@ def test_bid_deleted_removes_bid_from_posted(base):
     test_bid = Bid("123", pendulum.now(), 12, 23, base.owner.name, 'B')
     market = FakeMarket(raises=False, id=21)
     base.area._market = market
-    base._bids[market.id] = [test_bid]
+    base.add_bid_to_posted(market.id, test_bid)
     base.event_bid_deleted(market_id=21, bid=test_bid)
     assert base.get_posted_bids(market) == []
 
@@ -275,7 +293,6 @@ def test_bid_split_adds_bid_to_posted(base):
     residual_bid = Bid("456", pendulum.now(), 4, 4, base.owner.name, 'B')
     market = FakeMarket(raises=False, id=21)
     base.area._market = market
-    base._bids[market.id] = []
     base.event_bid_split(market_id=21, original_bid=test_bid, accepted_bid=accepted_bid,
                          residual_bid=residual_bid)
     assert base.get_posted_bids(market) == [accepted_bid, residual_bid]
@@ -289,7 +306,7 @@ def test_bid_traded_moves_bid_from_posted_to_traded(base):
     trade.offer = test_bid
     market = FakeMarket(raises=False, id=21)
     base.area._market = market
-    base._bids[market.id] = [test_bid]
+    base.add_bid_to_posted(market.id, test_bid)
     base.event_bid_traded(market_id=21, bid_trade=trade)
     assert base.get_posted_bids(market) == []
     assert base.get_traded_bids_from_market(market) == [test_bid]
@@ -25,6 +25,7 @@ from math import isclose
 import os
 from d3a.models.area import DEFAULT_CONFIG
 from d3a.models.market.market_structures import Offer, BalancingOffer, Bid, Trade
+from d3a.models.market.one_sided import OneSidedMarket
 from d3a.models.appliance.simple import SimpleAppliance
 from d3a.models.strategy.load_hours import LoadHoursStrategy
 from d3a.models.strategy.predefined_load import DefinedLoadStrategy
@@ -108,6 +109,9 @@ class FakeMarket:
     def get_bids(self):
         return deepcopy(self.bids)
 
+    def get_bids_of_buyer(self, buyer):
+        return [bid for bid in self.bids.values() if bid.buyer == buyer]
+
     def bid(self, price: float, energy: float, buyer: str,
             seller: str, original_bid_price=None,
             buyer_origin=None) -> Bid:
@@ -310,6 +314,19 @@ def test_event_tick_with_partial_offer(load_hours_strategy_test2, market_test2):
     assert float(load_hours_strategy_test2.accept_offer.calls[0][1]['energy']) == requirement
 
 
+def test_event_tick_updates_bids_of_markets_due_for_price_update(load_hours_strategy_test1):
+    ConstSettings.IAASettings.MARKET_TYPE = 2
+    load_hours_strategy_test1.event_activate()
+    due_market = load_hours_strategy_test1.area.all_markets[1]
+    load_hours_strategy_test1.energy_requirement_Wh = {TIME: 100}
+    bid_update = load_hours_strategy_test1.bid_update
+    bid_update.markets_due_for_price_update = MagicMock(return_value=[due_market])
+    bid_update.update_posted_bids_over_ticks = MagicMock()
+    load_hours_strategy_test1.event_tick()
+    bid_update.update_posted_bids_over_ticks.assert_called_once_with(
+        due_market, load_hours_strategy_test1)
+
+
 def test_load_hours_constructor_rejects_incorrect_hrs_of_day():
     with pytest.raises(ValueError):
         LoadHoursStrategy(100, hrs_of_day=[12, 13, 24])
@@ -340,7 +357,7 @@ def test_event_bid_traded_removes_bid_for_partial_and_non_trade(load_hours_strat
     load_hours_strategy_test5.area.markets = {TIME: trade_market}
     load_hours_strategy_test5.event_market_cycle()
     # Get the bid that was posted on event_market_cycle
-    bid = list(load_hours_strategy_test5._bids.values())[0][0]
+    bid = load_hours_strategy_test5.get_posted_bids(trade_market)[0]
 
     # Increase energy requirement to cover the energy from the bid
     load_hours_strategy_test5.energy_requirement_Wh[TIME] = 1000
@@ -363,7 +380,7 @@ def test_event_bid_traded_removes_bid_from_pending_if_energy_req_0(load_hours_st
     load_hours_strategy_test5.event_activate()
     load_hours_strategy_test5.area.markets = {TIME: trade_market}
     load_hours_strategy_test5.event_market_cycle()
-    bid = list(load_hours_strategy_test5._bids.values())[0][0]
+    bid = load_hours_strategy_test5.get_posted_bids(trade_market)[0]
     # Increase energy requirement to cover the energy from the bid + threshold
     load_hours_strategy_test5.energy_requirement_Wh[TIME] = bid.energy * 1000 + 0.000009
     trade = Trade('idt', None, bid, 'B', load_hours_strategy_test5.owner.name, residual=True)
@@ -511,10 +528,27 @@ def load_hours_strategy_test3(area_test1):
 
 def test_assert_if_trade_rate_is_higher_than_bid_rate(load_hours_strategy_test3):
     market_id = 0
-    load_hours_strategy_test3._bids[market_id] = \
-        [Bid("bid_id", now(), 30, 1, buyer="FakeArea", seller="producer")]
+    load_hours_strategy_test3.add_bid_to_posted(
+        market_id, Bid("bid_id", now(), 30, 1, buyer="FakeArea", seller="producer"))
     expensive_bid = Bid("bid_id", now(), 31, 1, buyer="FakeArea", seller="producer")
     trade = Trade("trade_id", "time", expensive_bid, load_hours_strategy_test3, "buyer")
 
     with pytest.raises(AssertionError):
         load_hours_strategy_test3.event_trade(market_id=market_id, trade=trade)
+
+
+def test_load_buys_offer_repriced_below_its_final_buying_rate(
+        load_hours_strategy_test1, area_test1):
+    market = OneSidedMarket(time_slot=TIME)
+    area_test1._next_market = area_test1.current_market = market
+    load_hours_strategy_test1.event_activate()
+    load_hours_strategy_test1._cycled_market.add(TIME)
+    market.add_listener(load_hours_strategy_test1.event_listener)
+    final_rate = load_hours_strategy_test1.bid_update.final_rate[TIME]
+
+    offer = market.offer((final_rate + 1) * 0.1, 0.1, 'A', 'A')
+    assert len(load_hours_strategy_test1.accept_offer.calls) == 0
+
+    repriced_offer = market.update_offer_price(offer, (final_rate - 1) * 0.1)
+    assert len(load_hours_strategy_test1.accept_offer.calls) == 1
+    assert load_hours_strategy_test1.accept_offer.calls[0][0][1] == repr(repriced_offer)
@@ -107,6 +107,12 @@ class FakeMarket:
     def delete_offer(self, offer_id):
         return
 
+    def update_offer_price(self, offer, price, original_offer_price=None):
+        repriced_offer = Offer(offer.id, pendulum.now(), price, offer.energy, offer.seller,
+                               original_offer_price, seller_origin=offer.seller_origin)
+        self.offers[offer.id] = repriced_offer
+        return repriced_offer
+
 
 class FakeTrade:
     def __init__(self, offer):
@@ -155,6 +155,12 @@ class FakeMarket:
     def delete_offer(self, offer_id):
         return
 
+    def update_offer_price(self, offer, price, original_offer_price=None):
+        repriced_offer = Offer(offer.id, now(), price, offer.energy, offer.seller,
+                               original_offer_price, seller_origin=offer.seller_origin)
+        self.offers[offer.id] = repriced_offer
+        return repriced_offer
+
     def offer(self, price, energy, seller, original_offer_price=None, seller_origin=None):
         offer = Offer('id', now(), price, energy, seller, original_offer_price,
                       seller_origin=seller_origin)
@@ -490,6 +496,62 @@ def test_clamp_energy_to_buy(storage_strategy_test7_3):
     assert isclose(storage_strategy_test7_3.state.energy_to_buy_dict[time_slot], 0.41)
 
 
+def test_clamp_energy_to_sell_returns_dict_of_requested_slots(storage_strategy_test7_3):
+    storage_strategy_test7_3.event_activate()
+    state = storage_strategy_test7_3.state
+    state._battery_energy_per_slot = 0.5
+    state._used_storage = 2.5
+    time_slot = storage_strategy_test7_3.market.time_slot
+    energy_sell_dict = state.clamp_energy_to_sell_kWh([time_slot])
+    assert type(energy_sell_dict) is dict
+    assert energy_sell_dict == {time_slot: 0.5}
+
+    energy_sell_dict[time_slot] = 0
+    state.offered_sell_kWh[time_slot] += 0.3
+    assert state.energy_to_sell_dict[time_slot] == 0.5
+    assert state.clamp_energy_to_sell_kWh([time_slot]) == {time_slot: 0.2}
+    assert state.energy_to_sell_dict[time_slot] == 0.2
+
+
+def test_update_energy_to_buy_keeps_running_sums_of_buy_clamp(storage_strategy_test7_3):
+    storage_strategy_test7_3.event_activate()
+    state = storage_strategy_test7_3.state
+    state._battery_energy_per_slot = 1.
+    state._used_storage = 4.
+    time_slots = list(state.offered_buy_kWh.keys())[:3]
+    buy_clamp = state.clamp_energy_to_buy_kWh(time_slots)
+    for time_slot in time_slots:
+        energy = state.update_energy_to_buy_kWh(time_slot, buy_clamp)
+        state.add_offered_buy_kWh(time_slot, energy / 2, buy_clamp)
+        state._used_storage -= 0.1
+
+    expected_state = deepcopy(state)
+    expected_state.clamp_energy_to_buy_kWh(time_slots)
+    for time_slot in time_slots:
+        assert state.update_energy_to_buy_kWh(time_slot, buy_clamp) == \
+            expected_state.energy_to_buy_dict[time_slot]
+
+
+def test_update_energy_to_buy_without_markets_buys_nothing(storage_strategy_test7_3):
+    storage_strategy_test7_3.event_activate()
+    state = storage_strategy_test7_3.state
+    time_slot = list(state.offered_buy_kWh.keys())[0]
+    buy_clamp = state.clamp_energy_to_buy_kWh([])
+    assert state.update_energy_to_buy_kWh(time_slot, buy_clamp) == 0
+    assert state.energy_to_buy_dict[time_slot] == 0
+
+
+def test_clamp_energy_to_sell_without_markets_keeps_clamped_energy(storage_strategy_test7_3):
+    storage_strategy_test7_3.event_activate()
+    state = storage_strategy_test7_3.state
+    state._battery_energy_per_slot = 0.5
+    state._used_storage = 2.5
+    time_slot = storage_strategy_test7_3.market.time_slot
+    state.clamp_energy_to_sell_kWh([time_slot])
+    assert state.clamp_energy_to_sell_kWh([]) == {}
+    assert state.energy_to_sell_dict[time_slot] == 0.5
+
+
 """TEST8"""
 
 
@@ -848,6 +910,21 @@ def test_energy_origin(storage_strategy_test15, market_test15):
         EnergyOrigin(ESSEnergyOrigin.EXTERNAL, 1)]
 
 
+def test_energy_origin_merges_adjacent_shares_of_same_origin(storage_strategy_test15):
+    storage_strategy_test15.event_activate()
+    state = storage_strategy_test15.state
+    state.update_used_storage_share(1.0, ESSEnergyOrigin.EXTERNAL)
+    state.update_used_storage_share(2.0, ESSEnergyOrigin.LOCAL)
+    state.update_used_storage_share(3.0, ESSEnergyOrigin.LOCAL)
+    assert state.get_used_storage_share == [EnergyOrigin(ESSEnergyOrigin.EXTERNAL, 16),
+                                            EnergyOrigin(ESSEnergyOrigin.LOCAL, 5)]
+    state.consume_used_storage_share(17)
+    assert state.get_used_storage_share == [EnergyOrigin(ESSEnergyOrigin.LOCAL, 4)]
+    assert state.used_storage_per_origin == {ESSEnergyOrigin.EXTERNAL: 0,
+                                             ESSEnergyOrigin.LOCAL: 4,
+                                             ESSEnergyOrigin.UNKNOWN: 0}
+
+
 def test_storage_strategy_increases_rate_when_fit_to_limit_is_false():
     storage = StorageStrategy(
         fit_to_limit=False,
@@ -882,8 +959,8 @@ def test_assert_if_trade_rate_is_lower_than_offer_rate(storage_test11):
 
 def test_assert_if_trade_rate_is_higher_than_bid_rate(storage_test11):
     market_id = "2"
-    storage_test11._bids[market_id] = \
-        [Bid("bid_id", now(), 30, 1, buyer="FakeArea", seller="producer")]
+    storage_test11.add_bid_to_posted(
+        market_id, Bid("bid_id", now(), 30, 1, buyer="FakeArea", seller="producer"))
     expensive_bid = Bid("bid_id", now(), 31, 1, buyer="FakeArea", seller="producer")
     trade = Trade("trade_id", "time", expensive_bid, storage_test11, "buyer")
 
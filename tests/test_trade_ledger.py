@@ -0,0 +1,137 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from uuid import uuid4
+import pytest
+from pendulum import today
+
+from d3a.models.market.market_structures import Trade
+from d3a.d3a_core.sim_results.trade_ledger import TradeLedger, NO_ID
+from d3a_interface.constants_limits import ConstSettings
+
+
+class FakeArea:
+    def __init__(self, name):
+        self.name = name
+        self.uuid = str(uuid4())
+
+
+class FakeMarket:
+    def __init__(self, time_slot, trades):
+        self.time_slot = time_slot
+        self.trades = trades
+
+
+class FakeOffer:
+    def __init__(self, price, energy):
+        self.price = price
+        self.energy = energy
+
+
+def _trade(seller, buyer, energy, price, fee_price=None):
+    return Trade('id', 0, FakeOffer(price, energy), seller, buyer, fee_price=fee_price,
+                 seller_origin=seller, buyer_origin=buyer)
+
+
+@pytest.fixture
+def keep_past_markets(request):
+    original_value = ConstSettings.GeneralSettings.KEEP_PAST_MARKETS
+    ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = request.param
+    yield
+    ConstSettings.GeneralSettings.KEEP_PAST_MARKETS = original_value
+
+
+def test_trade_ledger_adds_trades_of_market_as_rows():
+    ledger = TradeLedger(capacity=1)
+    house = FakeArea("House 1")
+    market = FakeMarket(today(), [_trade("PV", "Load", 1.5, 30, fee_price=1),
+                                  _trade("IAA House 1", "Load", 0.5, 15)])
+    ledger.add_market(house, market)
+    assert len(ledger) == 2
+    assert [ledger.names[i] for i in ledger.column("seller")] == ["PV", "IAA House 1"]
+    assert set(ledger.column("market_area")) == {ledger.name_id("House 1")}
+    assert set(ledger.column("time_slot")) == {ledger.time_slot_id(today())}
+    assert list(ledger.column("energy")) == [1.5, 0.5]
+    assert list(ledger.column("price")) == [30, 15]
+    assert list(ledger.column("fee_price")) == [1, 0]
+    # The IAA trades for the area it belongs to
+    assert ledger.area_name_ids[ledger.name_id("IAA House 1")] == ledger.name_id("House 1")
+    assert ledger.area_name_ids[ledger.name_id("PV")] == ledger.name_id("PV")
+
+
+def test_trade_ledger_groups_rows_by_market_area():
+    ledger = TradeLedger(capacity=1)
+    houses = [FakeArea("House 1"), FakeArea("House 2")]
+    for hour in range(2):
+        for house in houses:
+            ledger.add_market(house, FakeMarket(today().add(hours=hour),
+                                                [_trade("PV", "Load", 1, 10),
+                                                 _trade("IAA " + house.name, "Load", 1, 10)]))
+    assert list(ledger.rows_of_market_area("House 1")) == [0, 1, 4, 5]
+    assert list(ledger.rows_of_market_area("House 2")) == [2, 3, 6, 7]
+    assert list(ledger.rows_of_market_area("PV")) == []
+    assert list(ledger.rows_of_market_area("Grid")) == []
+
+    ledger.add_market(FakeArea("Grid"), FakeMarket(today(), [_trade("House 1", "House 2", 1, 10)]))
+    assert list(ledger.rows_of_market_area("Grid")) == [8]
+    assert list(ledger.rows_of_market_area("House 2")) == [2, 3, 6, 7]
+    assert list(ledger.area_name_ids[[ledger.name_id("IAA House 1"),
+                                      ledger.name_id("IAA House 2")]]) == \
+        [ledger.name_id("House 1"), ledger.name_id("House 2")]
+    ledger.clear()
+    assert list(ledger.rows_of_market_area("House 1")) == []
+
+
+@pytest.mark.parametrize("keep_past_markets", [False], indirect=True)
+def test_trade_ledger_only_keeps_markets_of_last_walk(keep_past_markets):
+    ledger = TradeLedger()
+    house = FakeArea("House 1")
+    for hour in range(2):
+        ledger.start_walk(house)
+        ledger.enter_market(house, FakeMarket(today().add(hours=hour),
+                                              [_trade("PV", "Load", 1, 10)]))
+    assert len(ledger) == 1
+    assert ledger.time_slots[ledger.column("time_slot")[0]] == today().add(hours=1)
+
+
+@pytest.mark.parametrize("keep_past_markets", [True], indirect=True)
+def test_trade_ledger_adds_each_past_market_once(keep_past_markets):
+    ledger = TradeLedger()
+    house = FakeArea("House 1")
+    markets = [FakeMarket(today().add(hours=hour), [_trade("PV", "Load", 1, 10)])
+               for hour in range(3)]
+    for walk in range(1, 4):
+        ledger.start_walk(house)
+        for market in markets[:walk]:
+            ledger.enter_market(house, market)
+    assert len(ledger) == 3
+    assert list(ledger.column("time_slot")) == \
+        [ledger.time_slot_id(market.time_slot) for market in markets]
+
+
+def test_trade_ledger_group_sums_add_values_in_row_order():
+    values = [0.1, 0.2, 0.3, 1e16, 1., -1e16]
+    groups = [0, 0, 0, 1, 1, 1]
+    sums = TradeLedger.group_sums(([NO_ID] * 6, groups), values)
+    assert sums == {(NO_ID, 0): 0.1 + 0.2 + 0.3, (NO_ID, 1): 1e16 + 1. - 1e16}
+    assert TradeLedger.group_sums(([], ), []) == {}
+
+
+def test_trade_ledger_first_occurrences():
+    assert TradeLedger.first_occurrences(([3, 1, 3, 2, 1], [0, 0, 1, 0, 0])) == \
+        [(3, 0), (1, 0), (3, 1), (2, 0)]
+    assert TradeLedger.first_occurrences(([], )) == []
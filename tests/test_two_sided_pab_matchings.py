@@ -0,0 +1,105 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+import pendulum
+from parameterized import parameterized
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+import d3a.constants
+from d3a.models.market.market_structures import Bid, Offer
+from d3a.models.market.two_sided_pay_as_bid import TwoSidedPayAsBid
+from d3a_interface.constants_limits import ConstSettings
+
+order_strategy = st.tuples(
+    st.sampled_from([1, 2, 3, 4, 5, 2.000001, 1.999999]),
+    st.sampled_from([0.5, 1, 2, 3]),
+    st.sampled_from(['A', 'B', 'C'])
+)
+
+
+class TestPayAsBidMatchingEquivalence(unittest.TestCase):
+
+    def setUp(self):
+        self._matching_algorithm = d3a.constants.PAY_AS_BID_MATCHING_ALGORITHM
+        ConstSettings.IAASettings.MARKET_TYPE = 2
+
+    def tearDown(self):
+        d3a.constants.PAY_AS_BID_MATCHING_ALGORITHM = self._matching_algorithm
+        ConstSettings.IAASettings.MARKET_TYPE = 1
+
+    @staticmethod
+    def _populate_market(offers, bids):
+        market = TwoSidedPayAsBid(time_slot=pendulum.now())
+        for price_rate, energy, seller in offers:
+            market.offer(price_rate * energy, energy, seller, seller)
+        for price_rate, energy, buyer in bids:
+            market.bid(price_rate * energy, energy, buyer, 'S', buyer)
+        return market
+
+    @staticmethod
+    def _pair_ids(pairs):
+        return [(bid.id, offer.id) for bid, offer in pairs]
+
+    def _match_with_algorithm(self, algorithm, offers, bids):
+        d3a.constants.PAY_AS_BID_MATCHING_ALGORITHM = algorithm
+        market = self._populate_market(offers, bids)
+        market.match_offers_bids()
+        trades = [(t.seller, t.buyer, round(t.offer.energy, 6), round(t.offer.energy_rate, 6))
+                  for t in market.trades]
+        residual_offers = sorted((o.seller, round(o.energy, 6), round(o.energy_rate, 6))
+                                 for o in market.offers.values())
+        residual_bids = sorted((b.buyer, round(b.energy, 6), round(b.energy_rate, 6))
+                               for b in market.bids.values())
+        return trades, residual_offers, residual_bids
+
+    @parameterized.expand([
+        ([10, 11, 9, 12], [2], ['B', 'B', 'B', 'B'], ['other']),
+        ([10, 11, 9, 12], [2, 10, 12, 13], ['B', 'C', 'other', 'B'], ['other', 'B', 'C', 'B']),
+        ([1, 1, 1], [1, 1, 1], ['A', 'B', 'C'], ['A', 'B', 'C']),
+        ([5, 4, 3], [6, 7, 8], ['A', 'A', 'A'], ['B', 'B', 'B']),
+    ])
+    def test_merge_matching_returns_same_pairs_as_nested_scan(
+            self, bid_rates, offer_rates, buyers, sellers):
+        market = TwoSidedPayAsBid(time_slot=pendulum.now())
+        market.bids = {f"bid{i}": Bid(f"bid{i}", pendulum.now(), rate, 1, buyer, 'S')
+                       for i, (rate, buyer) in enumerate(zip(bid_rates, buyers))}
+        market.offers = {f"offer{i}": Offer(f"offer{i}", pendulum.now(), rate, 1, seller)
+                         for i, (rate, seller) in enumerate(zip(offer_rates, sellers))}
+
+        d3a.constants.PAY_AS_BID_MATCHING_ALGORITHM = 1
+        nested_pairs = self._pair_ids(market._perform_pay_as_bid_matching())
+        d3a.constants.PAY_AS_BID_MATCHING_ALGORITHM = 2
+        merge_pairs = self._pair_ids(market._perform_pay_as_bid_matching())
+        assert nested_pairs == merge_pairs
+
+    def test_merge_matching_skips_bids_of_the_offer_seller(self):
+        market = TwoSidedPayAsBid(time_slot=pendulum.now())
+        market.bids = {"bid1": Bid("bid1", pendulum.now(), 12, 1, 'A', 'S'),
+                       "bid2": Bid("bid2", pendulum.now(), 11, 1, 'B', 'S')}
+        market.offers = {"offer1": Offer("offer1", pendulum.now(), 10, 1, 'A'),
+                         "offer2": Offer("offer2", pendulum.now(), 5, 1, 'C')}
+        d3a.constants.PAY_AS_BID_MATCHING_ALGORITHM = 2
+        assert self._pair_ids(market._perform_pay_as_bid_matching()) == \
+            [("bid2", "offer1"), ("bid1", "offer2")]
+
+    @given(st.lists(order_strategy, max_size=8), st.lists(order_strategy, max_size=8))
+    @settings(max_examples=200, deadline=None)
+    def test_merge_matching_produces_same_trades_and_residuals(self, offers, bids):
+        assert self._match_with_algorithm(1, offers, bids) == \
+            self._match_with_algorithm(2, offers, bids)
@@ -20,6 +20,7 @@ import pendulum
 from parameterized import parameterized
 from d3a.models.market.market_structures import Bid, Offer, BidOfferMatch, Trade
 from d3a.models.market.two_sided_pay_as_clear import TwoSidedPayAsClear
+from d3a_interface.constants_limits import ConstSettings
 
 
 class TestCreateBidOfferMatchings(unittest.TestCase):
@@ -255,3 +256,35 @@ class TestCreateBidOfferMatchings(unittest.TestCase):
         assert matchings[0].offer.id == 'offer_id'
         assert matchings[1].bid.id == 'residual_bid_2'
         assert matchings[2].offer.id == 'residual_offer'
+
+
+class TestVectorizedClearingPoint(unittest.TestCase):
+
+    def tearDown(self):
+        ConstSettings.IAASettings.PAY_AS_CLEAR_AGGREGATION_ALGORITHM = 1
+
+    @staticmethod
+    def _clearing_point(algorithm, offers, bids):
+        ConstSettings.IAASettings.PAY_AS_CLEAR_AGGREGATION_ALGORITHM = algorithm
+        market = TwoSidedPayAsClear(time_slot=pendulum.now())
+        market.offers = {f"offer{i}": Offer(f"offer{i}", pendulum.now(), rate * energy, energy,
+                                            'S')
+                         for i, (rate, energy) in enumerate(offers)}
+        market.bids = {f"bid{i}": Bid(f"bid{i}", pendulum.now(), rate * energy, energy,
+                                      'B', 'S')
+                       for i, (rate, energy) in enumerate(bids)}
+        clearing = market._perform_pay_as_clear_matching()
+        return clearing, \
+            list(market.state.cumulative_offers[market.now].items()), \
+            list(market.state.cumulative_bids[market.now].items())
+
+    @parameterized.expand([
+        ([(1, 1), (2, 1), (3, 1)], [(3, 1), (2, 1), (1, 1)]),
+        ([(1, 2), (2, 0.5), (2, 0.7), (5, 3)], [(4, 1), (2, 2), (2, 0.3), (1, 4)]),
+        ([(10, 1), (11, 1)], [(1, 1), (2, 1)]),
+        ([(1, 1), (1, 1)], [(30, 5), (20, 5)]),
+        ([(1.1, 1), (2.2, 1), (3.3, 1)], [(3.3, 1), (2.2, 1), (1.1, 1)]),
+        ([(2.000001, 1), (3, 2)], [(2, 1), (3, 0.5)]),
+    ])
+    def test_vectorized_clearing_point_matches_aggregation_algorithm_1(self, offers, bids):
+        assert self._clearing_point(3, offers, bids) == self._clearing_point(1, offers, bids)
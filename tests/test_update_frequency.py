@@ -0,0 +1,93 @@
+"""
+Copyright 2018 Grid Singularity
+This file is part of D3A.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from types import SimpleNamespace
+
+import pytest
+from pendulum import duration, today
+
+from d3a.models.strategy.update_frequency import UpdateFrequencyMixin, _price_update_ticks
+
+TIME_SLOT = today()
+
+
+def fake_strategy(tick_length_s, ticks_per_slot):
+    config = SimpleNamespace(tick_length=duration(seconds=tick_length_s),
+                             ticks_per_slot=ticks_per_slot)
+    market = SimpleNamespace(time_slot=TIME_SLOT)
+    return SimpleNamespace(area=SimpleNamespace(config=config, current_tick=0,
+                                                all_markets=[market]))
+
+
+@pytest.mark.parametrize("update_interval_s, tick_length_s, ticks_per_slot", [
+    (60, 15, 60), (300, 15, 60), (70, 15, 60), (60, 90, 10), (60, 60, 15), (0, 15, 60)])
+def test_price_updates_are_due_on_the_same_ticks_as_elapsed_time_checks(
+        update_interval_s, tick_length_s, ticks_per_slot):
+    mixin = UpdateFrequencyMixin(0, 0, update_interval=duration(seconds=update_interval_s))
+    mixin.update_counter = {TIME_SLOT: 0}
+    strategy = fake_strategy(tick_length_s, ticks_per_slot)
+    expected_counter = 0
+    for tick in range(ticks_per_slot):
+        strategy.area.current_tick = tick
+        expected_due = tick * tick_length_s >= update_interval_s * expected_counter
+        assert mixin.time_for_price_update(strategy, TIME_SLOT) is expected_due
+        assert mixin.increment_update_counter_all_markets(strategy) is expected_due
+        expected_counter += expected_due
+        assert mixin.update_counter[TIME_SLOT] == expected_counter
+
+
+def test_price_update_ticks_leave_out_updates_after_the_end_of_the_slot():
+    assert _price_update_ticks(300, 15, 60) == (0, 20, 40)
+    assert _price_update_ticks(70, 15, 60) == (0, 5, 10, 14, 19, 24, 28, 33, 38, 42, 47, 52, 56)
+
+
+class _CountingArea:
+    def __init__(self, config, markets):
+        self.config = config
+        self.current_tick = 0
+        self._markets = markets
+        self.all_markets_calls = 0
+
+    @property
+    def all_markets(self):
+        self.all_markets_calls += 1
+        return self._markets
+
+
+def test_markets_are_only_checked_on_ticks_with_due_price_updates():
+    mixin = UpdateFrequencyMixin(0, 0, update_interval=duration(seconds=300))
+    mixin.update_counter = {TIME_SLOT: 0}
+    strategy = fake_strategy(15, 60)
+    strategy.area = _CountingArea(strategy.area.config, strategy.area.all_markets)
+    due_ticks = []
+    for tick in range(60):
+        strategy.area.current_tick = tick
+        calls = strategy.area.all_markets_calls
+        if mixin.increment_update_counter_all_markets(strategy):
+            due_ticks.append(tick)
+        elif tick not in (1, 21, 41):
+            assert strategy.area.all_markets_calls == calls
+    assert due_ticks == [0, 20, 40]
+
+    strategy.area.current_tick = 60
+    assert mixin.increment_update_counter_all_markets(strategy) is False
+    new_market = SimpleNamespace(time_slot=TIME_SLOT.add(hours=1))
+    strategy.area._markets.append(new_market)
+    mixin.update_counter[new_market.time_slot] = 0
+    mixin.reset_update_counters(strategy)
+    assert mixin.update_counter[TIME_SLOT] == 0
+    assert mixin.increment_update_counter_all_markets(strategy) is True
@@ -0,0 +1,110 @@
+# Measures the per-event cost of serializing / parsing offers, bids and trades, as done for
+# every market event when EVENT_DISPATCHING_VIA_REDIS is enabled. The legacy implementation
+# (deepcopy of the offer __dict__, generic dict juggling in the parsers) is compared against
+# the current one, with the "json" and, if installed, the "orjson" backend.
+# Run with 'python tools/market_structures_serialization_benchmark.py'
+import json
+import timeit
+from copy import deepcopy
+
+from pendulum import now, parse
+
+import d3a.constants
+from d3a.models.market.market_structures import Offer, Bid, Trade, TradeBidInfo, \
+    offer_from_JSON_string, bid_from_JSON_string, trade_from_JSON_string, my_converter, orjson
+
+REPETITIONS = 20000
+
+
+def legacy_offer_to_JSON_string(offer):
+    offer_dict = {field: getattr(offer, field) for field in Offer.__slots__}
+    offer_dict = deepcopy(offer_dict)
+    offer_dict["type"] = "Offer"
+    offer_dict.pop('energy_rate', None)
+    return json.dumps(offer_dict, default=my_converter)
+
+
+def legacy_offer_from_JSON_string(offer_string, current_time):
+    offer_dict = json.loads(offer_string)
+    offer_dict.pop("type")
+    real_id = offer_dict.pop('real_id')
+    offer_dict.pop('energy_rate', None)
+    offer_dict['time'] = current_time
+    offer = Offer(**offer_dict)
+    offer.real_id = real_id
+    return offer
+
+
+def legacy_bid_to_JSON_string(bid):
+    bid_dict = bid._asdict()
+    bid_dict["type"] = "Bid"
+    return json.dumps(bid_dict, default=my_converter)
+
+
+def legacy_bid_from_JSON_string(bid_string):
+    bid_dict = json.loads(bid_string)
+    bid_dict.pop("type")
+    return Bid(**bid_dict)
+
+
+def legacy_trade_to_JSON_string(trade):
+    trade_dict = trade._asdict()
+    trade_dict['offer'] = legacy_offer_to_JSON_string(trade_dict['offer'])
+    trade_dict['residual'] = legacy_offer_to_JSON_string(trade_dict['residual']) \
+        if trade_dict['residual'] is not None else None
+    trade_dict['time'] = trade_dict['time'].isoformat()
+    return json.dumps(trade_dict)
+
+
+def legacy_trade_from_JSON_string(trade_string, current_time):
+    trade_dict = json.loads(trade_string)
+    trade_dict['offer'] = legacy_offer_from_JSON_string(trade_dict['offer'], current_time)
+    if trade_dict['residual'] is not None:
+        trade_dict['residual'] = legacy_offer_from_JSON_string(trade_dict['residual'],
+                                                               current_time)
+    trade_dict['time'] = parse(trade_dict['time'])
+    return Trade(**trade_dict)
+
+
+def per_call_us(function):
+    return min(timeit.repeat(function, number=REPETITIONS, repeat=3)) / REPETITIONS * 1e6
+
+
+def main():
+    current_time = now()
+    offer = Offer('offer_id', current_time, 12.5, 1.25, 'H1 PV', 12, 'H1 PV')
+    residual = Offer('residual_id', current_time, 25, 2.5, 'H1 PV', 24, 'H1 PV')
+    bid = Bid('bid_id', current_time, 30, 1.5, 'H2 Load', 'IAA House 2', 30, 'H2 Load')
+    trade = Trade('trade_id', current_time, offer, 'H1 PV', 'H2 Load', residual,
+                  offer_bid_trade_info=TradeBidInfo(30, 30, 10, 10, 10),
+                  seller_origin='H1 PV', buyer_origin='H2 Load', fee_price=0.1)
+    offer_string = offer.to_JSON_string()
+    bid_string = bid.to_JSON_string()
+    trade_string = trade.to_JSON_string()
+
+    benchmarks = {
+        "offer to JSON": (lambda: legacy_offer_to_JSON_string(offer),
+                          offer.to_JSON_string),
+        "offer from JSON": (lambda: legacy_offer_from_JSON_string(offer_string, current_time),
+                            lambda: offer_from_JSON_string(offer_string, current_time)),
+        "bid to JSON": (lambda: legacy_bid_to_JSON_string(bid), bid.to_JSON_string),
+        "bid from JSON": (lambda: legacy_bid_from_JSON_string(bid_string),
+                          lambda: bid_from_JSON_string(bid_string)),
+        "trade to JSON": (lambda: legacy_trade_to_JSON_string(trade), trade.to_JSON_string),
+        "trade from JSON": (lambda: legacy_trade_from_JSON_string(trade_string, current_time),
+                            lambda: trade_from_JSON_string(trade_string, current_time)),
+    }
+    backends = ["json", "orjson"] if orjson is not None else ["json"]
+
+    print(f"{'[us per call]':<20}{'legacy':>10}" + "".join(f"{b:>10}" for b in backends))
+    for name, (legacy, current) in benchmarks.items():
+        timings = [per_call_us(legacy)]
+        for backend in backends:
+            d3a.constants.JSON_SERIALIZATION_BACKEND = backend
+            timings.append(per_call_us(current))
+        d3a.constants.JSON_SERIALIZATION_BACKEND = "json"
+        print(f"{name:<20}" + "".join(f"{timing:>10.2f}" for timing in timings))
+
+
+if __name__ == "__main__":
+    main()